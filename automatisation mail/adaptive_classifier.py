@@ -3,156 +3,258 @@ Classificateur adaptatif qui utilise la configuration business pour trier les em
 """
 
 import json
-import os
 import re
-from datetime import datetime, time
+from itertools import chain
+from datetime import datetime
 import sqlite3
+from time import perf_counter_ns
+from classification_trace import ClassificationTrace
 from email_classifier import EmailClassifier
+from keyword_matcher import PRIORITY_LABELS
+from reputation import InferredPriority, inferred
+from rule_plan import RulePlanWatcher
+
+# Règles décisives du traçage qui donnent une priorité déduite (hors réputation des expéditeurs)
+INFERRED_RULES = ("feedback", "reputation", "default")
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 class AdaptiveEmailClassifier(EmailClassifier):
-    def __init__(self, config_file="business_config.json"):
+    def __init__(self, config_file="business_config.json", reload_interval=1.0):
         super().__init__()
         self.config_file = config_file
-        self.business_config = self.load_business_config()
-
-    def load_business_config(self):
-        """Charger la configuration business"""
-        if os.path.exists(self.config_file):
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            print(f"Configuration non trouvée: {self.config_file}")
-            print("Utilisation de la configuration par défaut")
-            return self.get_default_business_config()
-
-    def get_default_business_config(self):
-        """Configuration par défaut si aucune configuration n'existe"""
-        return {
-            "company_info": {"industry": "generic"},
-            "priority_rules": {
-                "urgent": {"keywords": ["urgent", "emergency"], "senders": [], "subjects": []},
-                "high": {"keywords": ["important", "client"], "senders": [], "subjects": []},
-                "medium": {"keywords": ["information", "question"], "senders": [], "subjects": []},
-                "low": {"keywords": ["newsletter", "promo"], "senders": [], "subjects": []}
-            },
-            "business_hours": {"start": "09:00", "end": "18:00"},
-            "special_rules": {"vip_clients": [], "blocked_senders": []}
-        }
-
-    def classify_email_priority(self, subject, sender, body):
-        """Classification adaptative basée sur la configuration business"""
+        # Règles compilées une fois, recompilées seulement quand le fichier change
+        self.plans = RulePlanWatcher(config_file, reload_interval)
+
+    def rule_snapshot(self):
+        plan = self.plans.current()
+        return plan.version, plan.config
+
+    @property
+    def business_config(self):
+        """Configuration business du plan de règles courant"""
+        return self.plans.current().config
+
+    def classify_email_priority(self, subject, sender, body, received=None):
+        """Classification adaptative basée sur la configuration business
+
+        received: date de réception (datetime) pour l'ajustement hors horaires, maintenant par défaut
+        """
+        if self.tracer is not None:
+            trace = self.trace_email(subject, sender, body, received)
+            self.tracer.record(trace, subject, sender)
+            if trace.rule[0] in INFERRED_RULES:
+                return inferred(trace.priority, trace.label)
+            return trace.priority, trace.label
+
+        plan = self.plans.current()
+        sender_lower = sender.lower()
 
         # Vérifier les expéditeurs bloqués
-        if self.is_blocked_sender(sender):
+        if plan.blocked.search(sender_lower):
             return 0, "BLOQUE"
 
         # Vérifier les clients VIP
-        if self.is_vip_client(sender):
-            base_priority, label = self.classify_with_business_rules(subject, sender, body)
+        if plan.vip.search(sender_lower):
+            base = self.classify_with_business_rules(subject, sender, body, plan, received)
             # Augmenter la priorité pour les VIP
-            return min(4, base_priority + 1), f"VIP-{label}"
+            result = min(4, base[0] + 1), f"VIP-{base[1]}"
+            return inferred(*result) if isinstance(base, InferredPriority) else result
 
         # Classification normale avec règles business
-        return self.classify_with_business_rules(subject, sender, body)
+        return self.classify_with_business_rules(subject, sender, body, plan, received)
 
-    def classify_with_business_rules(self, subject, sender, body):
-        """Classification utilisant les règles de l'entreprise"""
-        text = f"{subject} {body}".lower()
+    def trace_email(self, subject, sender, body, received=None):
+        """classify_email_priority détaillé: règle décisive, ajustements et durée de chaque phase"""
+        plan = self.plans.current()
         sender_lower = sender.lower()
+        phases = []
+        start = perf_counter_ns()
+
+        blocked = plan.blocked.explain(sender_lower)
+        now = perf_counter_ns()
+        phases.append(("blocked", now - start))
+        if blocked is not None:
+            return ClassificationTrace(0, "BLOQUE", ("blocked_senders", blocked), (), tuple(phases))
+
+        start = now
+        vip = plan.vip.explain(sender_lower)
+        now = perf_counter_ns()
+        phases.append(("vip", now - start))
+
+        # Mêmes étapes que classify_with_business_rules
+        start = now
+        match = plan.rules.explain(subject, sender, body)
+        now = perf_counter_ns()
+        phases.append(("rules", now - start))
+        start = now
+        learned = self.feedback.predict(subject, sender, body, match[0] if match else None)
+        now = perf_counter_ns()
+        phases.append(("feedback", now - start))
+        modifiers = ()
+        if learned:
+            (priority_num, priority_label), rule = learned, ("feedback", None)
+        elif match:
+            priority_num, kind, pattern = match
+            priority_label, rule = PRIORITY_LABELS[priority_num], (kind, pattern)
+        else:
+            start = now
+            history = self.reputation.decide(sender)
+            now = perf_counter_ns()
+            phases.append(("reputation", now - start))
+            if history:
+                (priority_num, priority_label), rule = history, ("reputation", None)
+            else:
+                start = now
+                priority_num, priority_label = self.adjust_for_business_hours(2, "MOYENNE", plan, received)
+                now = perf_counter_ns()
+                phases.append(("business_hours", now - start))
+                rule = ("default", None)
+                if priority_label.startswith("HH-"):
+                    modifiers = (("business_hours", "hors horaires"),)
+
+        if vip is not None:
+            priority_num, priority_label = min(4, priority_num + 1), f"VIP-{priority_label}"
+            modifiers += (("vip_clients", vip),)
+        return ClassificationTrace(priority_num, priority_label, rule, modifiers, tuple(phases))
+
+    def classify_batch(self, emails):
+        """Classer un lot d'emails en un appel, même résultat que classify_email_priority pour chacun
+
+        Les règles trouvées dans chaque email forment une matrice creuse
+        email x mot-clé (valeur = priorité); le maximum par ligne, le repli
+        (historique de l'expéditeur ou horaires), les VIP et les bloqués sont
+        résolus par opérations sur tableaux si NumPy est installé, en Python sinon.
+        """
+        if self.tracer is not None:
+            # Traçage: chemin email par email, mêmes résultats
+            return [self.classify_email_priority(email_data.get('subject') or "", email_data.get('sender') or "",
+                                                 email_data.get('body') or "") for email_data in emails]
+
+        plan = self.plans.current()
+        rules = plan.rules
+        # Un même expéditeur revient souvent dans un lot: ses règles ne sont évaluées qu'une fois
+        by_sender = {}
+        hits, others, vip, blocked, fallbacks, learned_flags = [], [], [], [], [], []
+        for email_data in emails:
+            sender_lower = (email_data.get('sender') or "").lower()
+            sender_rules = by_sender.get(sender_lower)
+            if sender_rules is None:
+                sender_rules = by_sender[sender_lower] = (
+                    rules.senders.search(sender_lower),
+                    plan.vip.search(sender_lower) > 0,
+                    plan.blocked.search(sender_lower) > 0,
+                    (self.reputation.decide(sender_lower) or (0,))[0]
+                )
+            subject, body = email_data.get('subject') or "", email_data.get('body') or ""
+            word_hits, other = rules.content_hits(subject, body)
+            other, fallback = max(other, sender_rules[0]), sender_rules[3]
+            learned = self.feedback.predict(subject, email_data.get('sender') or "", body,
+                                            max(max(word_hits, default=0), other) or None)
+            if learned:
+                # Correction apprise: elle remplace les règles, comme dans classify_with_business_rules
+                word_hits, other, fallback = [], learned[0], 0
+            hits.append(word_hits)
+            others.append(other)
+            vip.append(sender_rules[1])
+            blocked.append(sender_rules[2])
+            fallbacks.append(fallback)
+            learned_flags.append(bool(learned))
+
+        # Priorité par défaut (aucune règle): calculée une fois pour le lot
+        default_num, default_label = self.adjust_for_business_hours(2, "MOYENNE", plan)
+
+        if NUMPY_AVAILABLE and emails:
+            best, priorities = self.resolve_batch_numpy(hits, others, vip, blocked, fallbacks, default_num)
+        else:
+            best = [max(max(row, default=0), other) for row, other in zip(hits, others)]
+            priorities = []
+            for b, is_vip, is_blocked, fallback in zip(best, vip, blocked, fallbacks):
+                priority_num = b or fallback or default_num
+                if is_blocked:
+                    priority_num = 0
+                elif is_vip:
+                    priority_num = min(4, priority_num + 1)
+                priorities.append(priority_num)
+
+        results = []
+        for b, priority_num, is_vip, is_blocked, fallback, learned in zip(best, priorities, vip, blocked, fallbacks,
+                                                                          learned_flags):
+            if is_blocked:
+                results.append((0, "BLOQUE"))
+                continue
+            label = PRIORITY_LABELS[b or fallback] if b or fallback else default_label
+            result = priority_num, f"VIP-{label}" if is_vip else label
+            # Sans règle (correction apprise, historique, défaut): priorité déduite
+            results.append(inferred(*result) if learned or not b else result)
+        return results
+
+    def resolve_batch_numpy(self, hits, others, vip, blocked, fallbacks, default_num):
+        """Maximum par ligne de la matrice creuse (format CSR) et ajustements vectorisés"""
+        # Chaque ligne commence par un zéro: aucune ligne vide pour reduceat
+        lengths = np.fromiter((len(row) + 1 for row in hits), dtype=np.int64, count=len(hits))
+        offsets = np.zeros(len(hits), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        data = np.fromiter(chain.from_iterable([0] + row for row in hits), dtype=np.int8,
+                           count=int(lengths.sum()))
+
+        best = np.maximum(np.maximum.reduceat(data, offsets), np.array(others, dtype=np.int8))
+        fallbacks = np.array(fallbacks, dtype=np.int8)
+        priorities = np.where(best > 0, best, np.where(fallbacks > 0, fallbacks, default_num))
+        priorities = np.where(np.array(vip), np.minimum(4, priorities + 1), priorities)
+        priorities = np.where(np.array(blocked), 0, priorities)
+        return best.tolist(), priorities.tolist()
+
+    def classify_with_business_rules(self, subject, sender, body, plan=None, received=None):
+        """Classification utilisant les règles de l'entreprise"""
+        plan = plan or self.plans.current()
 
-        # Vérifier chaque niveau de priorité selon la config
-        priorities = [
-            (4, "URGENT", "urgent"),
-            (3, "HAUTE", "high"),
-            (2, "MOYENNE", "medium"),
-            (1, "BASSE", "low")
-        ]
-
-        for priority_num, priority_label, config_key in priorities:
-            rules = self.business_config["priority_rules"][config_key]
-
-            # Vérifier mots-clés
-            if self.check_keywords(text, rules["keywords"]):
-                return priority_num, priority_label
+        # Un seul passage par champ: mots-clés (sujet + corps), expéditeurs, sujets
+        match = plan.rules.match(subject, sender, body)
 
-            # Vérifier expéditeurs spécifiques
-            if self.check_senders(sender_lower, rules.get("senders", [])):
-                return priority_num, priority_label
+        # Des corrections concordantes de l'utilisateur l'emportent sur les règles
+        learned = self.feedback.predict(subject, sender, body, match[0] if match else None)
+        if learned:
+            return learned
+        if match:
+            return match
 
-            # Vérifier sujets spécifiques
-            if self.check_subjects(subject.lower(), rules.get("subjects", [])):
-                return priority_num, priority_label
+        # Aucune règle: l'historique de l'expéditeur, s'il est constant
+        history = self.reputation.decide(sender)
+        if history:
+            return history
 
         # Ajustement selon les horaires de travail
-        return self.adjust_for_business_hours(2, "MOYENNE")
-
-    def check_keywords(self, text, keywords):
-        """Vérifier si le texte contient des mots-clés"""
-        return any(keyword.lower() in text for keyword in keywords)
-
-    def check_senders(self, sender, sender_patterns):
-        """Vérifier si l'expéditeur correspond aux patterns"""
-        for pattern in sender_patterns:
-            if pattern.lower() in sender or sender.endswith(pattern.lower()):
-                return True
-        return False
-
-    def check_subjects(self, subject, subject_patterns):
-        """Vérifier si le sujet correspond aux patterns"""
-        for pattern in subject_patterns:
-            if pattern.lower() in subject:
-                return True
-        return False
+        return inferred(*self.adjust_for_business_hours(2, "MOYENNE", plan, received))
 
     def is_vip_client(self, sender):
-        """Vérifier si l'expéditeur est un client VIP"""
-        vip_clients = self.business_config["special_rules"].get("vip_clients", [])
-        sender_lower = sender.lower()
-
-        for vip in vip_clients:
-            vip_lower = vip.lower()
-            if "@" in vip_lower:
-                # Domaine ou email complet
-                if vip_lower in sender_lower:
-                    return True
-            else:
-                # Mot-clé dans l'email
-                if vip_lower in sender_lower:
-                    return True
-        return False
+        """Vérifier si l'expéditeur est un client VIP (domaine, email complet ou mot-clé)"""
+        return bool(self.plans.current().vip.search(sender.lower()))
 
     def is_blocked_sender(self, sender):
         """Vérifier si l'expéditeur est bloqué"""
-        blocked = self.business_config["special_rules"].get("blocked_senders", [])
-        sender_lower = sender.lower()
-
-        for blocked_pattern in blocked:
-            if blocked_pattern.lower() in sender_lower:
-                return True
-        return False
+        return bool(self.plans.current().blocked.search(sender.lower()))
 
-    def adjust_for_business_hours(self, priority_num, priority_label):
-        """Ajuster la priorité selon les horaires de travail"""
-        try:
-            now = datetime.now().time()
-            business_hours = self.business_config["business_hours"]
-
-            start_time = time.fromisoformat(business_hours["start"])
-            end_time = time.fromisoformat(business_hours["end"])
+    def adjust_for_business_hours(self, priority_num, priority_label, plan=None, received=None):
+        """Ajuster la priorité selon les horaires de travail (à la réception si elle est connue)"""
+        plan = plan or self.plans.current()
+        if plan.business_start is None or plan.business_end is None:
+            return priority_num, priority_label
 
-            # Si hors horaires de travail
-            if not (start_time <= now <= end_time):
-                weekend_priority = business_hours.get("weekend_priority", "normal")
-                if weekend_priority == "low" and priority_num > 1:
-                    # Réduire la priorité sauf pour les urgences
-                    if priority_num < 4:  # Pas urgent
-                        return max(1, priority_num - 1), f"HH-{priority_label}"
+        now = (received.astimezone() if received else datetime.now()).time()
 
-            return priority_num, priority_label
+        # Si hors horaires de travail
+        if not (plan.business_start <= now <= plan.business_end):
+            if plan.weekend_priority == "low" and priority_num > 1:
+                # Réduire la priorité sauf pour les urgences
+                if priority_num < 4:  # Pas urgent
+                    return max(1, priority_num - 1), f"HH-{priority_label}"
 
-        except Exception:
-            # En cas d'erreur, retourner la priorité normale
-            return priority_num, priority_label
+        return priority_num, priority_label
 
     def get_classification_stats(self):
         """Obtenir les statistiques de classification"""
@@ -228,17 +330,14 @@ class AdaptiveEmailClassifier(EmailClassifier):
 
         subject, sender, content = email_data
 
-        # Analyser pourquoi la classification était incorrecte
-        # et suggérer des améliorations
-
         print(f"\nEmail mal classifié:")
         print(f"Sujet: {subject}")
         print(f"De: {sender}")
         print(f"Priorité correcte: {correct_priority}")
 
-        # TODO: Implémenter l'apprentissage automatique des règles
-
-        return True
+        # Poids mis à jour aussitôt (feedback_learner.py); la correction sert aussi
+        # à l'entraînement du modèle local et aux propositions de mots-clés
+        return self.record_feedback(email_id, correct_priority)
 
 def create_industry_template(industry):
     """Créer un template de configuration pour une industrie"""
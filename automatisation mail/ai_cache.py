@@ -0,0 +1,109 @@
+"""
+Cache persistant des classifications IA
+Newsletters, notifications automatiques et modèles de tickets arrivent encore
+et encore avec un contenu presque identique: la réponse de l'IA est gardée
+dans emails_trie.db, indexée par une empreinte du contenu normalisé
+(domaine de l'expéditeur, sujet, 300 premiers caractères du corps).
+Éviction LRU, durée de vie limitée, et invalidation quand le prompt ou le
+modèle change
+"""
+
+import hashlib
+import threading
+import time
+
+from email_store import connect
+from text_normalizer import normalize
+
+def content_key(subject, sender, body):
+    """Empreinte du contenu normalisé (minuscules, sans accents, espaces regroupés)"""
+    sender = (sender or "").lower()
+    domain = sender.rsplit('@', 1)[1].strip('> ') if '@' in sender else sender
+    parts = (domain, normalize(subject or ""), normalize((body or "")[:300]))
+    fingerprint = "\x1f".join(' '.join(part.split()) for part in parts)
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+def cache_version(*parts):
+    """Version du cache: empreinte du prompt et du modèle utilisés"""
+    return hashlib.sha1("\x1f".join(parts).encode('utf-8')).hexdigest()[:16]
+
+class AICache:
+    """Résultats IA par empreinte de contenu, avec éviction LRU et expiration"""
+
+    def __init__(self, version, db_path='emails_trie.db', ttl=7 * 24 * 3600, max_entries=10000):
+        self.version = version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Partagée (sous verrou) par les workers de classification du pipeline
+        self.conn = connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.setup()
+
+    def setup(self):
+        with self.lock, self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS ai_cache (
+                    key TEXT PRIMARY KEY,
+                    priority INTEGER,
+                    priority_label TEXT,
+                    version TEXT,
+                    created REAL,
+                    last_used REAL,
+                    hits INTEGER DEFAULT 0
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache(last_used)')
+            # Prompt ou modèle changé: les anciennes réponses ne sont plus valables
+            self.conn.execute('DELETE FROM ai_cache WHERE version != ?', (self.version,))
+
+    def get(self, key):
+        """(priorité, libellé) en cache et encore valable, sinon None"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT priority, priority_label, created FROM ai_cache WHERE key = ? AND version = ?',
+                (key, self.version)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                self.misses += 1
+                return None
+            with self.conn:
+                self.conn.execute('UPDATE ai_cache SET last_used = ?, hits = hits + 1 WHERE key = ?', (now, key))
+            self.hits += 1
+            return row[0], row[1]
+
+    def put(self, key, priority_num, priority_label):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO ai_cache (key, priority, priority_label, version, created, last_used, hits)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+            ''', (key, priority_num, priority_label, self.version, now, now))
+            self.evict(now)
+
+    def evict(self, now):
+        """Supprimer les entrées expirées puis les moins récemment utilisées au-delà de max_entries"""
+        self.conn.execute('DELETE FROM ai_cache WHERE created < ?', (now - self.ttl,))
+        self.conn.execute('''
+            DELETE FROM ai_cache WHERE key IN (
+                SELECT key FROM ai_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+    def stats(self):
+        """Compteurs de la session et taille du cache"""
+        with self.lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM ai_cache').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+            'entries': entries
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
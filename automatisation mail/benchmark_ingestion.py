@@ -0,0 +1,184 @@
+"""
+Benchmark d'ingestion de bout en bout contre le serveur IMAP local
+Mesure, pour EmailClassifier et AdaptiveEmailClassifier: messages/seconde,
+octets transférés, commandes IMAP et latence par message (p50/p99)
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from adaptive_classifier import AdaptiveEmailClassifier
+from email_classifier import EmailClassifier
+from imap_stub_server import IMAPStubServer, generate_mailbox
+from imap_utils import chunk_uids
+from ingestion_engine import IMAPConnectionPool
+from pipeline import EmailPipeline
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def classify(classifier, email_data):
+    return classifier.classify_email_priority(email_data['subject'] or "", email_data['sender'] or "", email_data['body'])
+
+def run_full_download(classifier, count, batch_size):
+    """Ancien chemin: un FETCH du message complet par email"""
+    mail = classifier.mail
+    status, data = mail.search(None, 'ALL')
+    latencies = []
+    for seq in data[0].split()[-count:]:
+        start = time.perf_counter()
+        status, msg_data = mail.fetch(seq, '(BODY.PEEK[])')
+        classify(classifier, classifier.parse_message(msg_data[0][1]))
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def run_batch_fetch(classifier, count, batch_size):
+    """Chemin actuel: FETCH groupés, BODYSTRUCTURE puis partie texte partielle
+
+    La latence d'un message court du début du FETCH de son lot à la fin de sa classification.
+    """
+    uidvalidity = classifier.select_mailbox('inbox')
+    status, data = classifier.mail.uid('SEARCH', None, 'ALL')
+    uids = [int(uid) for uid in data[0].split()][-count:]
+    latencies = []
+    for batch in chunk_uids(uids, batch_size):
+        start = time.perf_counter()
+        for email_data in classifier.fetch_messages(batch, 'inbox', uidvalidity):
+            classify(classifier, email_data)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+class TimedPipeline(EmailPipeline):
+    """Pipeline qui mesure la latence par message, comme run_batch_fetch
+
+    La latence d'un message court du début du FETCH de son lot à sa mise en file d'écriture.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fetch_started = {}
+        self.latencies = []
+        fetch_messages = self.classifier.fetch_messages
+
+        def timed_fetch(uids, *args, **kwargs):
+            start = time.perf_counter()
+            self.fetch_started.update((uid, start) for uid in uids)
+            return fetch_messages(uids, *args, **kwargs)
+
+        self.classifier.fetch_messages = timed_fetch
+
+    def persist(self, email_data):
+        super().persist(email_data)
+        # Un seul worker de sauvegarde: pas de verrou
+        self.latencies.append(time.perf_counter() - self.fetch_started[email_data['uid']])
+
+def run_scenario(server, name, classifier_factory, runner, count, batch_size):
+    classifier = classifier_factory()
+    classifier.connect_to_email("bench@example.com", "x", "127.0.0.1", server.port, use_ssl=False)
+    server.reset_counters()
+
+    start = time.perf_counter()
+    latencies = runner(classifier, count, batch_size)
+    elapsed = time.perf_counter() - start
+
+    classifier.mail.logout()
+    classifier.close()
+    return result_row(name, len(latencies), elapsed, server, latencies)
+
+def run_pipeline(server, name, classifier_factory, count, batch_size, fetch_workers=4):
+    """Pipeline complet (récupération parallèle, classification, sauvegarde)"""
+    account = {"email": f"bench-{name}@example.com", "password": "x", "imap_server": "127.0.0.1",
+               "port": server.port, "ssl": False}
+    pool = IMAPConnectionPool(fetch_workers + 1, fetch_workers + 1)
+    email_pipeline = TimedPipeline(classifier_factory=classifier_factory)
+    server.reset_counters()
+
+    start = time.perf_counter()
+    pipeline = email_pipeline.run_imap(pool, account, 'inbox', fetch_workers, batch_size, count)
+    elapsed = time.perf_counter() - start
+
+    processed = pipeline.stats()['stages']['persist']['processed']
+    pool.close_all()
+    email_pipeline.classifier.close()
+    email_pipeline.close()
+    return result_row(name, processed, elapsed, server, email_pipeline.latencies)
+
+def result_row(name, messages, elapsed, server, latencies):
+    return {
+        'scenario': name,
+        'messages': messages,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(messages / elapsed, 1) if elapsed else 0,
+        'bytes_transferred': server.bytes_sent,
+        'bytes_per_message': round(server.bytes_sent / messages) if messages else 0,
+        'imap_commands': server.commands,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+def run_benchmark(messages=1000, html_ratio=0.2, attachment_ratio=0.1, attachment_kb=512, batch_size=200, seed=42):
+    """Lancer tous les scénarios contre une même boîte générée"""
+    server = IMAPStubServer(generate_mailbox(messages, seed, html_ratio, attachment_ratio, attachment_kb))
+    server.start()
+
+    config_file = os.path.join(BASE_DIR, "business_config.json")
+    classifiers = {
+        'EmailClassifier': EmailClassifier,
+        'AdaptiveEmailClassifier': lambda: AdaptiveEmailClassifier(config_file),
+    }
+
+    # Base de données jetable: le benchmark ne touche pas emails_trie.db
+    previous_dir = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="bench_ingestion_"))
+    results = []
+    try:
+        for label, factory in classifiers.items():
+            results.append(run_scenario(server, f"{label} / téléchargement complet", factory,
+                                        run_full_download, messages, batch_size))
+            results.append(run_scenario(server, f"{label} / FETCH groupé partiel", factory,
+                                        run_batch_fetch, messages, batch_size))
+            results.append(run_pipeline(server, f"{label} / pipeline", factory, messages, batch_size))
+    finally:
+        os.chdir(previous_dir)
+        server.stop()
+
+    return results
+
+def print_results(results):
+    print(f"{'Scénario':<55} {'msg/s':>9} {'octets/msg':>11} {'cmds':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    print("-" * 102)
+    for row in results:
+        p50 = row['p50_ms'] if row['p50_ms'] is not None else "-"
+        p99 = row['p99_ms'] if row['p99_ms'] is not None else "-"
+        print(f"{row['scenario']:<55} {row['messages_per_second']:>9} {row['bytes_per_message']:>11} "
+              f"{row['imap_commands']:>6} {p50:>8} {p99:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark d'ingestion IMAP local")
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--html-ratio', type=float, default=0.2)
+    parser.add_argument('--attachment-ratio', type=float, default=0.1)
+    parser.add_argument('--attachment-kb', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="Fichier de sortie des résultats (JSON)")
+    args = parser.parse_args()
+
+    print(f"Boîte générée: {args.messages} messages, {args.html_ratio:.0%} HTML uniquement, "
+          f"{args.attachment_ratio:.0%} avec pièce jointe de {args.attachment_kb} Ko\n")
+    results = run_benchmark(args.messages, args.html_ratio, args.attachment_ratio,
+                            args.attachment_kb, args.batch_size, args.seed)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nRésultats sauvegardés: {args.json}")
@@ -0,0 +1,221 @@
+"""
+Benchmark de précision et de débit des profils d'entreprise
+Chaque profil de BusinessProfiles classe un corpus étiqueté de son secteur
+(généré à partir des modèles d'emails annotés de corpus_generator, ou lu
+depuis un fichier JSONL). Rapport: matrice de confusion, précision et rappel par
+priorité, emails/seconde (email par email et par lots), mémoire.
+Les résultats sont enregistrés en JSON; --compare signale les régressions
+par rapport à un précédent résultat
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from adaptive_classifier import AdaptiveEmailClassifier
+from business_profiles import BusinessProfiles
+from corpus_generator import DAYS, LABELED_TEMPLATES, NAMES
+from keyword_matcher import PRIORITY_LABELS
+
+# Niveaux de la matrice de confusion (0: expéditeur bloqué)
+LEVELS = (4, 3, 2, 1, 0)
+LEVEL_LABELS = {**PRIORITY_LABELS, 0: "BLOQUE"}
+
+def generate_labeled_corpus(industry, count, seed=42):
+    """`count` emails étiquetés du secteur: dictionnaires (subject, sender, body, date, priority)
+
+    Les dates tombent en semaine pendant les heures de bureau: la priorité
+    attendue est celle qu'un humain donnerait, sans ajustement hors horaires.
+    """
+    rng = random.Random(seed)
+    templates = LABELED_TEMPLATES[industry]
+    start = datetime(2025, 1, 6, 9, 0)
+    records = []
+    for n in range(count):
+        priority, sender, subject, body = rng.choice(templates)
+        fields = {'n': rng.randint(1, 999), 'name': rng.choice(NAMES), 'day': rng.choice(DAYS),
+                  'amount': rng.choice([49, 150, 980, 2500, 12000, 50000])}
+        received = start + timedelta(days=rng.randint(0, 51) // 5 * 7 + rng.randint(0, 4),
+                                     minutes=rng.randint(0, 8 * 60))
+        records.append({
+            'subject': subject.format(**fields),
+            'sender': sender.format(**fields),
+            'body': body.format(**fields),
+            'date': received.isoformat(),
+            'priority': priority,
+        })
+    return records
+
+def load_corpus(path):
+    """Corpus JSONL: un email par ligne (subject, sender, body, priority; date facultative)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def classification_metrics(expected, predicted):
+    """Matrice de confusion (attendu x prédit), précision et rappel par niveau, exactitude"""
+    matrix = {LEVEL_LABELS[e]: {LEVEL_LABELS[p]: 0 for p in LEVELS} for e in LEVELS}
+    for e, p in zip(expected, predicted):
+        matrix[LEVEL_LABELS[e]][LEVEL_LABELS[p]] += 1
+
+    per_class = {}
+    for level in LEVELS:
+        label = LEVEL_LABELS[level]
+        true_positives = matrix[label][label]
+        predicted_total = sum(matrix[row][label] for row in matrix)
+        expected_total = sum(matrix[label].values())
+        if not expected_total and not predicted_total:
+            continue
+        precision = true_positives / predicted_total if predicted_total else 0.0
+        recall = true_positives / expected_total if expected_total else 0.0
+        per_class[label] = {
+            'precision': round(precision, 4),
+            'recall': round(recall, 4),
+            'f1': round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+            'support': expected_total,
+        }
+    correct = sum(e == p for e, p in zip(expected, predicted))
+    return {'accuracy': round(correct / len(expected), 4) if expected else 0.0,
+            'confusion': matrix, 'per_class': per_class}
+
+def classify_single(classifier, records, received):
+    return [classifier.classify_email_priority(r['subject'], r['sender'], r['body'], received=date)[0]
+            for r, date in zip(records, received)]
+
+def best_time(function, repeat):
+    """Durée du plus rapide de `repeat` passages (le moins perturbé par le reste de la machine)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run_profile(profile_name, records, batch_size=500, repeat=3):
+    """Précision, débit et mémoire d'un profil sur le corpus"""
+    config = BusinessProfiles().create_config_from_profile(profile_name, f"Benchmark {profile_name}")
+    config_file = os.path.abspath(f"bench_{profile_name}_config.json")
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)
+    received = [datetime.fromisoformat(r['date']) if r.get('date') else None for r in records]
+
+    # Mémoire: construction du classificateur et un passage complet
+    tracemalloc.start()
+    classifier = AdaptiveEmailClassifier(config_file)
+    predicted = classify_single(classifier, records, received)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Débit: caches déjà chauds, comme en production après les premiers emails
+    single_seconds = best_time(lambda: classify_single(classifier, records, received), repeat)
+    batches = [[{'subject': r['subject'], 'sender': r['sender'], 'body': r['body']} for r in records[i:i + batch_size]]
+               for i in range(0, len(records), batch_size)]
+    batch_seconds = best_time(lambda: [classifier.classify_batch(batch) for batch in batches], repeat)
+    classifier.close()
+
+    result = classification_metrics([r['priority'] for r in records], predicted)
+    result.update({
+        'emails': len(records),
+        'emails_per_second': round(len(records) / single_seconds, 1) if single_seconds else 0,
+        'batch_emails_per_second': round(len(records) / batch_seconds, 1) if batch_seconds else 0,
+        'peak_memory_kb': round(peak / 1024),
+        'rule_count': sum(len(rules.get(kind, [])) for rules in config['priority_rules'].values()
+                          for kind in ('keywords', 'senders', 'subjects')),
+    })
+    return result
+
+def run_benchmark(profiles=None, count=20000, seed=42, corpus=None, batch_size=500, repeat=3):
+    """Tous les profils (ou `profiles`), chacun sur le corpus de son secteur ou sur `corpus`"""
+    profiles = profiles or list(BusinessProfiles().profiles)
+    fixed = load_corpus(corpus) if corpus else None
+
+    # Base de données jetable: le benchmark ne touche pas emails_trie.db
+    previous_dir = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="bench_profiles_"))
+    results = {}
+    try:
+        for profile_name in profiles:
+            records = fixed if fixed is not None else generate_labeled_corpus(profile_name, count, seed)
+            results[profile_name] = run_profile(profile_name, records, batch_size, repeat)
+    finally:
+        os.chdir(previous_dir)
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus or f"généré ({count} emails par profil, graine {seed})",
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'profiles': results,
+    }
+
+def print_results(report):
+    for profile_name, result in report['profiles'].items():
+        print(f"\n{'=' * 70}\n {profile_name.upper()}: exactitude {result['accuracy']:.1%} "
+              f"sur {result['emails']} emails, "
+              f"{result['emails_per_second']:.0f} emails/s ({result['batch_emails_per_second']:.0f} par lots), "
+              f"{result['peak_memory_kb']} Ko")
+        print(f"{'=' * 70}")
+        labels = [LEVEL_LABELS[level] for level in LEVELS]
+        print(f"{'attendu / prédit':<18}" + "".join(f"{label:>9}" for label in labels))
+        for expected_label in labels:
+            row = result['confusion'][expected_label]
+            if sum(row.values()):
+                print(f"{expected_label:<18}" + "".join(f"{row[label]:>9}" for label in labels))
+        print(f"{'':<18}{'précision':>10}{'rappel':>9}{'f1':>8}{'emails':>9}")
+        for label, stats in result['per_class'].items():
+            print(f"{label:<18}{stats['precision']:>10.1%}{stats['recall']:>9.1%}{stats['f1']:>8.2f}"
+                  f"{stats['support']:>9}")
+
+def compare_results(report, baseline, tolerance=0.005, speed_tolerance=0.2):
+    """Régressions par rapport à un résultat précédent: exactitude en baisse, débit en forte baisse"""
+    if baseline.get('corpus') != report['corpus']:
+        print(f"Corpus différent de la référence ({baseline.get('corpus')}): pas de comparaison")
+        return []
+    regressions = []
+    for profile_name, result in report['profiles'].items():
+        before = baseline.get('profiles', {}).get(profile_name)
+        if not before:
+            continue
+        accuracy_delta = result['accuracy'] - before['accuracy']
+        speed_ratio = result['emails_per_second'] / before['emails_per_second'] if before['emails_per_second'] else 1
+        print(f"{profile_name:<14} exactitude {accuracy_delta:+.2%}, débit {speed_ratio - 1:+.1%}")
+        if accuracy_delta < -tolerance:
+            regressions.append(f"{profile_name}: exactitude {before['accuracy']:.2%} -> {result['accuracy']:.2%}")
+        if speed_ratio < 1 - speed_tolerance:
+            regressions.append(f"{profile_name}: débit {before['emails_per_second']:.0f} -> "
+                               f"{result['emails_per_second']:.0f} emails/s")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Précision et débit des profils d'entreprise sur un corpus étiqueté")
+    parser.add_argument('--profiles', nargs='*', help="Profils à mesurer (tous par défaut)")
+    parser.add_argument('--count', type=int, default=20000, help="Emails générés par profil")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--corpus', help="Corpus étiqueté JSONL à utiliser pour tous les profils")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3, help="Passages chronométrés (le plus rapide est retenu)")
+    parser.add_argument('--json', default="benchmark_profiles.json", help="Fichier de sortie des résultats (JSON)")
+    parser.add_argument('--compare', help="Résultat précédent: code de sortie 1 en cas de régression")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.profiles, args.count, args.seed, args.corpus, args.batch_size, args.repeat)
+    print_results(report)
+
+    with open(args.json, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nRésultats sauvegardés: {args.json}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare_results(report, json.load(f))
+        if regressions:
+            print("\nRÉGRESSIONS:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,202 @@
+"""
+Import hors ligne d'archives mbox, Maildir ou de dossiers de fichiers .eml
+Les messages passent par le même pipeline que process_emails
+(analyse -> classify_email_priority -> sauvegarde), en flux et par gros lots,
+avec reprise automatique après interruption
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+
+from email_classifier import EmailClassifier, compute_message_key
+from email_store import STATEMENTS_PER_EMAIL, EmailStoreError
+from reputation import InferredPriority
+
+# Attente maximale (secondes) avant de valider un lot incomplet
+IMPORT_FLUSH_INTERVAL = 60.0
+
+# Messages illisibles détaillés par source; les suivants sont seulement comptés
+MAX_LOGGED_ERRORS = 20
+
+def iter_mbox(path, start_offset=0):
+    """Lire un fichier mbox message par message
+
+    Produit (position du message suivant, octets bruts) sans charger le
+    fichier en mémoire; la position sert de point de reprise.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        position = start_offset
+        lines = []
+        for line in f:
+            if line.startswith(b'From '):
+                # Ligne séparatrice: elle ne fait pas partie du message
+                if lines:
+                    yield position, b''.join(lines)
+                lines = []
+            else:
+                lines.append(line)
+            position += len(line)
+        if lines:
+            yield position, b''.join(lines)
+
+def iter_files(paths, after=None):
+    """Lire une liste triée de fichiers: (nom du fichier, octets bruts)"""
+    for path in paths:
+        if after is not None and path <= after:
+            continue
+        with open(path, 'rb') as f:
+            yield path, f.read()
+
+def list_maildir(path):
+    """Fichiers d'un Maildir (cur puis new), en ordre stable"""
+    files = []
+    for folder in ('cur', 'new'):
+        folder_path = os.path.join(path, folder)
+        if os.path.isdir(folder_path):
+            files.extend(entry.path for entry in os.scandir(folder_path) if entry.is_file())
+    return sorted(files)
+
+def list_eml(path):
+    """Fichiers .eml d'un dossier (récursif), en ordre stable"""
+    files = []
+    for root, dirs, names in os.walk(path):
+        files.extend(os.path.join(root, name) for name in names if name.lower().endswith('.eml'))
+    return sorted(files)
+
+class BulkImporter:
+    """Import en flux avec commits par lots et point de reprise"""
+
+    def __init__(self, classifier=None, batch_size=1000, report_every=5000):
+        self.classifier = classifier or EmailClassifier()
+        self.batch_size = batch_size
+        self.report_every = report_every
+        # Une transaction d'écriture par lot: ses emails, leur indexation et le point de reprise.
+        # Le lot est validé plein, même si le classement de ses emails prend plus de flush_interval
+        store = self.classifier.store
+        store.batch_size = STATEMENTS_PER_EMAIL * batch_size + 1
+        store.flush_interval = max(store.flush_interval, IMPORT_FLUSH_INTERVAL)
+        self.setup_checkpoints()
+
+    def setup_checkpoints(self):
+        """Table des points de reprise par source importée"""
+        cursor = self.classifier.conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                source TEXT PRIMARY KEY,
+                position TEXT,
+                imported INTEGER,
+                updated TEXT
+            )
+        ''')
+        self.classifier.conn.commit()
+
+    def load_checkpoint(self, source):
+        cursor = self.classifier.conn.cursor()
+        cursor.execute('SELECT position, imported FROM import_checkpoints WHERE source = ?', (source,))
+        return cursor.fetchone() or (None, 0)
+
+    def save_checkpoint(self, source, position, imported):
+        """Mettre en file le point de reprise, validé avec les emails qui le précèdent"""
+        self.classifier.store.add('''
+            INSERT OR REPLACE INTO import_checkpoints (source, position, imported, updated)
+            VALUES (?, ?, ?, ?)
+        ''', (source, str(position), imported, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    def open_source(self, path, position):
+        """Choisir le lecteur selon le type de source, en reprenant à `position`"""
+        if os.path.isfile(path) and not path.lower().endswith('.eml'):
+            return 'mbox', iter_mbox(path, int(position or 0))
+        if os.path.isfile(path):
+            return 'eml', iter_files([path], position)
+        if all(os.path.isdir(os.path.join(path, folder)) for folder in ('cur', 'new')):
+            return 'maildir', iter_files(list_maildir(path), position)
+        return 'eml', iter_files(list_eml(path), position)
+
+    def import_source(self, path):
+        """Importer une archive; retourne (importés, erreurs, messages/seconde)"""
+        source = os.path.abspath(path)
+        position, already_imported = self.load_checkpoint(source)
+        kind, messages = self.open_source(path, position)
+        if position:
+            print(f"Reprise de {source} ({already_imported} messages déjà importés)")
+
+        store = self.classifier.store
+        imported = errors = in_batch = 0
+        start = time.perf_counter()
+
+        for position, raw in messages:
+            try:
+                email_data = self.classifier.parse_message(raw)
+                result = self.classifier.classify_email_priority(
+                    email_data['subject'] or "",
+                    email_data['sender'] or "",
+                    email_data['body']
+                )
+                priority_num, priority_label = result
+                email_data['priority_inferred'] = isinstance(result, InferredPriority)
+                email_data['mailbox'] = f"{kind}:{os.path.basename(source)}"
+                message_key = None if email_data.get('message_id') else compute_message_key(email_data)
+                store.add_email(email_data, priority_num, priority_label, message_key)
+                imported += 1
+            except Exception as e:
+                # Message illisible ou inclassable: l'import continue avec les suivants
+                errors += 1
+                if errors <= MAX_LOGGED_ERRORS:
+                    print(f"  Message ignoré ({position}): {type(e).__name__}: {e}")
+                elif errors == MAX_LOGGED_ERRORS + 1:
+                    print("  Messages ignorés suivants: comptés sans détail")
+
+            in_batch += 1
+            if in_batch >= self.batch_size:
+                self.save_checkpoint(source, position, already_imported + imported)
+                in_batch = 0
+
+            if imported and imported % self.report_every == 0:
+                rate = imported / (time.perf_counter() - start)
+                print(f"  {imported} messages importés ({rate:.0f} msg/s)")
+
+        self.save_checkpoint(source, position or '', already_imported + imported)
+        try:
+            store.flush()
+        except EmailStoreError as e:
+            # Requêtes refusées par la base: les autres emails sont validés
+            print(f"  {e}")
+
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed > 0 else 0
+        return imported, errors, rate
+
+def main():
+    parser = argparse.ArgumentParser(description="Import d'archives mbox, Maildir ou .eml")
+    parser.add_argument('sources', nargs='+', help="Fichiers mbox, dossiers Maildir ou dossiers de .eml")
+    parser.add_argument('--adaptive', action='store_true', help="Utiliser la configuration business")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.adaptive:
+        from adaptive_classifier import AdaptiveEmailClassifier
+        classifier = AdaptiveEmailClassifier()
+    else:
+        classifier = EmailClassifier()
+
+    importer = BulkImporter(classifier, args.batch_size)
+    failures = 0
+    for source in args.sources:
+        print(f"Import de {source}...")
+        imported, errors, rate = importer.import_source(source)
+        failures += errors
+        print(f"OK - {imported} messages importés, {errors} erreurs, {rate:.0f} msg/s")
+
+    stats = classifier.store.stats()
+    print(f"Écritures: {stats['rows']} lignes en {stats['transactions']} transactions "
+          f"({stats['rows_per_second']} lignes/s), {stats['rejected']} rejetées")
+    if failures:
+        print(f"{failures} messages non importés au total")
+
+    classifier.close()
+
+if __name__ == "__main__":
+    main()
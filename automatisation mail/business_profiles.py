@@ -326,7 +326,7 @@ class BusinessProfiles:
                 "industry": profile_name,
                 "profile_used": profile["name"],
                 "size": "",
-                "email_volume": profile["config"]["company_info"].get("typical_volume", "")
+                "email_volume": profile["config"].get("company_info", {}).get("typical_volume", "")
             },
             "priority_rules": profile["config"]["priority_rules"],
             "business_hours": profile["config"].get("business_hours", {
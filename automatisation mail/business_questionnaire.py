@@ -6,6 +6,8 @@ import json
 import os
 from datetime import datetime
 
+from rule_plan import save_business_config
+
 class BusinessQuestionnaire:
     def __init__(self):
         self.config_file = "business_config.json"
@@ -327,11 +329,18 @@ class BusinessQuestionnaire:
         config["created_at"] = datetime.now().isoformat()
         config["version"] = "1.0"
 
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        # Écriture atomique: les classificateurs en cours rechargent les nouvelles règles
+        save_business_config(config, self.config_file)
 
         print(f"\nConfiguration sauvegardée: {self.config_file}")
 
+        # Emails déjà triés: seuls ceux touchés par les règles modifiées sont reclassés
+        if os.path.exists('emails_trie.db'):
+            from reclassify import reclassify_stored_emails
+            stats = reclassify_stored_emails(self.config_file)
+            if stats['rescored']:
+                print(f"Emails reclassés: {stats['changed']} changés sur {stats['rescored']} concernés")
+
     def load_config(self):
         """Charger la configuration existante"""
         if os.path.exists(self.config_file):
@@ -0,0 +1,196 @@
+"""
+Traçage de la classification: règle décisive par email, compteurs par règle
+et par niveau, durée de chaque phase (bloqués, VIP, corrections apprises,
+règles, historique, horaires, IA)
+Désactivé par défaut: le classificateur ne fait alors qu'un test
+`tracer is None` par email. Activé (enable_tracing() ou CLASSIFICATION_TRACE=1),
+chaque email suit un chemin détaillé qui donne le même résultat.
+En ligne de commande, classe les emails en base avec et sans traçage,
+affiche le surcoût mesuré et le rapport (règles les plus utilisées, les
+plus coûteuses, jamais déclenchées)
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter, deque
+from itertools import chain
+from typing import NamedTuple, Optional, Tuple
+
+from keyword_matcher import PRIORITY_LEVELS
+
+# Ordre d'exécution des phases
+PHASES = ("blocked", "vip", "feedback", "rules", "reputation", "business_hours", "ai")
+
+# Traces mises en attente avant d'être comptées par lot
+FLUSH_SIZE = 4096
+
+class ClassificationTrace(NamedTuple):
+    """Détail de la classification d'un email
+
+    rule: (type, règle) qui a fixé la priorité: type de règle de la
+    configuration ("keywords", "senders", "subjects", "vip_clients",
+    "blocked_senders") ou "feedback", "reputation", "default".
+    modifiers: règles qui ont ensuite ajusté la priorité (VIP, hors horaires).
+    phases: (phase, durée en nanosecondes) dans l'ordre d'exécution.
+    """
+    priority: int
+    label: str
+    rule: Tuple[str, Optional[str]]
+    modifiers: tuple
+    phases: tuple
+
+class ClassificationTracer:
+    """Compteurs agrégés des traces, et dernières traces gardées pour inspection
+
+    record() ne fait que mettre la trace en attente; les compteurs sont mis
+    à jour par lots (flush), avant chaque lecture ou toutes les FLUSH_SIZE traces.
+    """
+
+    def __init__(self, keep=1000):
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.reset()
+
+    def reset(self):
+        self.pending.clear()
+        self.emails = 0
+        self.rule_hits = Counter()
+        # Durée des emails décidés par chaque règle: les règles qui coûtent le plus
+        self.rule_ns = Counter()
+        self.level_hits = Counter()
+        self.phase_ns = dict.fromkeys(PHASES, 0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.recent = deque(maxlen=self.keep)
+
+    def record(self, trace, subject=None, sender=None):
+        """Ajouter la trace d'un email (règle décisive, ajustements, niveau, phases)"""
+        pending = self.pending
+        pending.append((sender, subject, trace))
+        if len(pending) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Compter les traces en attente"""
+        with self.lock:
+            pending = self.pending
+            batch = [pending.popleft() for _ in range(len(pending))]
+            if not batch:
+                return
+            traces = [trace for _, _, trace in batch]
+            self.emails += len(traces)
+            self.level_hits.update(trace.priority for trace in traces)
+            self.rule_hits.update(trace.rule for trace in traces)
+            self.rule_hits.update(chain.from_iterable(trace.modifiers for trace in traces))
+            phase_ns, phase_calls, rule_ns = self.phase_ns, self.phase_calls, self.rule_ns
+            for trace in traces:
+                elapsed = 0
+                for phase, duration in trace.phases:
+                    phase_ns[phase] += duration
+                    phase_calls[phase] += 1
+                    elapsed += duration
+                rule_ns[trace.rule] += elapsed
+            self.recent.extend(batch)
+
+    def record_phase(self, phase, duration, calls=1):
+        """Compter une phase hors trace d'email (appels IA groupés)"""
+        with self.lock:
+            self.phase_ns[phase] += duration
+            self.phase_calls[phase] += calls
+
+    def never_fired(self, config):
+        """Règles de la configuration qui n'ont décidé ni ajusté aucun email: [(type, règle, niveau)]"""
+        self.flush()
+        unused = []
+        priority_rules = config.get("priority_rules", {})
+        for _, priority_label, config_key in PRIORITY_LEVELS:
+            for kind in ("keywords", "senders", "subjects"):
+                unused.extend((kind, pattern, priority_label)
+                              for pattern in priority_rules.get(config_key, {}).get(kind, [])
+                              if not self.rule_hits[(kind, pattern)])
+        special_rules = config.get("special_rules", {})
+        for kind in ("vip_clients", "blocked_senders"):
+            unused.extend((kind, pattern, "") for pattern in special_rules.get(kind, [])
+                          if not self.rule_hits[(kind, pattern)])
+        return unused
+
+    def summary(self, config=None, top=20):
+        """Compteurs sous forme sérialisable en JSON"""
+        self.flush()
+        with self.lock:
+            summary = {
+                'emails': self.emails,
+                'levels': {str(priority): count for priority, count in sorted(self.level_hits.items())},
+                'rules': [{'type': kind, 'rule': rule, 'hits': hits,
+                           'total_us': round(self.rule_ns[(kind, rule)] / 1000, 1)}
+                          for (kind, rule), hits in self.rule_hits.most_common(top)],
+                'costliest': [{'type': kind, 'rule': rule, 'total_us': round(ns / 1000, 1)}
+                              for (kind, rule), ns in self.rule_ns.most_common(top)],
+                'phases': {phase: {'calls': self.phase_calls[phase],
+                                   'total_ms': round(self.phase_ns[phase] / 1e6, 3),
+                                   'mean_us': round(self.phase_ns[phase] / self.phase_calls[phase] / 1000, 2)}
+                           for phase in PHASES if self.phase_calls[phase]}
+            }
+        if config is not None:
+            summary['never_fired'] = [{'type': kind, 'rule': rule, 'level': level}
+                                      for kind, rule, level in self.never_fired(config)]
+        return summary
+
+    def report(self, config=None, top=10):
+        """Rapport lisible: niveaux, règles les plus utilisées et coûteuses, phases, règles inutilisées"""
+        summary = self.summary(config, top)
+        lines = [f"{summary['emails']} emails tracés",
+                 "Par niveau: " + ", ".join(f"{level}: {count}" for level, count in summary['levels'].items())]
+        lines.append("Règles décisives les plus fréquentes:")
+        lines.extend(f"  {entry['hits']:>7}  {entry['type']:<16} {entry['rule'] or ''}" for entry in summary['rules'])
+        lines.append("Règles les plus coûteuses (durée cumulée des emails décidés):")
+        lines.extend(f"  {entry['total_us'] / 1000:>9.2f} ms  {entry['type']:<16} {entry['rule'] or ''}"
+                     for entry in summary['costliest'])
+        lines.append("Phases:")
+        lines.extend(f"  {phase:<15} {stats['calls']:>7} appels  {stats['total_ms']:>9.2f} ms  "
+                     f"{stats['mean_us']:>7.2f} µs/appel" for phase, stats in summary['phases'].items())
+        if config is not None:
+            lines.append(f"Règles jamais déclenchées ({len(summary['never_fired'])}):")
+            lines.extend(f"  {entry['type']:<16} {entry['level']:<8} {entry['rule']}"
+                         for entry in summary['never_fired'])
+        return "\n".join(lines)
+
+def classify_rows(classifier, rows):
+    start = time.perf_counter()
+    for subject, sender, content in rows:
+        classifier.classify_email_priority(subject or "", sender or "", content or "")
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracer la classification des emails enregistrés")
+    parser.add_argument('--config', default="business_config.json")
+    parser.add_argument('--limit', type=int, default=10000)
+    parser.add_argument('--json', help="Enregistrer les compteurs dans ce fichier")
+    args = parser.parse_args()
+
+    from adaptive_classifier import AdaptiveEmailClassifier
+    classifier = AdaptiveEmailClassifier(args.config)
+    rows = classifier.conn.execute('SELECT subject, sender, content FROM emails ORDER BY id DESC LIMIT ?',
+                                   (args.limit,)).fetchall()
+
+    # Premier passage pour chauffer les caches, puis sans et avec traçage
+    classify_rows(classifier, rows)
+    plain = classify_rows(classifier, rows)
+    tracer = classifier.enable_tracing()
+    traced = classify_rows(classifier, rows)
+    classifier.disable_tracing()
+
+    config = classifier.business_config
+    print(tracer.report(config))
+    if plain > 0:
+        print(f"\nSurcoût du traçage: {(traced / plain - 1):+.1%} ({len(rows)} emails, "
+              f"{plain * 1000:.1f} ms sans, {traced * 1000:.1f} ms avec)")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(tracer.summary(config, top=100), f, indent=2, ensure_ascii=False)
+    classifier.close()
+
+if __name__ == "__main__":
+    main()
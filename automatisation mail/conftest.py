@@ -0,0 +1,11 @@
+"""
+Fixtures partagées des tests (python -m pytest)
+"""
+
+import pytest
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    """Répertoire de travail temporaire: base emails_trie.db neuve pour chaque test, supprimée par pytest"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
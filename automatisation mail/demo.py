@@ -4,7 +4,6 @@ Script de démonstration pour tester la classification sans emails réels
 
 from email_classifier import EmailClassifier
 import sqlite3
-from datetime import datetime
 
 def create_demo_data():
     """Créer des données de démonstration"""
@@ -46,26 +45,15 @@ def create_demo_data():
 
     # Traiter chaque email de démonstration
     for email_data in demo_emails:
-        priority_num, priority_label = classifier.classify_email_priority(
+        result = classifier.classify_email_priority(
             email_data['subject'],
             email_data['sender'],
             email_data['body']
         )
 
-        # Sauvegarder en base
+        # Sauvegarder en base (sans doublon si la démo est relancée)
         cursor = classifier.conn.cursor()
-        cursor.execute('''
-            INSERT INTO emails (sender, subject, content, priority, priority_label, date_received, processed_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            email_data['sender'],
-            email_data['subject'],
-            email_data['body'],
-            priority_num,
-            priority_label,
-            email_data['date'],
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ))
+        classifier.save_email(cursor, email_data, result)
 
     classifier.conn.commit()
     classifier.close()
@@ -75,7 +63,10 @@ def show_results():
     """Afficher les résultats du tri"""
     conn = sqlite3.connect('emails_trie.db')
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM emails ORDER BY priority DESC, processed_date DESC')
+    cursor.execute('''
+        SELECT id, sender, subject, content, priority, priority_label, date_received, processed_date
+        FROM emails ORDER BY priority DESC, processed_date DESC
+    ''')
     emails = cursor.fetchall()
 
     print("\n" + "="*80)
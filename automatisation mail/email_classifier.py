@@ -1,16 +1,26 @@
 import imaplib
 import email
-from email.header import decode_header
-import sqlite3
+from email.header import decode_header, make_header
 import re
+import hashlib
 from datetime import datetime
+import json
 import os
-
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+import time
+
+from ai_cache import AICache, cache_version, content_key
+from classification_trace import ClassificationTracer
+from email_search import rebuild_search_index, search_emails, setup_search_index
+from email_store import (EmailStore, INDEX_TERMS_SQL, SAVE_RULE_PLAN_SQL, UPSERT_EMAIL_SQL, connect, email_row,
+                         index_terms, received_at)
+from keyword_matcher import CompiledRules, PRIORITY_LABELS
+from llm_client import AI_BATCH_PROMPT_TEMPLATE, AI_MODEL, AI_PROMPT_TEMPLATE, DEFAULT_BASE_URL, AsyncLLMClient
+from feedback_learner import FeedbackLearner
+from local_model import DEFAULT_MODEL_PATH, LocalPriorityModel
+from reputation import InferredPriority, SenderReputation, inferred, rebuild_reputation, setup_reputation
+from rule_plan import plan_version
+from imap_utils import (compress_uid_set, chunk_uids, split_fetch_response, decode_partial,
+                        parse_bodystructure, select_text_part, html_to_text)
 
 try:
     from dotenv import load_dotenv
@@ -18,16 +28,104 @@ try:
 except ImportError:
     pass
 
+# Mots-clés pour classification rapide
+DEFAULT_RULES_CONFIG = {
+    "priority_rules": {
+        "urgent": {"keywords": ['urgent', 'emergency', 'problème', 'panne', 'réclamation', 'plainte', 'incident']},
+        "high": {"keywords": ['réservation', 'booking', 'demande', 'nouveau client', 'rdv', 'rendez-vous']},
+        "low": {"keywords": ['newsletter', 'promo', 'marketing', 'publicité', 'unsubscribe']}
+    }
+}
+DEFAULT_RULES = CompiledRules(DEFAULT_RULES_CONFIG["priority_rules"])
+DEFAULT_RULE_VERSION = plan_version(DEFAULT_RULES_CONFIG)
+
+def decode_text(payload, charset):
+    """Décoder un contenu selon son jeu de caractères déclaré (utf-8 par défaut)"""
+    if not payload:
+        return ""
+    try:
+        return payload.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        return payload.decode('utf-8', errors='replace')
+
+def decode_subject(value):
+    """Décoder un sujet RFC 2047, y compris réparti sur plusieurs mots encodés"""
+    if not value:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except (LookupError, UnicodeDecodeError):
+        subject, charset = decode_header(value)[0]
+        return decode_text(subject, charset) if isinstance(subject, bytes) else subject
+
+# Essais d'un UID en échec avant de l'abandonner (il reste dans imap_failed_uids)
+MAX_UID_ATTEMPTS = 5
+
+# Lignes lues par lot pendant une migration: mémoire constante quelle que soit la taille de la base
+MIGRATION_BATCH_SIZE = 1000
+
+def rows_by_id(cursor, columns, where="1", batch_size=MIGRATION_BATCH_SIZE):
+    """Lots de lignes (id, *columns) de la table emails, dans l'ordre des id (pagination par clé)"""
+    last_id = 0
+    while True:
+        rows = cursor.execute(
+            f'SELECT id, {columns} FROM emails WHERE id > ? AND ({where}) ORDER BY id LIMIT ?', (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+def compute_message_key(email_data):
+    """Clé de dédoublonnage pour les emails sans Message-ID (empreinte du contenu)"""
+    fingerprint = "\x1f".join(str(email_data.get(field) or "") for field in ('sender', 'subject', 'date', 'body'))
+    return f"<sans-id-{hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()}>"
+
 class EmailClassifier:
     def __init__(self):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        if self.openai_api_key and OPENAI_AVAILABLE:
-            openai.api_key = self.openai_api_key
+        self.llm_client = None
+        if self.openai_api_key:
+            self.llm_client = AsyncLLMClient(
+                self.openai_api_key,
+                base_url=os.getenv('OPENAI_BASE_URL', DEFAULT_BASE_URL),
+                max_in_flight=int(os.getenv('AI_MAX_IN_FLIGHT', '8')),
+                rate_per_second=float(os.getenv('AI_RATE_PER_SECOND', '5')),
+                deadline=float(os.getenv('AI_TIMEOUT', '10')),
+                # Emails ambigus regroupés par prompt (1: un appel par email)
+                batch_size=int(os.getenv('AI_BATCH_SIZE', '10'))
+            )
+        # Modèle local entraîné (python local_model.py): évite l'appel IA quand il est assez sûr
+        self.local_model = LocalPriorityModel.load(os.getenv('LOCAL_MODEL_PATH', DEFAULT_MODEL_PATH))
+        self.local_model_threshold = float(os.getenv('LOCAL_MODEL_THRESHOLD', '0.7'))
         self.setup_database()
+        # Historique des priorités par expéditeur et par domaine (tenu à jour par triggers)
+        self.reputation = SenderReputation('emails_trie.db', float(os.getenv('REPUTATION_THRESHOLD', '0.8')))
+        # Poids appris des corrections de l'utilisateur, consultés avant les règles
+        self.feedback = FeedbackLearner('emails_trie.db', float(os.getenv('FEEDBACK_THRESHOLD', '0.6')))
+        # Réponses IA déjà obtenues pour un contenu identique (invalidé si prompt ou modèle change)
+        self.ai_cache = AICache(
+            cache_version(AI_PROMPT_TEMPLATE, AI_BATCH_PROMPT_TEMPLATE, AI_MODEL), 'emails_trie.db',
+            ttl=float(os.getenv('AI_CACHE_TTL_HOURS', '168')) * 3600,
+            max_entries=int(os.getenv('AI_CACHE_MAX_ENTRIES', '10000'))
+        )
+        # Traçage des règles et des phases (classification_trace.py): aucun coût tant qu'il est désactivé
+        self.tracer = None
+        if os.getenv('CLASSIFICATION_TRACE') == '1':
+            self.enable_tracing()
+
+    def enable_tracing(self, keep=1000):
+        """Compter les règles décisives et la durée des phases; rend le ClassificationTracer"""
+        if self.tracer is None:
+            self.tracer = ClassificationTracer(keep)
+        return self.tracer
+
+    def disable_tracing(self):
+        self.tracer = None
 
     def setup_database(self):
         """Créer la base de données pour stocker les emails triés"""
-        self.conn = sqlite3.connect('emails_trie.db')
+        self.conn = connect('emails_trie.db')
         cursor = self.conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS emails (
@@ -38,17 +136,146 @@ class EmailClassifier:
                 priority INTEGER,
                 priority_label TEXT,
                 date_received TEXT,
-                processed_date TEXT
+                processed_date TEXT,
+                message_id TEXT,
+                mailbox TEXT,
+                uid INTEGER
             )
         ''')
+        # Point de reprise IMAP par compte et par dossier
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS imap_sync_state (
+                account TEXT,
+                mailbox TEXT,
+                uidvalidity INTEGER,
+                last_uid INTEGER,
+                last_sync TEXT,
+                PRIMARY KEY (account, mailbox)
+            )
+        ''')
+        # UID en échec (récupération, classification) repris aux passages suivants, hors point de reprise
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS imap_failed_uids (
+                account TEXT,
+                mailbox TEXT,
+                uid INTEGER,
+                uidvalidity INTEGER,
+                attempts INTEGER,
+                error TEXT,
+                last_attempt TEXT,
+                PRIMARY KEY (account, mailbox, uid)
+            )
+        ''')
+        # Corrections de priorité faites par l'utilisateur (entraînement du modèle local)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS email_feedback (
+                email_id INTEGER PRIMARY KEY,
+                correct_priority INTEGER,
+                previous_priority INTEGER,
+                created TEXT
+            )
+        ''')
+        self.conn.commit()
+        self.migrate_database()
+        self.store = EmailStore('emails_trie.db')
+        # Emails enregistrés sans version (pipeline, import): version des règles courantes
+        self.store.rule_version = self.rule_version
+        self.saved_rule_version = None
+
+    def migrate_database(self):
+        """Mettre à jour le schéma des bases existantes (PRAGMA user_version)"""
+        cursor = self.conn.cursor()
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+
+        if version < 1:
+            # v1: clé naturelle Message-ID, dédoublonnage des lignes existantes.
+            # Clé unique sur message_id seul, sans dossier ni UID: un email copié dans
+            # plusieurs dossiers (inbox, archive, import mbox) reste une seule ligne,
+            # comptée une fois dans les statistiques; mailbox et uid gardent son
+            # dernier emplacement connu (mis à jour par UPSERT_EMAIL_SQL)
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(emails)')}
+            for column, column_type in (('message_id', 'TEXT'), ('mailbox', 'TEXT'), ('uid', 'INTEGER')):
+                if column not in columns:
+                    cursor.execute(f'ALTER TABLE emails ADD COLUMN {column} {column_type}')
+
+            for rows in rows_by_id(cursor, 'sender, subject, content, date_received', 'message_id IS NULL'):
+                cursor.executemany('UPDATE emails SET message_id = ? WHERE id = ?', [
+                    (compute_message_key({'sender': sender, 'subject': subject, 'body': content, 'date': date}), row_id)
+                    for row_id, sender, subject, content, date in rows
+                ])
+            cursor.execute('''
+                DELETE FROM emails
+                WHERE id NOT IN (SELECT MIN(id) FROM emails GROUP BY message_id)
+            ''')
+            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_emails_message_id ON emails(message_id)')
+            cursor.execute('PRAGMA user_version = 1')
+
+        if version < 2:
+            # v2: réputation des expéditeurs, comptée sur les emails déjà classés
+            setup_reputation(cursor)
+            rebuild_reputation(cursor)
+            cursor.execute('PRAGMA user_version = 2')
+
+        if version < 3:
+            # v3: version des règles par email, règles successives, index inversé des mots et expéditeurs
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(emails)')}
+            if 'rule_version' not in columns:
+                cursor.execute('ALTER TABLE emails ADD COLUMN rule_version TEXT')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_rule_version ON emails(rule_version)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rule_plans (
+                    version TEXT PRIMARY KEY,
+                    config TEXT,
+                    created TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS email_terms (
+                    term TEXT,
+                    email_id INTEGER,
+                    PRIMARY KEY (term, email_id)
+                ) WITHOUT ROWID
+            ''')
+            for rows in rows_by_id(cursor, 'subject, sender, content'):
+                cursor.executemany('INSERT OR IGNORE INTO email_terms (term, email_id) VALUES (?, ?)', [
+                    (term, row_id) for row_id, subject, sender, content in rows
+                    for term in index_terms(subject, sender, content)
+                ])
+            cursor.execute('PRAGMA user_version = 3')
+
+        if version < 4:
+            # v4: date de réception triable (filtres de date) et index plein texte
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(emails)')}
+            if 'received_at' not in columns:
+                cursor.execute('ALTER TABLE emails ADD COLUMN received_at TEXT')
+            for rows in rows_by_id(cursor, 'date_received', 'received_at IS NULL'):
+                cursor.executemany('UPDATE emails SET received_at = ? WHERE id = ?',
+                                   [(received_at(date_received), row_id) for row_id, date_received in rows])
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_received_at ON emails(received_at)')
+            if setup_search_index(cursor):
+                rebuild_search_index(cursor)
+            cursor.execute('PRAGMA user_version = 4')
+
+        if version < 5:
+            # v5: réputation comptée sans les priorités déduites ni les domaines grand public
+            cursor.execute('DROP TRIGGER IF EXISTS reputation_insert')
+            cursor.execute('DROP TRIGGER IF EXISTS reputation_update')
+            setup_reputation(cursor)
+            rebuild_reputation(cursor)
+            cursor.execute('PRAGMA user_version = 5')
+
         self.conn.commit()
 
-    def connect_to_email(self, email_address, password, imap_server='imap.gmail.com'):
+    def connect_to_email(self, email_address, password, imap_server='imap.gmail.com', port=None, use_ssl=True):
         """Se connecter au serveur email IMAP"""
         try:
-            self.mail = imaplib.IMAP4_SSL(imap_server)
+            if use_ssl:
+                self.mail = imaplib.IMAP4_SSL(imap_server, port or 993)
+            else:
+                self.mail = imaplib.IMAP4(imap_server, port or 143)
             self.mail.login(email_address, password)
             self.mail.select('inbox')
+            self.account = email_address
             return True
         except Exception as e:
             print(f"Erreur de connexion: {e}")
@@ -62,133 +289,403 @@ class EmailClassifier:
             emails = []
 
             for email_id in email_ids:
-                status, msg_data = self.mail.fetch(email_id, '(RFC822)')
-                msg = email.message_from_bytes(msg_data[0][1])
-
-                subject = decode_header(msg["Subject"])[0][0]
-                if isinstance(subject, bytes):
-                    subject = subject.decode()
-
-                sender = msg.get("From")
-
-                body = ""
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        if part.get_content_type() == "text/plain":
-                            body = part.get_payload(decode=True).decode()
-                            break
-                else:
-                    body = msg.get_payload(decode=True).decode()
-
-                emails.append({
-                    'sender': sender,
-                    'subject': subject,
-                    'body': body[:500],  # Limiter à 500 caractères
-                    'date': msg.get("Date")
-                })
+                status, msg_data = self.mail.fetch(email_id, '(BODY.PEEK[])')
+                emails.append(self.parse_message(msg_data[0][1]))
 
             return emails
         except Exception as e:
             print(f"Erreur lors de la récupération des emails: {e}")
             return []
 
+    def parse_message(self, raw_message):
+        """Extraire expéditeur, sujet, corps et date d'un message brut"""
+        msg = email.message_from_bytes(raw_message)
+
+        subject = decode_subject(msg["Subject"])
+
+        sender = msg.get("From")
+
+        body = ""
+        html_part = None
+        if msg.is_multipart():
+            for part in msg.walk():
+                if part.get_content_type() == "text/plain":
+                    body = decode_text(part.get_payload(decode=True), part.get_content_charset())
+                    break
+                if part.get_content_type() == "text/html" and html_part is None:
+                    html_part = part
+        elif msg.get_content_type() == "text/html":
+            html_part = msg
+        else:
+            body = decode_text(msg.get_payload(decode=True), msg.get_content_charset())
+
+        # Emails HTML uniquement: classer sur le texte réel plutôt que sur un corps vide
+        if not body and html_part is not None:
+            html = decode_text(html_part.get_payload(decode=True), html_part.get_content_charset())
+            body = html_to_text(html, 500)
+
+        return {
+            'sender': sender,
+            'subject': subject,
+            'body': body[:500],  # Limiter à 500 caractères
+            'date': msg.get("Date"),
+            'message_id': (msg.get("Message-ID") or "").strip() or None
+        }
+
+    def select_mailbox(self, mailbox='inbox'):
+        """Sélectionner un dossier et retourner son UIDVALIDITY"""
+        status, data = self.mail.select(mailbox)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Dossier inaccessible: {mailbox}")
+
+        typ, uidvalidity = self.mail.response('UIDVALIDITY')
+        if not uidvalidity or uidvalidity[0] is None:
+            typ, data = self.mail.status(mailbox, '(UIDVALIDITY)')
+            uidvalidity = re.findall(rb'UIDVALIDITY (\d+)', data[0])
+        return int(uidvalidity[0])
+
+    def load_sync_state(self, account, mailbox):
+        """Lire l'UIDVALIDITY et le dernier UID vu d'un dossier"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT uidvalidity, last_uid FROM imap_sync_state WHERE account = ? AND mailbox = ?',
+            (account, mailbox)
+        )
+        return cursor.fetchone()
+
+    def load_failed_uids(self, account, mailbox, uidvalidity, max_attempts=MAX_UID_ATTEMPTS):
+        """UID en échec d'un dossier à réessayer (même UIDVALIDITY, moins de max_attempts essais)"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT uid FROM imap_failed_uids
+            WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND attempts < ?
+            ORDER BY uid
+        ''', (account, mailbox, uidvalidity, max_attempts))
+        return [uid for uid, in cursor.fetchall()]
+
+    def save_sync_state(self, account, mailbox, uidvalidity, last_uid):
+        """Mettre en file le point de reprise, validé après les emails qui le précèdent"""
+        self.store.add_sync_state(account, mailbox, uidvalidity, last_uid)
+
+    def get_new_emails(self, mailbox='inbox', count=50):
+        """Récupérer uniquement les emails arrivés depuis la dernière synchronisation
+
+        Seuls les UID supérieurs au dernier UID enregistré sont téléchargés.
+        Au premier passage, ou si l'UIDVALIDITY du dossier a changé, on
+        repart d'une resynchronisation complète limitée aux `count` derniers.
+        Les erreurs IMAP et réseau remontent à l'appelant (connexion à
+        fermer, dossier en erreur): elles ne sont jamais prises pour un dossier vide.
+        """
+        uidvalidity = self.select_mailbox(mailbox)
+        state = self.load_sync_state(self.account, mailbox)
+
+        if state and state[0] == uidvalidity:
+            last_uid = state[1]
+            status, data = self.mail.uid('SEARCH', None, f'UID {last_uid + 1}:*')
+            # "n:*" renvoie toujours le plus grand UID, même s'il est <= n
+            uids = [int(uid) for uid in data[0].split() if int(uid) > last_uid]
+        else:
+            status, data = self.mail.uid('SEARCH', None, 'ALL')
+            uids = [int(uid) for uid in data[0].split()][-count:]
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Recherche refusée dans {mailbox}: {data!r}")
+
+        return self.fetch_messages(uids, mailbox, uidvalidity)
+
+    def fetch_messages(self, uids, mailbox='inbox', uidvalidity=None, body_bytes=2048, batch_size=200, mail=None):
+        """Télécharger plusieurs messages par commande UID FETCH
+
+        Un premier FETCH récupère BODYSTRUCTURE et l'en-tête; seule la
+        meilleure partie texte (text/plain, sinon text/html) est ensuite
+        téléchargée, tronquée à `body_bytes` octets, et les pièces jointes
+        ne transitent jamais. Tout passe par BODY.PEEK pour ne pas poser
+        le drapeau \\Seen. `mail` permet d'utiliser une autre connexion que
+        self.mail (workers du pipeline).
+        Un FETCH refusé lève imaplib.IMAP4.error: aucun email du lot n'est
+        rendu incomplet, et le point de reprise n'avance pas au-delà.
+        """
+        mail = mail or self.mail
+        emails = []
+
+        for batch in chunk_uids(uids, batch_size):
+            uid_set = compress_uid_set(batch)
+            status, data = mail.uid('FETCH', uid_set, '(UID BODYSTRUCTURE BODY.PEEK[HEADER])')
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"FETCH des en-têtes refusé (UID {uid_set}): {data!r}")
+            headers = split_fetch_response(data)
+
+            # Regrouper les UID par partie à télécharger: une commande par section
+            text_parts = {}
+            sections = {}
+            for uid, parts in headers.items():
+                text_part = select_text_part(parse_bodystructure(parts[b'TEXT']))
+                if text_part:
+                    text_parts[uid] = text_part
+                    sections.setdefault((text_part['section'], text_part['subtype']), []).append(uid)
+
+            bodies = {}
+            for (section, subtype), section_uids in sections.items():
+                # Le HTML est plus verbeux: on en lit davantage pour le même texte utile
+                size = body_bytes * 4 if subtype == 'html' else body_bytes
+                uid_set = compress_uid_set(section_uids)
+                status, data = mail.uid('FETCH', uid_set, f'(UID BODY.PEEK[{section}]<0.{size}>)')
+                if status != 'OK':
+                    raise imaplib.IMAP4.error(f"FETCH de la partie {section} refusé (UID {uid_set}): {data!r}")
+                key = f'BODY[{section}]<0>'.encode()
+                for uid, parts in split_fetch_response(data).items():
+                    bodies[uid] = parts.get(key, b'')
+
+            for uid in sorted(headers):
+                email_data = self.parse_partial_message(
+                    headers[uid].get(b'BODY[HEADER]', b''),
+                    text_parts.get(uid),
+                    bodies.get(uid, b'')
+                )
+                email_data.update({'uid': uid, 'mailbox': mailbox, 'uidvalidity': uidvalidity})
+                emails.append(email_data)
+
+        return emails
+
+    def parse_partial_message(self, header_bytes, text_part, body_bytes):
+        """Construire un email à partir de l'en-tête et d'un début de partie texte"""
+        msg = email.message_from_bytes(header_bytes)
+
+        subject = decode_subject(msg["Subject"])
+
+        body = ""
+        if text_part:
+            if text_part['subtype'] == 'html':
+                html = decode_partial(body_bytes, text_part['encoding'], text_part['charset'], max_chars=None)
+                body = html_to_text(html, 500)
+            else:
+                body = decode_partial(body_bytes, text_part['encoding'], text_part['charset'])
+
+        return {
+            'sender': msg.get("From"),
+            'subject': subject,
+            'body': body,
+            'date': msg.get("Date"),
+            'message_id': (msg.get("Message-ID") or "").strip() or None
+        }
+
     def classify_email_priority(self, subject, sender, body):
         """Classifier l'email par ordre d'importance"""
-        # Mots-clés pour classification rapide
-        urgent_keywords = ['urgent', 'emergency', 'problème', 'panne', 'réclamation', 'plainte', 'incident']
-        high_keywords = ['réservation', 'booking', 'demande', 'nouveau client', 'rdv', 'rendez-vous']
-        low_keywords = ['newsletter', 'promo', 'marketing', 'publicité', 'unsubscribe']
-
-        text = f"{subject} {body}".lower()
-
-        # Classification par mots-clés
-        if any(keyword in text for keyword in urgent_keywords):
-            return 4, "URGENT"
-        elif any(keyword in text for keyword in high_keywords):
-            return 3, "HAUTE"
-        elif any(keyword in text for keyword in low_keywords):
-            return 1, "BASSE"
+        result = self.classify_without_ai(subject, sender, body)
+        if result:
+            return result
+
+        # Classification IA si clé OpenAI disponible
+        if self.llm_client is not None:
+            return self.classify_with_ai(subject, sender, body)
         else:
-            # Classification IA si clé OpenAI disponible
-            if self.openai_api_key and OPENAI_AVAILABLE:
-                return self.classify_with_ai(subject, sender, body)
+            return inferred(2, "MOYENNE")
+
+    def classify_without_ai(self, subject, sender, body):
+        """Corrections apprises, mots-clés, historique de l'expéditeur puis modèle local
+        None si l'email reste à confier à l'IA; seuls les mots-clés ne donnent pas une priorité déduite"""
+        # Classification par mots-clés, sauf si des corrections concordantes la contredisent
+        match = DEFAULT_RULES.match(subject, sender, body)
+        learned = self.feedback.predict(subject, sender, body, match[0] if match else None)
+        if learned:
+            return learned
+        if match:
+            return match
+
+        # Expéditeur à l'historique constant: ni modèle ni IA
+        history = self.reputation.lookup(sender)
+        if history and history[1] >= self.reputation.threshold:
+            return inferred(history[0], PRIORITY_LABELS[history[0]])
+
+        # Modèle local: l'IA n'est consultée que sous le seuil de confiance
+        if self.local_model is not None:
+            priority_num, confidence = self.local_model.predict(subject, sender, body)
+            if history and history[0] == priority_num:
+                # Historique trop court pour décider seul, mais qui confirme le modèle
+                confidence = 1 - (1 - confidence) * (1 - history[1])
+            if confidence >= self.local_model_threshold:
+                return inferred(priority_num, PRIORITY_LABELS[priority_num])
+        return None
+
+    def classify_batch(self, emails):
+        """Classer une liste d'emails (dictionnaires de parse_message): liste de (priorité, libellé)
+
+        Les emails ambigus du lot sont envoyés à l'IA en parallèle plutôt qu'un par un.
+        """
+        items = [(email_data['subject'] or "", email_data['sender'] or "", email_data['body'] or "")
+                 for email_data in emails]
+        results = [self.classify_without_ai(*item) for item in items]
+        ambiguous = [i for i, result in enumerate(results) if result is None]
+        if ambiguous:
+            if self.llm_client is not None:
+                answers = self.classify_many_with_ai([items[i] for i in ambiguous])
             else:
-                return 2, "MOYENNE"
+                answers = [inferred(2, "MOYENNE")] * len(ambiguous)
+            for i, answer in zip(ambiguous, answers):
+                results[i] = answer
+        return results
 
     def classify_with_ai(self, subject, sender, body):
-        """Classification avancée avec OpenAI"""
-        try:
-            prompt = f"""
-            Analysez cet email reçu par une entreprise de conciergerie et classez sa priorité:
-
-            Expéditeur: {sender}
-            Sujet: {subject}
-            Contenu: {body[:300]}
-
-            Critères de priorité:
-            4-URGENT: Urgences, pannes, réclamations graves, problèmes techniques
-            3-HAUTE: Nouvelles demandes clients, réservations, rendez-vous
-            2-MOYENNE: Confirmations, demandes d'information, suivi
-            1-BASSE: Newsletters, spam, promotions
-
-            Répondez uniquement avec le format: "4,URGENT" ou "3,HAUTE" ou "2,MOYENNE" ou "1,BASSE"
-            """
-
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=10
-            )
+        """Classification avancée avec OpenAI (réponses en cache par contenu)"""
+        return self.classify_many_with_ai([(subject, sender, body)])[0]
+
+    def classify_many_with_ai(self, emails):
+        """Classer des (sujet, expéditeur, corps) par l'IA: cache d'abord, puis appels concurrents
+
+        Un contenu présent plusieurs fois dans la liste ne fait qu'un appel. Sans
+        réponse (erreur, échéance dépassée, disjoncteur ouvert), l'email est
+        classé MOYENNE comme avec les règles seules.
+        """
+        keys = [content_key(subject, sender, body) for subject, sender, body in emails]
+        answers = {}
+        misses = {}
+        for key, item in zip(keys, emails):
+            if key in answers or key in misses:
+                continue
+            cached = self.ai_cache.get(key)
+            if cached:
+                answers[key] = cached
+            else:
+                misses[key] = item
 
-            result = response.choices[0].message.content.strip()
-            priority_num, priority_label = result.split(',')
-            return int(priority_num), priority_label
+        tracer = self.tracer
+        start = time.perf_counter_ns() if tracer is not None and misses else 0
+        for key, result in zip(misses, self.llm_client.classify_many(list(misses.values()))):
+            # Seules les vraies réponses sont gardées, pas le repli en cas d'erreur
+            if result is not None:
+                self.ai_cache.put(key, *result)
+                answers[key] = result
+        if start:
+            tracer.record_phase("ai", time.perf_counter_ns() - start, len(misses))
 
-        except Exception as e:
-            print(f"Erreur classification IA: {e}")
-            return 2, "MOYENNE"
+        return [answers.get(key) or inferred(2, "MOYENNE") for key in keys]
 
-    def process_emails(self, email_address, password):
+    def process_emails(self, email_address, password, incremental=True, imap_server='imap.gmail.com'):
         """Traiter et classer tous les emails"""
-        if not self.connect_to_email(email_address, password):
+        if not self.connect_to_email(email_address, password, imap_server):
             return False
 
-        emails = self.get_emails(50)  # Traiter les 50 derniers emails
+        try:
+            if incremental:
+                self.sync_mailbox(email_address, 'inbox', 50)  # Seulement les nouveaux depuis le dernier passage
+            else:
+                self.store_emails(self.get_emails(50))  # Traiter les 50 derniers emails
+                self.store.flush()
+        except Exception as e:
+            # Interface graphique: l'échec est signalé, le point de reprise n'a pas avancé
+            print(f"Erreur lors de la synchronisation: {e}")
+            return False
+        finally:
+            try:
+                self.mail.logout()
+            except (imaplib.IMAP4.error, OSError):
+                pass
+        return True
 
-        for email_data in emails:
-            priority_num, priority_label = self.classify_email_priority(
-                email_data['subject'],
-                email_data['sender'],
-                email_data['body']
+    def sync_mailbox(self, account, mailbox='inbox', count=50):
+        """Classer les nouveaux emails d'un dossier et avancer son point de reprise"""
+        emails = self.get_new_emails(mailbox, count)
+        self.store_emails(emails)
+
+        # Le point de reprise passe par la même file d'écriture, après les insertions
+        if emails:
+            self.save_sync_state(
+                account,
+                mailbox,
+                emails[-1]['uidvalidity'],
+                max(email_data['uid'] for email_data in emails)
             )
 
-            # Sauvegarder en base
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO emails (sender, subject, content, priority, priority_label, date_received, processed_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                email_data['sender'],
-                email_data['subject'],
-                email_data['body'],
-                priority_num,
-                priority_label,
-                email_data['date'],
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ))
+        self.store.flush()
+        return emails
 
+    def rule_snapshot(self):
+        """(version, configuration) des règles utilisées pour classer"""
+        return DEFAULT_RULE_VERSION, DEFAULT_RULES_CONFIG
+
+    def rule_version(self):
+        """Version des règles courantes; leur configuration est conservée à la première utilisation"""
+        version, config = self.rule_snapshot()
+        if version != self.saved_rule_version:
+            self.saved_rule_version = version
+            self.store.add(SAVE_RULE_PLAN_SQL, (
+                version, json.dumps(config, ensure_ascii=False), datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            ))
+        return version
+
+    def store_emails(self, emails):
+        """Classer une liste d'emails et les mettre en file d'écriture"""
+        # Version lue avant de classer: si les règles changent entre-temps, le reclassement rattrapera ces emails
+        rule_version = self.rule_version()
+        for email_data, result in zip(emails, self.classify_batch(emails)):
+            priority_num, priority_label = result
+            email_data['priority'] = priority_num
+            email_data['priority_label'] = priority_label
+            email_data['priority_inferred'] = isinstance(result, InferredPriority)
+            email_data['rule_version'] = rule_version
+
+            message_key = None if email_data.get('message_id') else compute_message_key(email_data)
+            self.store.add_email(email_data, priority_num, priority_label, message_key)
+
+        return emails
+
+    def save_email(self, cursor, email_data, result):
+        """Insérer un email, ou mettre à jour son emplacement IMAP s'il est déjà connu
+
+        result: retour de classify_email_priority, gardé entier pour savoir si la priorité est déduite.
+        """
+        priority_num, priority_label = result
+        email_data['priority_inferred'] = isinstance(result, InferredPriority)
+        message_key = None if email_data.get('message_id') else compute_message_key(email_data)
+        if not email_data.get('rule_version'):
+            email_data['rule_version'] = self.rule_version()
+        cursor.execute(UPSERT_EMAIL_SQL, email_row(email_data, priority_num, priority_label, message_key))
+        terms = index_terms(email_data['subject'], email_data['sender'], email_data['body'])
+        cursor.execute(INDEX_TERMS_SQL, (email_data.get('message_id') or message_key, json.dumps(terms)))
+
+    def record_feedback(self, email_id, correct_priority):
+        """Enregistrer la priorité corrigée par l'utilisateur, l'appliquer à l'email et l'apprendre"""
+        cursor = self.conn.cursor()
+        row = cursor.execute('SELECT priority, subject, sender, content FROM emails WHERE id = ?',
+                             (email_id,)).fetchone()
+        if row is None:
+            return False
+        previous = cursor.execute('SELECT correct_priority FROM email_feedback WHERE email_id = ?',
+                                  (email_id,)).fetchone()
+        cursor.execute('''
+            INSERT OR REPLACE INTO email_feedback (email_id, correct_priority, previous_priority, created)
+            VALUES (?, ?, ?, ?)
+        ''', (email_id, correct_priority, row[0], datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        cursor.execute('UPDATE emails SET priority = ?, priority_label = ?, priority_inferred = 0 WHERE id = ?',
+                       (correct_priority, PRIORITY_LABELS[correct_priority], email_id))
         self.conn.commit()
-        self.mail.logout()
+
+        # Mise à jour incrémentale des poids: une correction remplacée est d'abord retirée
+        priority, subject, sender, content = row
+        if previous:
+            self.feedback.learn(subject, sender, content, previous[0], sign=-1)
+        self.feedback.learn(subject, sender, content, correct_priority)
         return True
 
     def get_sorted_emails(self):
         """Récupérer les emails triés par priorité"""
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM emails ORDER BY priority DESC, processed_date DESC')
+        cursor.execute('''
+            SELECT id, sender, subject, content, priority, priority_label, date_received, processed_date
+            FROM emails ORDER BY priority DESC, processed_date DESC
+        ''')
         return cursor.fetchall()
 
+    def search_emails(self, query, priority=None, since=None, until=None, limit=50, offset=0):
+        """Recherche plein texte classée par pertinence (voir email_search.search_emails)"""
+        self.store.flush()
+        return search_emails(self.conn, query, priority, since, until, limit, offset)
+
     def close(self):
         """Fermer la connexion à la base"""
+        self.store.close()
+        self.ai_cache.close()
+        self.reputation.close()
+        self.feedback.close()
         self.conn.close()
 
 if __name__ == "__main__":
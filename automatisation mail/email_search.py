@@ -0,0 +1,119 @@
+"""
+Recherche plein texte dans les emails enregistrés
+Table virtuelle FTS5 emails_fts sur l'expéditeur, le sujet et le contenu,
+adossée à la table emails (rien n'est stocké deux fois) et tenue à jour par
+des triggers à chaque insertion, modification ou suppression. Les résultats
+sont classés par pertinence (bm25, le sujet compte le plus), paginés, et
+filtrables par priorité et par date de réception.
+Sans FTS5 (SQLite compilé sans l'extension), la recherche se replie sur LIKE
+"""
+
+import sqlite3
+from datetime import date, datetime, timedelta
+
+from text_normalizer import WORD_RE
+
+# Poids bm25 des colonnes (sender, subject, content)
+COLUMN_WEIGHTS = (2.0, 3.0, 1.0)
+
+# Mêmes colonnes que l'interface (EmailManagerGUI.all_emails)
+RESULT_COLUMNS = "e.id, e.sender, e.subject, e.content, e.priority, e.priority_label, e.date_received, e.processed_date"
+
+def setup_search_index(cursor):
+    """Table emails_fts et ses triggers; False si SQLite n'a pas FTS5"""
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+                sender, subject, content,
+                content='emails', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return False
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails
+        BEGIN
+            INSERT INTO emails_fts (rowid, sender, subject, content) VALUES (NEW.id, NEW.sender, NEW.subject, NEW.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS emails_fts_delete AFTER DELETE ON emails
+        BEGIN
+            INSERT INTO emails_fts (emails_fts, rowid, sender, subject, content)
+            VALUES ('delete', OLD.id, OLD.sender, OLD.subject, OLD.content);
+        END
+    ''')
+    # Les reclassements (priorité seule) ne touchent pas l'index
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS emails_fts_update AFTER UPDATE OF sender, subject, content ON emails
+        BEGIN
+            INSERT INTO emails_fts (emails_fts, rowid, sender, subject, content)
+            VALUES ('delete', OLD.id, OLD.sender, OLD.subject, OLD.content);
+            INSERT INTO emails_fts (rowid, sender, subject, content) VALUES (NEW.id, NEW.sender, NEW.subject, NEW.content);
+        END
+    ''')
+    return True
+
+def rebuild_search_index(cursor):
+    """Réindexer tous les emails déjà en base"""
+    cursor.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+
+def has_search_index(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'"
+    ).fetchone() is not None
+
+def match_query(query):
+    """Requête FTS5 sûre: chaque mot saisi devient un préfixe entre guillemets ("fuite" trouve "fuites")"""
+    return " ".join(f'"{word}"*' for word in WORD_RE.findall(query.lower()))
+
+def date_bound(value, end=False):
+    """Borne "AAAA-MM-JJ HH:MM:SS" d'un filtre de date; une date seule couvre toute la journée"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        value = date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value + timedelta(days=1) if end else value, datetime.min.time())
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+def search_emails(conn, query="", priority=None, since=None, until=None, limit=50, offset=0):
+    """Emails correspondant à query, les plus pertinents d'abord
+
+    priority: priorité numérique (1 à 4); since / until: date, datetime ou
+    "AAAA-MM-JJ[ HH:MM]" (until exclu, sauf date seule: journée incluse).
+    Sans mots dans query: emails filtrés, les plus prioritaires et récents d'abord.
+    Lignes (id, sender, subject, content, priority, priority_label, date_received, processed_date).
+    """
+    conditions, params = [], []
+    if priority is not None:
+        conditions.append('e.priority = ?')
+        params.append(priority)
+    # Date de l'en-tête, ou date de traitement pour les emails sans en-tête lisible
+    if since is not None:
+        conditions.append('COALESCE(e.received_at, e.processed_date) >= ?')
+        params.append(date_bound(since))
+    if until is not None:
+        conditions.append('COALESCE(e.received_at, e.processed_date) < ?')
+        params.append(date_bound(until, end=True))
+
+    terms = match_query(query or "")
+    if not terms:
+        sql = f'''SELECT {RESULT_COLUMNS} FROM emails e {"WHERE " + " AND ".join(conditions) if conditions else ""}
+                  ORDER BY e.priority DESC, COALESCE(e.received_at, e.processed_date) DESC'''
+    elif has_search_index(conn):
+        conditions.insert(0, 'emails_fts MATCH ?')
+        params.insert(0, terms)
+        sql = f'''SELECT {RESULT_COLUMNS} FROM emails_fts JOIN emails e ON e.id = emails_fts.rowid
+                  WHERE {" AND ".join(conditions)}
+                  ORDER BY bm25(emails_fts, {", ".join(map(str, COLUMN_WEIGHTS))})'''
+    else:
+        # Repli sans FTS5: chaque mot doit apparaître dans l'une des colonnes, sans classement
+        for word in WORD_RE.findall(query.lower()):
+            conditions.append('(e.sender LIKE ? OR e.subject LIKE ? OR e.content LIKE ?)')
+            params.extend([f'%{word}%'] * 3)
+        sql = f'''SELECT {RESULT_COLUMNS} FROM emails e WHERE {" AND ".join(conditions)}
+                  ORDER BY COALESCE(e.received_at, e.processed_date) DESC'''
+    return conn.execute(f'{sql} LIMIT ? OFFSET ?', (*params, limit, offset)).fetchall()
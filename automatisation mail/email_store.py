@@ -0,0 +1,338 @@
+"""
+Couche de persistance de emails_trie.db
+Mode WAL (lectures de l'interface et écritures du classificateur en parallèle)
+et écriture différée: les insertions sont regroupées par executemany dans
+des transactions bornées, exécutées par un thread d'écriture dédié.
+Une transaction bloquée par un verrou n'est jamais abandonnée: elle est gardée
+et réessayée, rien n'est validé après elle (un point de reprise ne dépasse
+jamais un email non écrit) et flush() lève EmailStoreError tant qu'elle échoue.
+Une requête refusée par la base (contrainte, paramètre invalide) ne réussira
+jamais: elle est écartée du lot, le reste est validé, et flush() la signale
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from text_normalizer import tokenize
+
+UPSERT_EMAIL_SQL = '''
+    INSERT INTO emails (sender, subject, content, priority, priority_label, date_received, processed_date,
+                        message_id, mailbox, uid, rule_version, received_at, priority_inferred)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(message_id) DO UPDATE SET
+        mailbox = COALESCE(excluded.mailbox, emails.mailbox),
+        uid = COALESCE(excluded.uid, emails.uid)
+'''
+
+# Index inversé: mots normalisés et expéditeur de chaque email (reclassement ciblé)
+INDEX_TERMS_SQL = '''
+    INSERT OR IGNORE INTO email_terms (term, email_id)
+    SELECT value, (SELECT id FROM emails WHERE message_id = ?) FROM json_each(?)
+'''
+
+# Règles en vigueur lors d'une classification, pour calculer plus tard ce qui a changé
+SAVE_RULE_PLAN_SQL = '''
+    INSERT OR IGNORE INTO rule_plans (version, config, created) VALUES (?, ?, ?)
+'''
+
+SAVE_SYNC_STATE_SQL = '''
+    INSERT OR REPLACE INTO imap_sync_state (account, mailbox, uidvalidity, last_uid, last_sync)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Requêtes mises en file par add_email: insertion et indexation
+STATEMENTS_PER_EMAIL = 2
+
+# UID en échec: compté à chaque essai, remis à zéro si l'UIDVALIDITY du dossier a changé
+SAVE_FAILED_UID_SQL = '''
+    INSERT INTO imap_failed_uids (account, mailbox, uid, uidvalidity, attempts, error, last_attempt)
+    VALUES (?, ?, ?, ?, 1, ?, ?)
+    ON CONFLICT(account, mailbox, uid) DO UPDATE SET
+        attempts = CASE WHEN imap_failed_uids.uidvalidity = excluded.uidvalidity
+                        THEN imap_failed_uids.attempts + 1 ELSE 1 END,
+        uidvalidity = excluded.uidvalidity,
+        error = excluded.error,
+        last_attempt = excluded.last_attempt
+'''
+
+CLEAR_FAILED_UID_SQL = '''
+    DELETE FROM imap_failed_uids WHERE account = ? AND mailbox = ? AND uid = ?
+'''
+
+# Demande au thread d'écriture de valider le lot en cours et de réessayer les lots en échec
+FLUSH = object()
+
+# Nombre maximal de requêtes rejetées gardées pour le rapport de flush()
+MAX_REJECTED = 1000
+
+class EmailStoreError(Exception):
+    """Écritures non validées: en attente dans EmailStore.failed, ou rejetées par la base"""
+
+def connect(db_path='emails_trie.db', timeout=10, check_same_thread=True):
+    """Ouvrir une connexion SQLite en mode WAL"""
+    conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=check_same_thread)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # En WAL, NORMAL reste cohérent après un crash et évite un fsync par commit
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def received_at(date_header):
+    """En-tête Date (ou date ISO des imports) -> "AAAA-MM-JJ HH:MM:SS" en heure locale, triable; None si illisible"""
+    try:
+        received = parsedate_to_datetime(date_header)
+    except (TypeError, ValueError, IndexError):
+        try:
+            received = datetime.fromisoformat(date_header.strip())
+        except (AttributeError, ValueError):
+            return None
+    if received.tzinfo is not None:
+        received = received.astimezone().replace(tzinfo=None)
+    return received.strftime('%Y-%m-%d %H:%M:%S')
+
+def email_row(email_data, priority_num, priority_label, message_key):
+    """Paramètres de UPSERT_EMAIL_SQL pour un email classé"""
+    return (
+        email_data['sender'],
+        email_data['subject'],
+        email_data['body'],
+        priority_num,
+        priority_label,
+        email_data['date'],
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        email_data.get('message_id') or message_key,
+        email_data.get('mailbox'),
+        email_data.get('uid'),
+        email_data.get('rule_version'),
+        received_at(email_data['date']),
+        # Priorité déduite (reputation.InferredPriority): hors réputation des expéditeurs
+        int(bool(email_data.get('priority_inferred')))
+    )
+
+def index_terms(subject, sender, body):
+    """Entrées de l'index inversé: mots normalisés du sujet et du corps, "from:" + expéditeur"""
+    terms = set(tokenize(subject or ""))
+    terms.update(tokenize(body or ""))
+    terms.add(f"from:{(sender or '').lower().strip()}")
+    return sorted(terms)
+
+class EmailStore:
+    """Écriture différée et groupée vers emails_trie.db"""
+
+    def __init__(self, db_path='emails_trie.db', batch_size=500, flush_interval=0.5, max_pending=10000,
+                 retries=3, timeout=10):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Attente d'un verrou tenu par un autre processus (secondes), puis nombre d'essais
+        # d'une transaction verrouillée ("database is locked") avant de la garder en échec
+        self.timeout = timeout
+        self.retries = retries
+        # Requêtes des transactions en échec (base verrouillée), dans l'ordre: tenues par le thread d'écriture
+        self.failed = []
+        # Requêtes rejetées par la base, écartées de leur lot: (requête, paramètres, erreur),
+        # et leur nombre depuis le dernier flush()
+        self.rejected = []
+        self.unreported = 0
+        self.error = None
+        # File bornée: un producteur trop rapide est ralenti au lieu d'épuiser la mémoire
+        self.pending = queue.Queue(max_pending)
+        self.writer = None
+        # Fonction donnant la version des règles, pour les emails qui n'en portent pas
+        self.rule_version = None
+        self.lock = threading.Lock()
+        self.counters = {'rows': 0, 'transactions': 0, 'errors': 0, 'rejected': 0, 'write_seconds': 0.0}
+
+    def add(self, sql, params):
+        """Mettre une requête en file d'écriture"""
+        if self.writer is None:
+            self.start()
+        self.pending.put((sql, params))
+
+    def add_email(self, email_data, priority_num, priority_label, message_key=None):
+        if self.rule_version is not None and not email_data.get('rule_version'):
+            email_data['rule_version'] = self.rule_version()
+        self.add(UPSERT_EMAIL_SQL, email_row(email_data, priority_num, priority_label, message_key))
+        terms = index_terms(email_data['subject'], email_data['sender'], email_data['body'])
+        self.add(INDEX_TERMS_SQL, (email_data.get('message_id') or message_key, json.dumps(terms)))
+
+    def add_sync_state(self, account, mailbox, uidvalidity, last_uid):
+        self.add(SAVE_SYNC_STATE_SQL, (
+            account, mailbox, uidvalidity, last_uid, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        ))
+
+    def add_failed_uid(self, account, mailbox, uidvalidity, uid, error):
+        self.add(SAVE_FAILED_UID_SQL, (
+            account, mailbox, uid, uidvalidity, str(error)[:500], datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        ))
+
+    def clear_failed_uid(self, account, mailbox, uid):
+        self.add(CLEAR_FAILED_UID_SQL, (account, mailbox, uid))
+
+    def flush(self):
+        """Attendre que toutes les écritures en file soient validées
+
+        Lève EmailStoreError si des écritures restent en échec après un nouvel
+        essai, ou si des requêtes ont été rejetées depuis le dernier flush().
+        """
+        if self.writer is None:
+            return
+        self.pending.put(FLUSH)
+        self.pending.join()
+        if self.failed:
+            raise EmailStoreError(f"{len(self.failed)} écritures non validées en base: {self.error}")
+        with self.lock:
+            count, self.unreported = self.unreported, 0
+            error = self.rejected[-1][2] if count else None
+        if count:
+            raise EmailStoreError(f"{count} écritures rejetées par la base: {error}")
+
+    def start(self):
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_loop, daemon=True)
+                self.writer.start()
+
+    def write_loop(self):
+        """Thread d'écriture: regroupe les requêtes en transactions d'au plus batch_size lignes
+
+        Un lot est validé quand il est plein, flush_interval secondes après sa
+        première requête, ou tout de suite sur flush() et close().
+        """
+        conn = connect(self.db_path, self.timeout)
+        while True:
+            first = self.pending.get()
+            if first is None or first is FLUSH:
+                self.retry_failed(conn)
+                self.pending.task_done()
+                if first is None:
+                    break
+                continue
+
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None or item is FLUSH:
+                    stop = item is None
+                    self.pending.task_done()
+                    break
+                batch.append(item)
+
+            # Après un échec, les lots suivants attendent derrière lui: l'ordre des écritures est conservé
+            if not self.retry_failed(conn) or not self.write_batch(conn, batch):
+                self.failed.extend(batch)
+            for _ in batch:
+                self.pending.task_done()
+            if stop:
+                break
+        if self.failed:
+            print(f"Erreur d'écriture en base: {len(self.failed)} requêtes non validées à la fermeture ({self.error})")
+        conn.close()
+
+    def retry_failed(self, conn):
+        """Réessayer les lots en échec, dans l'ordre; True s'il n'en reste aucun"""
+        while self.failed:
+            batch = self.failed[:self.batch_size]
+            if not self.write_batch(conn, batch):
+                return False
+            del self.failed[:len(batch)]
+        return True
+
+    def write_batch(self, conn, batch):
+        """Exécuter un lot dans une transaction, un executemany par requête distincte; False si la base est bloquée
+
+        Les requêtes sont exécutées dans l'ordre de leur première apparition:
+        l'indexation d'un email suit toujours son insertion, et le lot reste
+        atomique (un point de reprise est validé avec les emails qui le précèdent).
+        Seule une base verrouillée (OperationalError) vaut un nouvel essai; sur
+        une autre erreur, le lot est rejoué requête par requête sans celles
+        que la base refuse.
+        """
+        start = time.perf_counter()
+        groups = {}
+        for sql, params in batch:
+            groups.setdefault(sql, []).append(params)
+        for attempt in range(self.retries):
+            try:
+                with conn:
+                    for sql, rows in groups.items():
+                        conn.executemany(sql, rows)
+            except sqlite3.OperationalError as e:
+                self.error = e
+                with self.lock:
+                    self.counters['errors'] += 1
+                # Base verrouillée: nouvel essai après une pause
+                if attempt + 1 == self.retries:
+                    print(f"Erreur d'écriture en base ({len(batch)} requêtes gardées pour un nouvel essai): {e}")
+                    return False
+                time.sleep(0.1 * 2 ** attempt)
+                continue
+            except sqlite3.Error as e:
+                # Contrainte, paramètre invalide...: inutile d'insister sur les requêtes fautives
+                with self.lock:
+                    self.counters['errors'] += 1
+                return self.write_rows(conn, batch, start)
+            with self.lock:
+                self.counters['rows'] += len(batch)
+                self.counters['transactions'] += 1
+                self.counters['write_seconds'] += time.perf_counter() - start
+            self.error = None
+            return True
+
+    def write_rows(self, conn, batch, start):
+        """Rejouer un lot requête par requête dans une transaction, en écartant celles que la base refuse"""
+        rejected = []
+        try:
+            with conn:
+                for sql, params in batch:
+                    try:
+                        conn.execute(sql, params)
+                    except sqlite3.OperationalError:
+                        raise
+                    except sqlite3.Error as e:
+                        # SQLite annule la seule requête fautive, la transaction continue
+                        rejected.append((sql, params, e))
+        except sqlite3.OperationalError as e:
+            self.error = e
+            print(f"Erreur d'écriture en base ({len(batch)} requêtes gardées pour un nouvel essai): {e}")
+            return False
+
+        if rejected:
+            print(f"Erreur d'écriture en base: {len(rejected)} requêtes rejetées ({rejected[-1][2]}), "
+                  f"{len(batch) - len(rejected)} validées")
+        with self.lock:
+            self.rejected.extend(rejected)
+            del self.rejected[:-MAX_REJECTED]
+            self.unreported += len(rejected)
+            self.counters['rejected'] += len(rejected)
+            self.counters['rows'] += len(batch) - len(rejected)
+            self.counters['transactions'] += 1
+            self.counters['write_seconds'] += time.perf_counter() - start
+        self.error = None
+        return True
+
+    def stats(self):
+        """Compteurs de débit d'écriture"""
+        with self.lock:
+            stats = dict(self.counters)
+        stats['pending'] = self.pending.qsize()
+        stats['failed'] = len(self.failed)
+        stats['rows_per_second'] = round(stats['rows'] / stats['write_seconds']) if stats['write_seconds'] else 0
+        stats['write_seconds'] = round(stats['write_seconds'], 3)
+        return stats
+
+    def close(self):
+        """Vider la file puis arrêter le thread d'écriture"""
+        if self.writer is not None:
+            self.pending.put(None)
+            self.writer.join()
+            self.writer = None
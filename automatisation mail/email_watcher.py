@@ -0,0 +1,220 @@
+"""
+Surveillance en continu d'une boîte IMAP avec IDLE (notifications push)
+Remplace le polling toutes les CHECK_INTERVAL minutes: les nouveaux emails
+sont classés quelques secondes après leur arrivée
+"""
+
+import imaplib
+import os
+import random
+import re
+import select
+import signal
+import ssl
+import threading
+import time
+
+from email_classifier import EmailClassifier
+
+# RFC 2177: le serveur peut couper une session IDLE après 30 minutes
+DEFAULT_IDLE_RENEW = 25 * 60
+RESPONSE_TIMEOUT = 30
+EXISTS_PATTERN = re.compile(rb'^\* \d+ EXISTS')
+
+class IdleLineReader:
+    """Lecture ligne par ligne des réponses IMAP avec délai d'attente
+
+    Les lignes sont lues par mail.readline(): les octets déjà mis en tampon
+    par imaplib (mail.file) ou déchiffrés par SSL ne sont jamais perdus.
+    """
+
+    def __init__(self, mail):
+        self.mail = mail
+
+    def buffered(self):
+        """Vrai si des octets déjà reçus attendent d'être lus (lecture non bloquante du tampon)"""
+        sock = self.mail.sock
+        timeout = sock.gettimeout()
+        sock.settimeout(0)
+        try:
+            return bool(self.mail.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+
+    def readline(self, timeout):
+        """Retourner une ligne complète, ou None si rien n'arrive avant le délai"""
+        if not self.buffered():
+            readable, _, _ = select.select([self.mail.sock], [], [], timeout)
+            if not readable:
+                return None
+        # Une ligne commencée se termine dans le délai de la socket (RESPONSE_TIMEOUT)
+        line = self.mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Connexion fermée par le serveur")
+        return line
+
+class EmailWatcher:
+    """Démon IDLE: classe les nouveaux emails dès que le serveur les signale"""
+
+    def __init__(self, classifier, email_address, password, imap_server='imap.gmail.com',
+                 mailbox='inbox', idle_renew=DEFAULT_IDLE_RENEW, max_backoff=300,
+                 on_new_emails=None):
+        self.classifier = classifier
+        self.email_address = email_address
+        self.password = password
+        self.imap_server = imap_server
+        self.mailbox = mailbox
+        self.idle_renew = idle_renew
+        self.max_backoff = max_backoff
+        self.on_new_emails = on_new_emails or self.report_new_emails
+        self.stop_event = threading.Event()
+        # Échecs consécutifs, pour le délai avant reconnexion
+        self.failures = 0
+
+    def run(self):
+        """Boucle principale: connexion, rattrapage, IDLE, reconnexion avec backoff
+
+        Toute erreur (IMAP, écriture en base, classification) mène à une
+        reconnexion après un délai croissant, remis à zéro par la première
+        synchronisation réussie; seul KeyboardInterrupt arrête le démon.
+        """
+        self.failures = 0
+        while not self.stop_event.is_set():
+            try:
+                if not self.classifier.connect_to_email(self.email_address, self.password, self.imap_server):
+                    raise imaplib.IMAP4.abort("Connexion impossible")
+
+                if 'IDLE' not in self.classifier.mail.capabilities:
+                    print("Le serveur ne supporte pas IDLE, utilisez process_emails en mode polling")
+                    return
+
+                self.watch()
+            except (imaplib.IMAP4.error, OSError) as e:
+                self.back_off(f"Connexion IMAP perdue ({e})")
+            except Exception as e:
+                # EmailStoreError, erreur de classification...: les emails non écrits seront repris
+                self.back_off(f"Erreur de synchronisation ({type(e).__name__}: {e})")
+            finally:
+                self.disconnect()
+
+    def back_off(self, reason):
+        """Attendre avant de se reconnecter, d'autant plus longtemps que les échecs se suivent"""
+        self.failures += 1
+        delay = min(self.max_backoff, 2 ** self.failures) * random.uniform(0.5, 1.0)
+        print(f"{reason}, nouvelle tentative dans {delay:.0f}s")
+        self.stop_event.wait(delay)
+
+    def watch(self):
+        """Rattraper les emails manqués puis attendre les notifications"""
+        self.sync()
+        while not self.stop_event.is_set():
+            if self.idle(self.idle_renew):
+                self.sync()
+
+    def sync(self):
+        """Classer les nouveaux emails et notifier"""
+        emails = self.classifier.sync_mailbox(self.email_address, self.mailbox)
+        self.failures = 0
+        if emails:
+            self.on_new_emails(emails)
+
+    def idle(self, timeout):
+        """Ouvrir une session IDLE; retourne True si de nouveaux messages sont signalés
+
+        La session est renouvelée (DONE puis nouvel IDLE) au bout de `timeout`
+        secondes, avant que le serveur ne la coupe. Un EXISTS reçu avant
+        l'acceptation d'IDLE ou pendant sa clôture compte aussi.
+        """
+        mail = self.classifier.mail
+        previous_timeout = mail.sock.gettimeout()
+        mail.sock.settimeout(RESPONSE_TIMEOUT)
+        try:
+            return self.idle_session(mail, timeout)
+        finally:
+            mail.sock.settimeout(previous_timeout)
+
+    def idle_session(self, mail, timeout):
+        tag = mail._new_tag()
+        mail.send(tag + b' IDLE\r\n')
+        reader = IdleLineReader(mail)
+
+        has_new = False
+        while True:
+            line = reader.readline(RESPONSE_TIMEOUT)
+            if line is None:
+                raise imaplib.IMAP4.abort("Pas de réponse à IDLE")
+            if line.startswith(b'+'):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.error(f"IDLE refusé: {line!r}")
+            has_new = self.check_untagged(line) or has_new
+
+        deadline = time.monotonic() + timeout
+        while not has_new and not self.stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            # Réveil régulier pour réagir rapidement à stop()
+            line = reader.readline(min(remaining, 1.0))
+            if line is not None:
+                has_new = self.check_untagged(line)
+
+        mail.send(b'DONE\r\n')
+        while True:
+            line = reader.readline(RESPONSE_TIMEOUT)
+            if line is None:
+                raise imaplib.IMAP4.abort("Pas de réponse à DONE")
+            if line.startswith(tag):
+                if not line[len(tag):].strip().upper().startswith(b'OK'):
+                    raise imaplib.IMAP4.error(f"Fin d'IDLE en erreur: {line!r}")
+                return has_new
+            has_new = self.check_untagged(line) or has_new
+
+    def check_untagged(self, line):
+        """Vrai si la réponse signale un nouveau message; BYE met fin à la session"""
+        if line.startswith(b'* BYE'):
+            raise imaplib.IMAP4.abort("Session fermée par le serveur")
+        return bool(EXISTS_PATTERN.match(line))
+
+    def disconnect(self):
+        """Fermer proprement la connexion IMAP"""
+        mail = getattr(self.classifier, 'mail', None)
+        if mail is None:
+            return
+        try:
+            mail.logout()
+        except Exception:
+            pass
+        self.classifier.mail = None
+
+    def stop(self):
+        """Demander l'arrêt du démon"""
+        self.stop_event.set()
+
+    def report_new_emails(self, emails):
+        """Affichage par défaut des emails reçus"""
+        for email_data in emails:
+            marker = "[!]" if email_data.get('priority', 0) >= 4 else "   "
+            print(f"{marker} [{email_data['priority_label']}] {email_data['sender']} - {email_data['subject']}")
+
+def main():
+    watcher = EmailWatcher(
+        EmailClassifier(),
+        os.getenv('EMAIL_ADDRESS'),
+        os.getenv('EMAIL_PASSWORD'),
+        os.getenv('IMAP_SERVER', 'imap.gmail.com'),
+        idle_renew=int(os.getenv('IDLE_RENEW_INTERVAL', '25')) * 60
+    )
+
+    signal.signal(signal.SIGINT, lambda signum, frame: watcher.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+
+    print("Surveillance IDLE démarrée (Ctrl+C pour arrêter)...")
+    watcher.run()
+    watcher.classifier.close()
+
+if __name__ == "__main__":
+    main()
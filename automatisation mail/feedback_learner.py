@@ -0,0 +1,291 @@
+"""
+Apprentissage en continu à partir des corrections de l'utilisateur
+Chaque correction ajoute des poids par priorité aux mots de l'email, à son
+expéditeur et à son domaine (table feedback_weights): une mise à jour coûte
+la taille de l'email, sans réentraînement. Les poids l'emportent sur les
+règles quand plusieurs corrections concordent (une seule ne suffit pas), et
+jamais sur une règle URGENT par le seul expéditeur; les autres processus
+(interface, surveillance) les relisent dans la seconde qui suit une correction.
+En ligne de commande, propose des mots-clés à ajouter ou retirer de
+business_config.json, avec leur précision mesurée sur les emails corrigés
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from email_store import connect
+from keyword_matcher import PRIORITY_LABELS, PRIORITY_LEVELS
+from reputation import FREE_MAIL_DOMAINS, inferred, sender_address, sender_domain
+from text_normalizer import WORD_RE, fold_word, tokenize
+
+# Part de chaque signal dans une correction: l'adresse compte le plus, les
+# mots de l'email se partagent TERMS_WEIGHT, le domaine compte peu (rien pour gmail.com...)
+SENDER_WEIGHT = 2.0
+DOMAIN_WEIGHT = 0.5
+TERMS_WEIGHT = 1.0
+
+# Caractéristiques de l'expéditeur, ignorées face à une règle URGENT
+SENDER_FEATURES = ("from:", "domain:")
+
+# Seuls le sujet et le début du corps sont pris en compte
+TERM_BODY_CHARS = 500
+
+def feedback_features(subject, sender, body):
+    """{caractéristique: poids} d'un email: "from:adresse", "domain:domaine" et ses mots"""
+    terms = set(tokenize(subject or ""))
+    terms.update(tokenize((body or "")[:TERM_BODY_CHARS]))
+    features = dict.fromkeys(terms, TERMS_WEIGHT / len(terms)) if terms else {}
+    address = sender_address(sender)
+    if address:
+        features[f"from:{address}"] = SENDER_WEIGHT
+        domain = sender_domain(address)
+        if domain and domain not in FREE_MAIL_DOMAINS:
+            features[f"domain:{domain}"] = DOMAIN_WEIGHT
+    return features
+
+class FeedbackLearner:
+    """Poids appris des corrections, par caractéristique et par priorité (1 à 4)"""
+
+    def __init__(self, db_path='emails_trie.db', threshold=0.6, check_interval=1.0):
+        # Partagée (sous verrou) par les workers de classification du pipeline
+        self.conn = connect(db_path, check_same_thread=False)
+        # Confiance à partir de laquelle la priorité apprise remplace les règles
+        self.threshold = threshold
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.weights = {}
+        self.setup()
+        with self.lock:
+            self.revision = self.stored_revision()
+            self.load()
+        self.next_check = time.monotonic() + check_interval
+
+    def setup(self):
+        with self.lock, self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS feedback_weights (
+                    feature TEXT PRIMARY KEY,
+                    w1 REAL DEFAULT 0,
+                    w2 REAL DEFAULT 0,
+                    w3 REAL DEFAULT 0,
+                    w4 REAL DEFAULT 0
+                )
+            ''')
+            # Compteur de corrections apprises: les autres processus rechargent quand il change
+            self.conn.execute('CREATE TABLE IF NOT EXISTS feedback_revision (id INTEGER PRIMARY KEY, revision INTEGER)')
+            created = self.conn.execute(
+                'INSERT OR IGNORE INTO feedback_revision (id, revision) VALUES (1, 0)'
+            ).rowcount
+        if created:
+            # Première utilisation: apprendre les corrections déjà enregistrées
+            self.rebuild()
+
+    def stored_revision(self):
+        return self.conn.execute('SELECT revision FROM feedback_revision WHERE id = 1').fetchone()[0]
+
+    def load(self):
+        self.weights = {feature: list(row) for feature, *row in
+                        self.conn.execute('SELECT feature, w1, w2, w3, w4 FROM feedback_weights')}
+
+    def refresh(self):
+        """Recharger les poids si un autre processus a appris une correction (vérifié une fois par check_interval)"""
+        if time.monotonic() < self.next_check:
+            return
+        with self.lock:
+            self.next_check = time.monotonic() + self.check_interval
+            revision = self.stored_revision()
+            if revision != self.revision:
+                self.revision = revision
+                self.load()
+
+    def learn(self, subject, sender, body, correct_priority, sign=1):
+        """Ajouter (sign=1) ou retirer (sign=-1) une correction: O(taille de l'email)"""
+        if correct_priority not in PRIORITY_LABELS:
+            return
+        column = correct_priority - 1
+        features = feedback_features(subject, sender, body)
+        with self.lock, self.conn:
+            for feature, weight in features.items():
+                row = self.weights.setdefault(feature, [0.0] * 4)
+                row[column] += sign * weight
+                self.conn.execute(f'''
+                    INSERT INTO feedback_weights (feature, w{correct_priority}) VALUES (?, ?)
+                    ON CONFLICT(feature) DO UPDATE SET w{correct_priority} = w{correct_priority} + excluded.w{correct_priority}
+                ''', (feature, sign * weight))
+            self.conn.execute('UPDATE feedback_revision SET revision = revision + 1 WHERE id = 1')
+            self.revision += 1
+
+    def rebuild(self):
+        """Recalculer tous les poids à partir de la table email_feedback"""
+        with self.lock:
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'email_feedback'"
+            ).fetchone()
+            corrections = self.conn.execute('''
+                SELECT e.subject, e.sender, e.content, f.correct_priority
+                FROM email_feedback f JOIN emails e ON e.id = f.email_id
+            ''').fetchall() if exists else []
+            with self.conn:
+                self.conn.execute('DELETE FROM feedback_weights')
+            self.weights = {}
+        for subject, sender, body, correct_priority in corrections:
+            self.learn(subject, sender, body, correct_priority)
+
+    def predict(self, subject, sender, body, rule_priority=None):
+        """(priorité, libellé) déduit si les corrections passées désignent nettement une priorité, sinon None
+
+        Confiance = part de la priorité dominante dans les poids appris des
+        caractéristiques de l'email, avec une correction fictive en désaccord
+        (comme SenderReputation.lookup): une correction seule donne 0.5, deux
+        corrections concordantes 0.67. rule_priority: priorité des règles;
+        une règle URGENT n'est écartée que par les mots de l'email.
+        """
+        self.refresh()
+        weights = self.weights
+        if not weights:
+            return None
+        scores = [0.0] * 4
+        disagreement = 0.0
+        for feature, weight in feedback_features(subject, sender, body).items():
+            if rule_priority == 4 and feature.startswith(SENDER_FEATURES):
+                continue
+            row = weights.get(feature)
+            # Corrections retirées: poids revenus à zéro (aux arrondis près)
+            if row is not None and max(row) > 1e-9:
+                scores = [score + w for score, w in zip(scores, row)]
+                disagreement += weight
+        best = max(scores)
+        if best <= 0 or best / (sum(scores) + disagreement) < self.threshold:
+            return None
+        priority_num = scores.index(best) + 1
+        return inferred(priority_num, PRIORITY_LABELS[priority_num])
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def email_terms(subject, body):
+    """Mots normalisés de l'email, et son texte normalisé pour chercher les expressions"""
+    tokens = tokenize(f"{subject or ''} {body or ''}")
+    return set(tokens), f" {' '.join(tokens)} "
+
+def keyword_precision(conn, keywords):
+    """{(mot-clé, priorité): (emails de cette priorité contenant le mot-clé, emails le contenant)}
+
+    Mesurée sur les seuls emails corrigés par l'utilisateur: les priorités de
+    la table emails ont pour la plupart été fixées par ces mêmes mots-clés (et
+    décalées par les VIP et les heures creuses), la mesure serait circulaire.
+    """
+    stats = {}
+    compiled = [(keyword, priority, tuple(tokenize(keyword))) for keyword, priority in keywords]
+    for subject, body, priority in conn.execute('''
+        SELECT e.subject, e.content, f.correct_priority
+        FROM email_feedback f JOIN emails e ON e.id = f.email_id
+    '''):
+        present, text = email_terms(subject, body)
+        for keyword, target, tokens in compiled:
+            if not tokens:
+                continue
+            if len(tokens) == 1:
+                found = tokens[0] in present
+            else:
+                found = tokens[0] in present and f" {' '.join(tokens)} " in text
+            if found:
+                hits, total = stats.get((keyword, target), (0, 0))
+                stats[(keyword, target)] = (hits + (priority == target), total + 1)
+    return stats
+
+def propose_keyword_changes(conn, config, min_precision=0.8, max_precision_removal=0.5, min_support=3,
+                            max_candidates=200):
+    """Ajouts et retraits de mots-clés proposés, avec leur précision sur l'historique
+
+    Ajout: mot fréquent dans les emails corrigés vers une priorité, et qui
+    désigne cette priorité dans au moins min_precision des emails corrigés.
+    Retrait: mot-clé configuré dont la précision sur les emails corrigés est
+    sous max_precision_removal.
+    """
+    priority_rules = config.get("priority_rules", {})
+    configured = [(keyword, priority_num) for priority_num, _, config_key in PRIORITY_LEVELS
+                  for keyword in priority_rules.get(config_key, {}).get("keywords", [])]
+
+    # Candidats: mots des emails corrigés, par priorité corrigée
+    candidates = {}
+    # Mot tel qu'écrit dans les emails ("dégâts" plutôt que sa forme normalisée "degat")
+    written = {}
+    for subject, body, correct_priority in conn.execute('''
+        SELECT e.subject, e.content, f.correct_priority
+        FROM email_feedback f JOIN emails e ON e.id = f.email_id
+    '''):
+        present, _ = email_terms(subject, body)
+        for word in WORD_RE.findall(f"{subject or ''} {body or ''}".lower()):
+            written.setdefault(fold_word(word), word)
+        for term in present:
+            if len(term) >= 4 and not term.isdigit():
+                key = (term, correct_priority)
+                candidates[key] = candidates.get(key, 0) + 1
+    configured_terms = {' '.join(tokenize(keyword)) for keyword, _ in configured}
+    candidates = sorted((key for key in candidates if key[0] not in configured_terms),
+                        key=lambda key: -candidates[key])[:max_candidates]
+
+    stats = keyword_precision(conn, candidates + configured)
+    additions, removals = [], []
+    for term, priority_num in candidates:
+        hits, total = stats.get((term, priority_num), (0, 0))
+        if total >= min_support and hits / total >= min_precision:
+            additions.append((written.get(term, term), priority_num, hits / total, total))
+    for keyword, priority_num in configured:
+        hits, total = stats.get((keyword, priority_num), (0, 0))
+        if total >= min_support and hits / total < max_precision_removal:
+            removals.append((keyword, priority_num, hits / total, total))
+    return sorted(additions, key=lambda a: (-a[2], -a[3])), sorted(removals, key=lambda r: (r[2], -r[3]))
+
+def apply_keyword_changes(config, additions, removals):
+    """Configuration modifiée (copie) avec les ajouts et retraits proposés"""
+    config = json.loads(json.dumps(config))
+    levels = {priority_num: config_key for priority_num, _, config_key in PRIORITY_LEVELS}
+    for keyword, priority_num, _, _ in removals:
+        keywords = config["priority_rules"][levels[priority_num]]["keywords"]
+        keywords[:] = [k for k in keywords if k != keyword]
+    for term, priority_num, _, _ in additions:
+        rules = config["priority_rules"].setdefault(levels[priority_num], {})
+        rules.setdefault("keywords", []).append(term)
+    return config
+
+def main():
+    parser = argparse.ArgumentParser(description="Mots-clés à ajouter ou retirer d'après les corrections enregistrées")
+    parser.add_argument('--config', default="business_config.json")
+    parser.add_argument('--min-precision', type=float, default=0.8)
+    parser.add_argument('--min-support', type=int, default=3)
+    parser.add_argument('--apply', action='store_true', help="Écrire les propositions dans la configuration")
+    args = parser.parse_args()
+
+    from email_classifier import EmailClassifier
+    from rule_plan import save_business_config
+    if not os.path.exists(args.config):
+        print(f"Configuration non trouvée: {args.config}")
+        return
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    classifier = EmailClassifier()
+    additions, removals = propose_keyword_changes(classifier.conn, config, args.min_precision,
+                                                  min_support=args.min_support)
+    classifier.close()
+
+    print(f"Mots-clés à ajouter ({len(additions)}):")
+    for term, priority_num, precision, total in additions:
+        print(f"  + {term:<25} {PRIORITY_LABELS[priority_num]:<8} précision {precision:.0%} sur {total} emails")
+    print(f"Mots-clés à retirer ({len(removals)}):")
+    for keyword, priority_num, precision, total in removals:
+        print(f"  - {keyword:<25} {PRIORITY_LABELS[priority_num]:<8} précision {precision:.0%} sur {total} emails")
+
+    if args.apply and (additions or removals):
+        # Écriture atomique: les classificateurs en cours rechargent la configuration d'eux-mêmes
+        save_business_config(apply_keyword_changes(config, additions, removals), args.config)
+        print(f"Configuration mise à jour: {args.config}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Serveur IMAP local de substitution pour les tests et benchmarks
+Sert une boîte générée (taille et composition configurables: pièces jointes,
+emails HTML uniquement, jeux de caractères variés) sans compte Gmail réel.
+Implémente le sous-ensemble d'IMAP4rev1 utilisé par EmailClassifier:
+LOGIN, SELECT/EXAMINE, STATUS, (UID) SEARCH, (UID) FETCH avec BODYSTRUCTURE
+et BODY.PEEK[section]<partiel>, NOOP, IDLE et LOGOUT
+"""
+
+import random
+import re
+import select
+import socketserver
+import threading
+from email import message_from_bytes
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import format_datetime, make_msgid
+from datetime import datetime, timedelta
+
+UIDVALIDITY = 1000
+
+SAMPLE_EMAILS = [
+    ("URGENT - Panne ascenseur étage {n}", "L'ascenseur est bloqué depuis 2h, des résidents sont coincés."),
+    ("Fuite d'eau appartement {n}", "Grosse fuite dans la salle de bain, l'eau coule chez le voisin."),
+    ("Demande de réservation", "Je souhaite réserver une chambre pour le weekend du {n}."),
+    ("Confirmation intervention plomberie", "Nous confirmons notre intervention de demain à 14h."),
+    ("Question sur la facture {n}", "Pourriez-vous m'expliquer la ligne {n} de la facture ?"),
+    ("Newsletter - Offres spéciales", "Découvrez nos promotions exclusives du mois. Se désabonner: unsubscribe."),
+    ("Rapport mensuel", "Voici le rapport de gestion du mois, bonne lecture."),
+    ("Réclamation ménage chambre {n}", "La chambre n'était pas propre à mon arrivée, je suis très déçu."),
+]
+CHARSETS = ["utf-8", "iso-8859-1", "windows-1252"]
+
+def generate_mailbox(count=500, seed=42, html_ratio=0.2, attachment_ratio=0.1, attachment_kb=512):
+    """Générer une boîte de `count` messages RFC822 (octets, fins de ligne CRLF)"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, 8, 0)
+    messages = []
+
+    for n in range(1, count + 1):
+        subject, body = rng.choice(SAMPLE_EMAILS)
+        subject, body = subject.format(n=n), body.format(n=n)
+        charset = rng.choice(CHARSETS)
+
+        msg = EmailMessage()
+        msg['From'] = f"client{rng.randint(1, max(1, count // 5))}@{rng.choice(['gmail.com', 'hotel.fr', 'syndic.fr'])}"
+        msg['To'] = "conciergerie@example.com"
+        msg['Subject'] = subject
+        msg['Date'] = format_datetime(start + timedelta(minutes=7 * n))
+        msg['Message-ID'] = make_msgid(f"stub{n}", "imap-stub.local")
+
+        if rng.random() < html_ratio:
+            msg.set_content(f"<html><head><style>p {{color: #333}}</style></head>"
+                            f"<body><p>{body}</p><p>Cordialement</p></body></html>",
+                            subtype='html', charset=charset)
+        else:
+            msg.set_content(body + "\n\nCordialement", charset=charset)
+            if rng.random() < 0.3:
+                msg.add_alternative(f"<html><body><p>{body}</p></body></html>", subtype='html', charset=charset)
+
+        if rng.random() < attachment_ratio:
+            payload = rng.randbytes(attachment_kb * 1024)
+            msg.add_attachment(payload, maintype='application', subtype='pdf', filename=f"document_{n}.pdf")
+
+        messages.append(msg.as_bytes(policy=SMTP))
+
+    return messages
+
+def quote(value):
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def split_header_body(raw):
+    index = raw.find(b"\r\n\r\n")
+    if index < 0:
+        return raw, b""
+    return raw[:index + 4], raw[index + 4:]
+
+class StoredMessage:
+    """Message servi par le stub, avec ses sections IMAP pré-calculées"""
+
+    def __init__(self, uid, raw):
+        self.uid = uid
+        self.raw = raw
+        self.header, self.text = split_header_body(raw)
+        msg = message_from_bytes(raw, policy=SMTP)
+        self.sections = {}
+        self.bodystructure = self.describe(msg, "")
+
+    def describe(self, part, section):
+        """Construire la BODYSTRUCTURE et indexer les sections (en-tête MIME, contenu)"""
+        if part.is_multipart():
+            children = []
+            for index, child in enumerate(part.iter_parts(), 1):
+                children.append(self.describe(child, f"{section}.{index}" if section else str(index)))
+            boundary = part.get_boundary()
+            return f"({''.join(children)} {quote(part.get_content_subtype().upper())} (\"BOUNDARY\" {quote(boundary)}) NIL NIL)"
+
+        mime_header, content = split_header_body(part.as_bytes(policy=SMTP))
+        self.sections[section or "1"] = (mime_header, content)
+
+        params = []
+        if part.get_content_charset():
+            params += ["CHARSET", part.get_content_charset()]
+        if part.get_filename():
+            params += ["NAME", part.get_filename()]
+        params_text = "(" + " ".join(quote(p) for p in params) + ")" if params else "NIL"
+
+        encoding = (part.get("Content-Transfer-Encoding") or "7bit").upper()
+        fields = f"{quote(part.get_content_maintype().upper())} {quote(part.get_content_subtype().upper())} " \
+                 f"{params_text} NIL NIL {quote(encoding)} {len(content)}"
+        disposition = "NIL"
+        if part.get_content_disposition():
+            disposition = f"({quote(part.get_content_disposition())} (\"FILENAME\" {quote(part.get_filename())}))"
+        if part.get_content_maintype() == "text":
+            lines = content.count(b"\n") + 1
+            return f"({fields} {lines} NIL {disposition} NIL)"
+        return f"({fields} NIL {disposition} NIL)"
+
+    def section(self, spec):
+        """Contenu d'une section BODY[...]: '', HEADER, TEXT, 1, 1.2, 1.MIME..."""
+        spec = spec.upper()
+        if spec == "":
+            return self.raw
+        if spec == "HEADER":
+            return self.header
+        if spec == "TEXT":
+            return self.text
+        if spec.endswith(".MIME"):
+            return self.sections.get(spec[:-5], (b"", b""))[0]
+        return self.sections.get(spec, (b"", b""))[1]
+
+FETCH_ITEM = re.compile(r'BODY(?:\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?|[A-Z0-9.]+', re.IGNORECASE)
+
+class IMAPStubHandler(socketserver.StreamRequestHandler):
+    """Une session IMAP"""
+
+    # Sans TCP_NODELAY, les réponses en plusieurs écritures subissent l'ACK retardé (~40 ms)
+    disable_nagle_algorithm = True
+
+    def send(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self.wfile.write(data)
+        self.server.count_bytes(len(data))
+
+    def handle(self):
+        self.selected = False
+        self.send("* OK [CAPABILITY IMAP4rev1 IDLE] IMAP stub ready\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            self.server.count_commands()
+            parts = line.decode(errors='replace').rstrip("\r\n").split(" ", 2)
+            if len(parts) < 2:
+                self.send("* BAD commande invalide\r\n")
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = parts[2] if len(parts) > 2 else ""
+
+            if command == "UID":
+                sub = args.split(" ", 1)
+                command, args, by_uid = "UID " + sub[0].upper(), sub[1] if len(sub) > 1 else "", True
+            else:
+                by_uid = False
+
+            handler = {
+                "CAPABILITY": self.do_capability, "LOGIN": self.do_login, "NOOP": self.do_noop,
+                "SELECT": self.do_select, "EXAMINE": self.do_select, "STATUS": self.do_status,
+                "SEARCH": self.do_search, "UID SEARCH": self.do_search,
+                "FETCH": self.do_fetch, "UID FETCH": self.do_fetch,
+                "IDLE": self.do_idle, "CLOSE": self.do_noop, "LOGOUT": self.do_logout,
+            }.get(command)
+
+            if handler is None:
+                self.send(f"{tag} BAD commande non supportée\r\n")
+                continue
+            if handler(tag, args, by_uid) is False:
+                return
+
+    def do_capability(self, tag, args, by_uid):
+        self.send("* CAPABILITY IMAP4rev1 IDLE\r\n")
+        self.send(f"{tag} OK CAPABILITY terminé\r\n")
+
+    def do_login(self, tag, args, by_uid):
+        self.send(f"{tag} OK [CAPABILITY IMAP4rev1 IDLE] LOGIN terminé\r\n")
+
+    def do_noop(self, tag, args, by_uid):
+        self.send(f"{tag} OK NOOP terminé\r\n")
+
+    def do_logout(self, tag, args, by_uid):
+        self.send("* BYE déconnexion\r\n")
+        self.send(f"{tag} OK LOGOUT terminé\r\n")
+        return False
+
+    def do_select(self, tag, args, by_uid):
+        self.selected = True
+        messages = self.server.messages
+        self.send(f"* {len(messages)} EXISTS\r\n* 0 RECENT\r\n")
+        self.send(f"* OK [UIDVALIDITY {self.server.uidvalidity}] UIDs valides\r\n")
+        self.send(f"* OK [UIDNEXT {len(messages) + 1}] UID suivant\r\n")
+        self.send(f"{tag} OK [READ-WRITE] SELECT terminé\r\n")
+
+    def do_status(self, tag, args, by_uid):
+        mailbox = args.split(" ", 1)[0]
+        self.send(f"* STATUS {mailbox} (MESSAGES {len(self.server.messages)} UIDVALIDITY {self.server.uidvalidity})\r\n")
+        self.send(f"{tag} OK STATUS terminé\r\n")
+
+    def resolve(self, sequence_set, by_uid):
+        """Messages désignés par un ensemble de numéros (séquence ou UID)"""
+        messages = self.server.messages
+        if not messages:
+            return []
+        highest = messages[-1].uid if by_uid else len(messages)
+        wanted = set()
+        for item in sequence_set.split(","):
+            if ":" in item:
+                low, high = item.split(":")
+                low = highest if low == "*" else int(low)
+                high = highest if high == "*" else int(high)
+                low, high = min(low, high), max(low, high)
+                wanted.update(range(low, high + 1))
+            else:
+                wanted.add(highest if item == "*" else int(item))
+        if by_uid:
+            return [(seq, msg) for seq, msg in enumerate(messages, 1) if msg.uid in wanted]
+        return [(seq, messages[seq - 1]) for seq in sorted(wanted) if 1 <= seq <= len(messages)]
+
+    def do_search(self, tag, args, by_uid):
+        criteria = args.upper().split()
+        if "UID" in criteria:
+            matches = self.resolve(criteria[criteria.index("UID") + 1], True)
+        else:
+            matches = list(enumerate(self.server.messages, 1))
+        numbers = "".join(f" {msg.uid if by_uid else seq}" for seq, msg in matches)
+        self.send(f"* SEARCH{numbers}\r\n")
+        self.send(f"{tag} OK SEARCH terminé\r\n")
+
+    def do_fetch(self, tag, args, by_uid):
+        sequence_set, items = args.split(" ", 1)
+        items = items.strip()
+        if items.startswith("(") and items.endswith(")"):
+            items = items[1:-1]
+        requested = [m for m in FETCH_ITEM.finditer(items)]
+
+        for seq, msg in self.resolve(sequence_set, by_uid):
+            chunks = []
+            if by_uid and not any(m.group(0).upper() == "UID" for m in requested):
+                chunks.append(f"UID {msg.uid}".encode())
+            for match in requested:
+                name = match.group(0).upper()
+                if name == "UID":
+                    chunks.append(f"UID {msg.uid}".encode())
+                elif name == "BODYSTRUCTURE":
+                    chunks.append(f"BODYSTRUCTURE {msg.bodystructure}".encode())
+                elif name == "FLAGS":
+                    chunks.append(b"FLAGS ()")
+                elif name in ("RFC822", "BODY[]") or match.group(1) is not None:
+                    spec = "" if name == "RFC822" else match.group(1)
+                    content = msg.section(spec)
+                    key = "RFC822" if name == "RFC822" else f"BODY[{spec}]"
+                    if match.group(2) is not None:
+                        origin, length = int(match.group(2)), int(match.group(3))
+                        content = content[origin:origin + length]
+                        key += f"<{origin}>"
+                    chunks.append(f"{key} {{{len(content)}}}\r\n".encode() + content)
+            self.send(f"* {seq} FETCH (".encode() + b" ".join(chunks) + b")\r\n")
+        self.send(f"{tag} OK FETCH terminé\r\n")
+
+    def do_idle(self, tag, args, by_uid):
+        """IDLE: signaler les nouveaux messages jusqu'à réception de DONE"""
+        self.send("+ idling\r\n")
+        known = len(self.server.messages)
+        while True:
+            readable, _, _ = select.select([self.connection], [], [], 0.05)
+            if readable:
+                line = self.rfile.readline()
+                if not line:
+                    return False
+                if line.strip().upper() == b"DONE":
+                    self.send(f"{tag} OK IDLE terminé\r\n")
+                    return
+            current = len(self.server.messages)
+            if current != known:
+                known = current
+                self.send(f"* {current} EXISTS\r\n")
+
+class IMAPStubServer(socketserver.ThreadingTCPServer):
+    """Serveur IMAP local (sans TLS) servant une boîte unique"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, raw_messages=None, host="127.0.0.1", port=0, uidvalidity=UIDVALIDITY):
+        super().__init__((host, port), IMAPStubHandler)
+        self.uidvalidity = uidvalidity
+        self.messages = [StoredMessage(uid, raw) for uid, raw in enumerate(raw_messages or [], 1)]
+        self.lock = threading.Lock()
+        self.bytes_sent = 0
+        self.commands = 0
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def append_message(self, raw):
+        """Ajouter un message (notifié aux sessions en IDLE)"""
+        with self.lock:
+            uid = self.messages[-1].uid + 1 if self.messages else 1
+            self.messages = self.messages + [StoredMessage(uid, raw)]
+        return uid
+
+    def count_bytes(self, count):
+        with self.lock:
+            self.bytes_sent += count
+
+    def count_commands(self):
+        with self.lock:
+            self.commands += 1
+
+    def reset_counters(self):
+        with self.lock:
+            self.bytes_sent = 0
+            self.commands = 0
+
+    def start(self):
+        """Démarrer le serveur dans un thread; retourne le port d'écoute"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serveur IMAP local de test")
+    parser.add_argument('--port', type=int, default=1143)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--html-ratio', type=float, default=0.2)
+    parser.add_argument('--attachment-ratio', type=float, default=0.1)
+    parser.add_argument('--attachment-kb', type=int, default=512)
+    args = parser.parse_args()
+
+    server = IMAPStubServer(
+        generate_mailbox(args.messages, html_ratio=args.html_ratio,
+                         attachment_ratio=args.attachment_ratio, attachment_kb=args.attachment_kb),
+        port=args.port
+    )
+    print(f"Serveur IMAP de test sur 127.0.0.1:{server.port} ({args.messages} messages), Ctrl+C pour arrêter")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
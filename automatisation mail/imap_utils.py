@@ -0,0 +1,223 @@
+"""
+Outils IMAP bas niveau: ensembles d'UID, découpage des réponses FETCH,
+analyse de BODYSTRUCTURE et décodage des contenus partiels
+"""
+
+import base64
+import quopri
+import re
+from html.parser import HTMLParser
+
+FETCH_START = re.compile(rb'^\d+ \(')
+LITERAL_KEY = re.compile(rb'(BODY\[[^\]]*\](?:<\d+>)?|RFC822(?:\.HEADER|\.TEXT)?|BODYSTRUCTURE)\s*\{\d+\}\s*$')
+UID_PATTERN = re.compile(rb'UID (\d+)')
+
+def compress_uid_set(uids):
+    """Transformer une liste d'UID en ensemble IMAP compact ("1:5,8,10:12")"""
+    ranges = []
+    for uid in sorted(set(int(u) for u in uids)):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+
+    return ",".join(str(start) if start == end else f"{start}:{end}" for start, end in ranges)
+
+def chunk_uids(uids, size=200):
+    """Découper une liste d'UID en lots pour borner la taille des commandes"""
+    uids = sorted(uids)
+    for i in range(0, len(uids), size):
+        yield uids[i:i + size]
+
+def split_fetch_response(data):
+    """Regrouper la réponse d'un UID FETCH multi-messages par UID
+
+    imaplib renvoie une liste mêlant des tuples (préfixe, littéral) et des
+    octets de fin ("UID 12)"). On retourne {uid: {clé: octets}} où la clé est
+    l'item demandé, par exemple b'BODY[HEADER]' ou b'BODY[1]<0>'. Les
+    parties hors littéraux (dont BODYSTRUCTURE) sont regroupées sous b'TEXT'.
+    """
+    messages = {}
+    current = None
+    texts = []
+
+    def flush():
+        if current is None:
+            return
+        current[b'TEXT'] = b" ".join(texts)
+        match = UID_PATTERN.search(current[b'TEXT'])
+        if match:
+            messages[int(match.group(1))] = current
+
+    for item in data:
+        if item is None:
+            continue
+        prefix = item[0] if isinstance(item, tuple) else item
+
+        if FETCH_START.match(prefix):
+            flush()
+            current = {}
+            texts = []
+
+        if current is None:
+            continue
+
+        texts.append(prefix)
+        if isinstance(item, tuple):
+            match = LITERAL_KEY.search(prefix)
+            if match:
+                # Les serveurs renvoient BODY[...] même pour une demande BODY.PEEK[...]
+                current[match.group(1)] = item[1]
+
+    flush()
+    return messages
+
+def parse_bodystructure(text):
+    """Extraire et analyser la BODYSTRUCTURE d'une réponse FETCH en listes imbriquées"""
+    start = text.find(b'BODYSTRUCTURE (')
+    if start < 0:
+        return None
+
+    tokens = BODYSTRUCTURE_TOKEN.finditer(text, start + len(b'BODYSTRUCTURE '))
+    try:
+        return read_sexpr(tokens)
+    except (StopIteration, ValueError):
+        return None
+
+BODYSTRUCTURE_TOKEN = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+
+def read_sexpr(tokens):
+    """Lire une expression IMAP (liste, chaîne, NIL ou atome)"""
+    token = next(tokens).group(0)
+    if token == b'(':
+        items = []
+        while True:
+            value = read_sexpr(tokens)
+            if value is CLOSE:
+                return items
+            items.append(value)
+    if token == b')':
+        return CLOSE
+    if token.startswith(b'"'):
+        return re.sub(rb'\\(.)', rb'\1', token[1:-1]).decode('utf-8', errors='replace')
+    if token.upper() == b'NIL':
+        return None
+    return token.decode('ascii', errors='replace')
+
+CLOSE = object()
+
+def iter_leaf_parts(structure, section=""):
+    """Parcourir les parties feuilles avec leur numéro de section IMAP"""
+    if not isinstance(structure, list) or not structure:
+        return
+
+    if isinstance(structure[0], list):
+        # multipart: sous-parties suivies du sous-type et des extensions
+        for index, child in enumerate(structure, 1):
+            if not isinstance(child, list):
+                break
+            yield from iter_leaf_parts(child, f"{section}.{index}" if section else str(index))
+    else:
+        # Une partie unique au premier niveau s'adresse en BODY[1]
+        yield section or "1", structure
+
+def select_text_part(structure):
+    """Choisir la meilleure partie texte: text/plain, sinon text/html
+
+    Les parties marquées en pièce jointe sont ignorées. Retourne un dict
+    (section, subtype, encoding, charset, size) ou None.
+    """
+    candidates = {}
+    for section, part in iter_leaf_parts(structure):
+        if len(part) < 7 or (part[0] or "").lower() != "text":
+            continue
+        if any(isinstance(ext, list) and ext and str(ext[0]).lower() == "attachment" for ext in part[8:]):
+            continue
+
+        subtype = (part[1] or "").lower()
+        params = part[2] or []
+        params = {str(params[i]).lower(): params[i + 1] for i in range(0, len(params) - 1, 2)}
+        if subtype in ("plain", "html") and subtype not in candidates:
+            candidates[subtype] = {
+                'section': section,
+                'subtype': subtype,
+                'encoding': (part[5] or "7bit").lower(),
+                'charset': params.get("charset"),
+                'size': int(part[6]) if str(part[6]).isdigit() else 0
+            }
+
+    return candidates.get("plain") or candidates.get("html")
+
+class HTMLTextExtractor(HTMLParser):
+    """Extraction de texte HTML en flux, arrêtée dès que max_chars est atteint"""
+
+    SKIPPED_TAGS = {"script", "style", "head", "title"}
+    BREAK_TAGS = {"br", "p", "div", "tr", "li", "h1", "h2", "h3", "h4", "table"}
+
+    def __init__(self, max_chars=500):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.chunks = []
+        self.length = 0
+        self.skip_depth = 0
+
+    @property
+    def full(self):
+        return self.length >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in self.BREAK_TAGS:
+            self.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.append(data)
+
+    def append(self, data):
+        if self.full:
+            return
+        data = re.sub(r'\s+', ' ', data)
+        if data.strip() or (self.chunks and not self.chunks[-1].endswith(" ")):
+            self.chunks.append(data)
+            self.length += len(data)
+
+    def get_text(self):
+        return "".join(self.chunks).strip()[:self.max_chars]
+
+def html_to_text(html, max_chars=500, chunk_size=4096):
+    """Convertir du HTML en texte brut en s'arrêtant à max_chars caractères"""
+    extractor = HTMLTextExtractor(max_chars)
+    for i in range(0, len(html), chunk_size):
+        extractor.feed(html[i:i + chunk_size])
+        if extractor.full:
+            break
+    return extractor.get_text()
+
+def decode_partial(payload, transfer_encoding, charset, max_chars=500):
+    """Décoder un contenu éventuellement tronqué (base64, quoted-printable, 8bit)"""
+    if not payload:
+        return ""
+
+    transfer_encoding = (transfer_encoding or "").lower()
+    try:
+        if transfer_encoding == "base64":
+            compact = re.sub(rb'\s+', b'', payload)
+            compact = compact[:len(compact) - len(compact) % 4]
+            payload = base64.b64decode(compact)
+        elif transfer_encoding == "quoted-printable":
+            payload = quopri.decodestring(payload)
+    except ValueError:
+        pass
+
+    try:
+        text = payload.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        text = payload.decode("utf-8", errors="replace")
+
+    return text[:max_chars] if max_chars else text
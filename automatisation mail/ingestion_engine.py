@@ -0,0 +1,190 @@
+"""
+Ingestion concurrente de plusieurs comptes et dossiers IMAP
+Les connexions sont réutilisées via un pool borné; chaque dossier garde son
+propre point de reprise et une erreur sur un compte n'affecte pas les autres
+"""
+
+import imaplib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from email_classifier import EmailClassifier
+
+class IMAPConnectionPool:
+    """Pool de connexions IMAP authentifiées, réutilisées entre les synchronisations"""
+
+    def __init__(self, max_connections=8, max_per_account=2):
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.max_per_account = max_per_account
+        self.idle = {}
+        self.account_slots = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, account):
+        """Obtenir une connexion pour un compte (réutilisée si possible)"""
+        with self.lock:
+            idle = self.idle.setdefault(account['email'], queue.LifoQueue())
+            account_slots = self.account_slots.setdefault(
+                account['email'], threading.BoundedSemaphore(self.max_per_account)
+            )
+
+        account_slots.acquire()
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    mail = idle.get_nowait()
+                except queue.Empty:
+                    return self.open_connection(account)
+                if self.is_alive(mail):
+                    return mail
+                self.close_connection(mail)
+        except Exception:
+            self.slots.release()
+            account_slots.release()
+            raise
+
+    def release(self, account, mail, broken=False):
+        """Rendre une connexion au pool (fermée si elle est en erreur)"""
+        try:
+            if broken:
+                self.close_connection(mail)
+            else:
+                self.idle[account['email']].put(mail)
+        finally:
+            self.slots.release()
+            self.account_slots[account['email']].release()
+
+    def open_connection(self, account):
+        """Ouvrir et authentifier une nouvelle connexion"""
+        server = account.get('imap_server', 'imap.gmail.com')
+        if account.get('ssl', True):
+            mail = imaplib.IMAP4_SSL(server, account.get('port', 993))
+        else:
+            mail = imaplib.IMAP4(server, account.get('port', 143))
+        mail.login(account['email'], account['password'])
+        return mail
+
+    def is_alive(self, mail):
+        """Vérifier qu'une connexion inactive répond encore"""
+        try:
+            return mail.noop()[0] == 'OK'
+        except (imaplib.IMAP4.error, OSError):
+            return False
+
+    def close_connection(self, mail):
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """Fermer toutes les connexions inactives"""
+        with self.lock:
+            for idle in self.idle.values():
+                while not idle.empty():
+                    self.close_connection(idle.get_nowait())
+
+class IngestionEngine:
+    """Synchronise tous les dossiers de tous les comptes en parallèle"""
+
+    def __init__(self, accounts, classifier_factory=EmailClassifier, max_workers=8, max_per_account=2):
+        self.accounts = accounts
+        self.classifier_factory = classifier_factory
+        self.max_workers = max_workers
+        self.pool = IMAPConnectionPool(max_workers, max_per_account)
+        # Client IA commun à tous les dossiers: AI_MAX_IN_FLIGHT et le débit valent pour tout le moteur
+        self.llm_client = None
+        self.lock = threading.Lock()
+
+    def create_classifier(self):
+        """Classificateur propre à une tâche, branché sur le client IA partagé"""
+        # Connexion SQLite propre à la tâche: sqlite3 refuse le partage entre threads
+        classifier = self.classifier_factory()
+        with self.lock:
+            if self.llm_client is None:
+                self.llm_client = classifier.llm_client
+            elif classifier.llm_client is not None:
+                classifier.llm_client = self.llm_client
+        return classifier
+
+    def sync_folder(self, account, mailbox):
+        """Synchroniser un dossier; les erreurs restent locales à ce dossier"""
+        start = time.perf_counter()
+        # Créé avant de prendre une connexion: un échec ici ne retient aucune place du pool
+        classifier = self.create_classifier()
+        try:
+            mail = self.pool.acquire(account)
+            broken = False
+            try:
+                classifier.mail = mail
+                classifier.account = account['email']
+                emails = classifier.sync_mailbox(account['email'], mailbox, account.get('initial_count', 50))
+                return len(emails), time.perf_counter() - start
+            except (imaplib.IMAP4.error, OSError):
+                broken = True
+                raise
+            finally:
+                self.pool.release(account, mail, broken)
+        finally:
+            classifier.close()
+
+    def run_once(self):
+        """Lancer une passe de synchronisation sur tous les dossiers
+
+        Retourne {(compte, dossier): {'count', 'seconds'} ou {'error'}}.
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for account in self.accounts:
+                for mailbox in account.get('mailboxes', ['inbox']):
+                    future = executor.submit(self.sync_folder, account, mailbox)
+                    futures[future] = (account['email'], mailbox)
+
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    count, seconds = future.result()
+                    results[key] = {'count': count, 'seconds': round(seconds, 3)}
+                except Exception as e:
+                    results[key] = {'error': str(e)}
+                    print(f"Erreur de synchronisation {key[0]}/{key[1]}: {e}")
+
+        return results
+
+    def close(self):
+        """Fermer les connexions IMAP du pool"""
+        self.pool.close_all()
+
+def load_accounts(accounts_file="accounts.json"):
+    """Charger la liste des comptes (ou le compte unique de config.env)"""
+    if os.path.exists(accounts_file):
+        with open(accounts_file, 'r', encoding='utf-8') as f:
+            return json.load(f)["accounts"]
+
+    return [{
+        "email": os.getenv('EMAIL_ADDRESS'),
+        "password": os.getenv('EMAIL_PASSWORD'),
+        "imap_server": os.getenv('IMAP_SERVER', 'imap.gmail.com'),
+        "mailboxes": ["inbox"]
+    }]
+
+if __name__ == "__main__":
+    engine = IngestionEngine(load_accounts())
+
+    print("Synchronisation de tous les comptes...")
+    start = time.perf_counter()
+    results = engine.run_once()
+    engine.close()
+
+    for (account, mailbox), result in sorted(results.items()):
+        if 'error' in result:
+            print(f"  {account}/{mailbox}: ERREUR {result['error']}")
+        else:
+            print(f"  {account}/{mailbox}: {result['count']} emails en {result['seconds']}s")
+    print(f"Durée totale: {time.perf_counter() - start:.2f}s")
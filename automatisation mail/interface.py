@@ -4,6 +4,8 @@ import sqlite3
 from datetime import datetime
 import threading
 from email_classifier import EmailClassifier
+from email_search import search_emails
+from keyword_matcher import PRIORITY_LABELS
 
 class EmailManagerGUI:
     def __init__(self, root):
@@ -40,6 +42,17 @@ class EmailManagerGUI:
         self.priority_filter.pack(side=tk.LEFT, padx=(0, 10))
         self.priority_filter.bind("<<ComboboxSelected>>", self.filter_emails)
 
+        # Recherche plein texte (expéditeur, sujet, contenu) et date de réception minimale
+        ttk.Label(button_frame, text="Rechercher:").pack(side=tk.LEFT, padx=(20, 5))
+        self.search_entry = ttk.Entry(button_frame, width=30)
+        self.search_entry.pack(side=tk.LEFT, padx=(0, 5))
+        self.search_entry.bind("<Return>", self.filter_emails)
+        ttk.Label(button_frame, text="Depuis (AAAA-MM-JJ):").pack(side=tk.LEFT, padx=(10, 5))
+        self.since_entry = ttk.Entry(button_frame, width=12)
+        self.since_entry.pack(side=tk.LEFT, padx=(0, 5))
+        self.since_entry.bind("<Return>", self.filter_emails)
+        ttk.Button(button_frame, text="Chercher", command=self.filter_emails).pack(side=tk.LEFT)
+
         # Statistiques
         self.stats_frame = ttk.LabelFrame(main_frame, text="Statistiques", padding="10")
         self.stats_frame.pack(fill=tk.X, pady=(0, 10))
@@ -100,19 +113,25 @@ class EmailManagerGUI:
     def load_emails(self):
         """Charger les emails depuis la base de données"""
         try:
-            conn = sqlite3.connect('emails_trie.db')
+            # Base en mode WAL: la lecture n'attend pas les écritures du classificateur
+            conn = sqlite3.connect('emails_trie.db', timeout=10)
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM emails ORDER BY priority DESC, processed_date DESC')
+            cursor.execute('''
+                SELECT id, sender, subject, content, priority, priority_label, date_received, processed_date
+                FROM emails ORDER BY priority DESC, processed_date DESC
+            ''')
             self.all_emails = cursor.fetchall()
             conn.close()
 
-            self.display_emails(self.all_emails)
+            self.filter_emails()
             self.update_stats()
         except Exception as e:
             messagebox.showerror("Erreur", f"Impossible de charger les emails: {e}")
 
     def display_emails(self, emails):
         """Afficher les emails dans le treeview"""
+        # Emails affichés par id, pour les détails de la sélection
+        self.displayed_emails = {email[0]: email for email in emails}
         for item in self.tree.get_children():
             self.tree.delete(item)
 
@@ -138,14 +157,30 @@ class EmailManagerGUI:
             ), tags=[priority_label])
 
     def filter_emails(self, event=None):
-        """Filtrer les emails par priorité"""
+        """Filtrer les emails par priorité, par texte et par date (index plein texte)"""
         filter_priority = self.priority_filter.get()
+        query = self.search_entry.get().strip()
+        since = self.since_entry.get().strip() or None
+
+        if not query and not since:
+            if filter_priority == "Tous":
+                filtered_emails = self.all_emails
+            else:
+                filtered_emails = [email for email in self.all_emails if email[5] == filter_priority]
+            self.display_emails(filtered_emails)
+            return
 
-        if filter_priority == "Tous":
-            filtered_emails = self.all_emails
-        else:
-            filtered_emails = [email for email in self.all_emails if email[5] == filter_priority]
-
+        priority_nums = {label: num for num, label in PRIORITY_LABELS.items()}
+        try:
+            conn = sqlite3.connect('emails_trie.db', timeout=10)
+            filtered_emails = search_emails(conn, query, priority_nums.get(filter_priority), since=since, limit=500)
+            conn.close()
+        except ValueError:
+            messagebox.showerror("Erreur", f"Date invalide: {since} (format AAAA-MM-JJ)")
+            return
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Recherche impossible: {e}")
+            return
         self.display_emails(filtered_emails)
 
     def show_email_details(self, event):
@@ -157,11 +192,7 @@ class EmailManagerGUI:
         email_id = self.tree.item(selected_item[0])['values'][0]
 
         # Trouver l'email correspondant
-        selected_email = None
-        for email in self.all_emails:
-            if email[0] == email_id:
-                selected_email = email
-                break
+        selected_email = self.displayed_emails.get(email_id)
 
         if selected_email:
             details = f"Expéditeur: {selected_email[1]}\n\n"
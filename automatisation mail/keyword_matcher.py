@@ -0,0 +1,231 @@
+"""
+Recherche simultanée de toutes les règles d'une configuration business
+Mots-clés et sujets: index de mots normalisés (mots seuls par intersection
+d'ensembles, expressions par index sur leur premier mot). Expéditeurs:
+automate d'Aho-Corasick sur l'adresse brute, compilé une seule fois
+"""
+
+from text_normalizer import tokenize
+
+PRIORITY_LEVELS = [
+    (4, "URGENT", "urgent"),
+    (3, "HAUTE", "high"),
+    (2, "MOYENNE", "medium"),
+    (1, "BASSE", "low")
+]
+
+PRIORITY_LABELS = {priority_num: label for priority_num, label, _ in PRIORITY_LEVELS}
+
+class KeywordMatcher:
+    """Automate d'Aho-Corasick dont chaque état porte la priorité maximale reconnue"""
+
+    def __init__(self, patterns):
+        """patterns: couples (motif, priorité); les motifs sont mis en minuscules ici"""
+        self.transitions = [{}]
+        self.best = [0]
+        # Motif (tel qu'écrit) qui donne sa priorité à chaque état, pour explain()
+        self.patterns = [None]
+        for pattern, priority in patterns:
+            self.add(pattern.lower(), priority, pattern)
+        self.build()
+        self.top = max(self.best) if self.best else 0
+
+    def add(self, pattern, priority, name=None):
+        state = 0
+        for char in pattern:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions[state][char] = next_state
+                self.transitions.append({})
+                self.best.append(0)
+                self.patterns.append(None)
+            state = next_state
+        if priority > self.best[state] or self.patterns[state] is None:
+            self.best[state] = priority
+            self.patterns[state] = name or pattern
+
+    def build(self):
+        """Calculer les liens d'échec puis les transitions complètes (automate déterministe)
+
+        Chaque état hérite de la priorité de son lien d'échec: un motif
+        suffixe d'un autre est reconnu sans remonter la chaîne à la recherche.
+        """
+        fail = [0] * len(self.transitions)
+        order = list(self.transitions[0].values())
+        for state in order:
+            for char, child in self.transitions[state].items():
+                order.append(child)
+                if state:
+                    fallback = fail[state]
+                    while fallback and char not in self.transitions[fallback]:
+                        fallback = fail[fallback]
+                    fail[child] = self.transitions[fallback].get(char, 0)
+
+        # Parcours en largeur: le lien d'échec d'un état est toujours complété avant lui
+        for state in order:
+            if self.best[fail[state]] > self.best[state]:
+                self.best[state] = self.best[fail[state]]
+                self.patterns[state] = self.patterns[fail[state]]
+            inherited = self.transitions[fail[state]]
+            for char, target in inherited.items():
+                self.transitions[state].setdefault(char, target)
+
+    def search(self, text):
+        """Priorité la plus haute parmi les motifs présents dans `text` (0 si aucun)"""
+        transitions = self.transitions
+        best_by_state = self.best
+        top = self.top
+        best = best_by_state[0]
+        if best >= top:
+            return best
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            priority = best_by_state[state]
+            if priority > best:
+                best = priority
+                if best == top:
+                    break
+        return best
+
+    def explain(self, text):
+        """(priorité, motif) du motif le plus prioritaire présent dans `text`, (0, None) si aucun"""
+        transitions = self.transitions
+        best_by_state = self.best
+        top = self.top
+        best, found = 0, None
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if best_by_state[state] > best:
+                best, found = best_by_state[state], self.patterns[state]
+                if best == top:
+                    break
+        return best, found
+
+class TokenRules:
+    """Index de règles par mots normalisés: priorité maximale des règles présentes"""
+
+    def __init__(self, patterns):
+        self.words = {}
+        self.phrases = {}
+        # Règle telle qu'écrite, par mot ou expression normalisée, pour explain()
+        self.names = {}
+        for pattern, priority in patterns:
+            tokens = tuple(tokenize(pattern))
+            if len(tokens) == 1:
+                if priority > self.words.get(tokens[0], 0):
+                    self.names[tokens[0]] = pattern
+                self.words[tokens[0]] = max(self.words.get(tokens[0], 0), priority)
+            elif tokens:
+                self.phrases.setdefault(tokens[0], []).append((tokens, priority))
+                self.names.setdefault(tokens, pattern)
+        self.top = max(list(self.words.values()) + [p for entries in self.phrases.values() for _, p in entries],
+                       default=0)
+
+    def search(self, tokens):
+        """Priorité la plus haute parmi les règles présentes dans la liste de mots (0 si aucune)"""
+        if not self.top:
+            return 0
+        present = set(tokens)
+        return self.phrase_search(tokens, present, max(self.word_hits(present), default=0))
+
+    def word_hits(self, present):
+        """Priorités des règles d'un seul mot présentes dans l'ensemble de mots"""
+        words = self.words
+        return [words[word] for word in present.intersection(words)]
+
+    def phrase_search(self, tokens, present, best=0):
+        """Priorité la plus haute entre `best` et les expressions présentes dans la liste de mots"""
+        starts = present.intersection(self.phrases)
+        if starts and best < self.top:
+            for i, token in enumerate(tokens):
+                if token not in starts:
+                    continue
+                for phrase, priority in self.phrases[token]:
+                    if priority > best and tuple(tokens[i:i + len(phrase)]) == phrase:
+                        best = priority
+        return best
+
+    def explain(self, tokens):
+        """(priorité, règle) de la règle la plus prioritaire présente dans la liste de mots, (0, None) si aucune"""
+        best, found = 0, None
+        if not self.top:
+            return best, found
+        present = set(tokens)
+        for word in present.intersection(self.words):
+            if self.words[word] > best:
+                best, found = self.words[word], self.names[word]
+        starts = present.intersection(self.phrases)
+        if starts and best < self.top:
+            for i, token in enumerate(tokens):
+                if token not in starts:
+                    continue
+                for phrase, priority in self.phrases[token]:
+                    if priority > best and tuple(tokens[i:i + len(phrase)]) == phrase:
+                        best, found = priority, self.names[phrase]
+        return best, found
+
+class CompiledRules:
+    """Règles de priorité d'une configuration, compilées par champ de l'email"""
+
+    def __init__(self, priority_rules):
+        keywords, senders, subjects = [], [], []
+        for priority_num, priority_label, config_key in PRIORITY_LEVELS:
+            rules = priority_rules.get(config_key, {})
+            keywords.extend((keyword, priority_num) for keyword in rules.get("keywords", []))
+            senders.extend((pattern, priority_num) for pattern in rules.get("senders", []))
+            subjects.extend((pattern, priority_num) for pattern in rules.get("subjects", []))
+
+        self.keywords = TokenRules(keywords)
+        self.senders = KeywordMatcher(senders)
+        self.subjects = TokenRules(subjects)
+
+    def match(self, subject, sender, body):
+        """(priorité, libellé) de la règle la plus prioritaire, ou None
+
+        Le sujet et le corps ne sont normalisés qu'une fois pour toutes les règles.
+        """
+        subject_tokens = tokenize(subject)
+        best = self.keywords.search(subject_tokens + tokenize(body))
+        if best < self.senders.top:
+            best = max(best, self.senders.search(sender.lower()))
+        if best < self.subjects.top:
+            best = max(best, self.subjects.search(subject_tokens))
+        if best:
+            return best, PRIORITY_LABELS[best]
+        return None
+
+    def explain(self, subject, sender, body):
+        """Comme match, avec la règle décisive: (priorité, type de règle, règle) ou None
+
+        Type de règle: clé de la configuration ("keywords", "senders", "subjects").
+        """
+        subject_tokens = tokenize(subject)
+        best, found = self.keywords.explain(subject_tokens + tokenize(body))
+        kind = "keywords"
+        if best < self.senders.top:
+            priority, pattern = self.senders.explain(sender.lower())
+            if priority > best:
+                best, found, kind = priority, pattern, "senders"
+        if best < self.subjects.top:
+            priority, pattern = self.subjects.explain(subject_tokens)
+            if priority > best:
+                best, found, kind = priority, pattern, "subjects"
+        if best:
+            return best, kind, found
+        return None
+
+    def content_hits(self, subject, body):
+        """Décomposition de match (hors expéditeur) pour le classement par lots
+
+        Retourne (priorités des mots-clés d'un seul mot trouvés, meilleure
+        priorité des expressions et des règles de sujet). Avec la priorité de
+        l'expéditeur (self.senders), leur maximum est la priorité de match.
+        """
+        subject_tokens = tokenize(subject)
+        tokens = subject_tokens + tokenize(body)
+        present = set(tokens)
+        other = max(self.keywords.phrase_search(tokens, present), self.subjects.search(subject_tokens))
+        return self.keywords.word_hits(present), other
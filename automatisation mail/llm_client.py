@@ -0,0 +1,409 @@
+"""
+Client asynchrone de classification par LLM (API chat completions d'OpenAI)
+Plusieurs emails sont classés en parallèle, avec un nombre de requêtes en
+vol borné (tous threads confondus), un limiteur de débit à jetons et une échéance stricte par appel.
+Un disjoncteur bascule sur la classification par règles seules quand le
+taux d'erreur s'envole, puis réessaie après un délai.
+En mode lot, plusieurs emails numérotés partagent un seul prompt (les
+consignes ne sont envoyées qu'une fois); les éléments dont la réponse est
+absente ou mal formée sont redemandés un par un
+"""
+
+import asyncio
+import json
+import re
+import ssl
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from keyword_matcher import PRIORITY_LABELS
+
+AI_MODEL = "gpt-3.5-turbo"
+
+AI_PROMPT_TEMPLATE = """
+            Analysez cet email reçu par une entreprise de conciergerie et classez sa priorité:
+
+            Expéditeur: {sender}
+            Sujet: {subject}
+            Contenu: {body}
+
+            Critères de priorité:
+            4-URGENT: Urgences, pannes, réclamations graves, problèmes techniques
+            3-HAUTE: Nouvelles demandes clients, réservations, rendez-vous
+            2-MOYENNE: Confirmations, demandes d'information, suivi
+            1-BASSE: Newsletters, spam, promotions
+
+            Répondez uniquement avec le format: "4,URGENT" ou "3,HAUTE" ou "2,MOYENNE" ou "1,BASSE"
+            """
+
+AI_BATCH_PROMPT_TEMPLATE = """
+            Analysez ces {count} emails reçus par une entreprise de conciergerie et classez la priorité de chacun:
+
+{emails}
+
+            Critères de priorité:
+            4-URGENT: Urgences, pannes, réclamations graves, problèmes techniques
+            3-HAUTE: Nouvelles demandes clients, réservations, rendez-vous
+            2-MOYENNE: Confirmations, demandes d'information, suivi
+            1-BASSE: Newsletters, spam, promotions
+
+            Répondez uniquement avec une ligne par email, dans l'ordre, au format "numéro: priorité", par exemple:
+            1: 4,URGENT
+            2: 1,BASSE
+            """
+
+AI_BATCH_ITEM_TEMPLATE = """            [{number}] Expéditeur: {sender}
+            Sujet: {subject}
+            Contenu: {body}"""
+
+# "3: 4,URGENT", "[3] 4,URGENT", "3. 4,URGENT"...
+BATCH_LINE_RE = re.compile(r'^\s*\[?(\d+)\]?\s*[:.)-]?\s*(.+?)\s*$', re.MULTILINE)
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+class LLMError(Exception):
+    """Réponse HTTP en erreur ou inexploitable"""
+
+def build_prompt(subject, sender, body):
+    return AI_PROMPT_TEMPLATE.format(sender=sender, subject=subject, body=(body or "")[:300])
+
+def build_batch_prompt(emails):
+    """Prompt unique pour plusieurs (sujet, expéditeur, corps), numérotés à partir de 1"""
+    items = "\n\n".join(
+        # Corps sur une ligne: chaque élément reste délimité par son numéro
+        AI_BATCH_ITEM_TEMPLATE.format(number=number, sender=sender, subject=' '.join((subject or "").split()),
+                                      body=' '.join((body or "")[:300].split()))
+        for number, (subject, sender, body) in enumerate(emails, 1)
+    )
+    return AI_BATCH_PROMPT_TEMPLATE.format(count=len(emails), emails=items)
+
+def parse_priority_answer(text):
+    """Réponse "4,URGENT" -> (4, "URGENT"); LLMError si elle ne respecte pas le format"""
+    try:
+        number, label = text.strip().strip('"').split(',', 1)
+        priority_num = int(number)
+    except ValueError:
+        raise LLMError(f"réponse inattendue: {text!r}")
+    if priority_num not in PRIORITY_LABELS:
+        raise LLMError(f"priorité hors bornes: {text!r}")
+    return priority_num, PRIORITY_LABELS[priority_num]
+
+def parse_batch_answer(text, count):
+    """Réponse numérotée -> {numéro: (priorité, libellé)}; les lignes mal formées sont ignorées"""
+    answers = {}
+    for number, answer in BATCH_LINE_RE.findall(text):
+        number = int(number)
+        if 1 <= number <= count and number not in answers:
+            try:
+                answers[number] = parse_priority_answer(answer)
+            except LLMError:
+                pass
+    return answers
+
+class TokenBucket:
+    """Limiteur de débit: `rate` requêtes par seconde, rafales jusqu'à `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Partagé par les boucles asyncio de plusieurs threads (classify_many concurrents)
+        self.lock = threading.Lock()
+
+    async def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+class InFlightLimiter:
+    """Au plus `limit` requêtes en vol, toutes boucles asyncio et tous threads confondus
+
+    Un asyncio.Semaphore n'appartient qu'à une boucle: chaque asyncio.run
+    aurait le sien. Ici le compteur est protégé par un verrou et une place
+    libérée est passée directement au premier en attente, dans sa boucle.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters = deque()
+        self.lock = threading.Lock()
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.in_flight < self.limit and not self.waiters:
+                self.in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self.waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    raise
+            # La place venait d'être transmise: la passer au suivant
+            self.release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        with self.lock:
+            if not self.waiters:
+                self.in_flight -= 1
+                return
+            loop, future = self.waiters.popleft()
+        loop.call_soon_threadsafe(self.wake, future)
+
+    @staticmethod
+    def wake(future):
+        if not future.done():
+            future.set_result(None)
+
+class CircuitBreaker:
+    """Disjoncteur sur les `window` derniers appels
+
+    Fermé: les appels passent. Ouvert (taux d'erreur >= failure_ratio sur au
+    moins min_calls appels): plus aucun appel pendant `cooldown` secondes.
+    Ensuite, un appel d'essai décide de la refermeture.
+
+    allow() rend un ticket (génération, essai) à repasser à record(): chaque
+    ouverture ou fermeture change de génération, si bien que les réponses
+    tardives d'appels admis avant le changement sont ignorées et que seul
+    l'appel d'essai tranche.
+    """
+
+    def __init__(self, window=20, min_calls=5, failure_ratio=0.5, cooldown=30.0):
+        self.outcomes = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.opened_at = None
+        self.trial_running = False
+        self.generation = 0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "fermé"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "ouvert"
+        return "semi-ouvert"
+
+    def allow(self):
+        """Ticket d'admission, ou None si l'appel doit être court-circuité"""
+        with self.lock:
+            state = self.state
+            if state == "fermé":
+                return (self.generation, False)
+            if state == "semi-ouvert" and not self.trial_running:
+                self.trial_running = True
+                return (self.generation, True)
+            return None
+
+    def record(self, ticket, success):
+        with self.lock:
+            generation, trial = ticket
+            if generation != self.generation:
+                # Appel admis avant la dernière ouverture ou fermeture
+                return
+            if trial:
+                self.trial_running = False
+                self.generation += 1
+                if success:
+                    self.opened_at = None
+                    self.outcomes.clear()
+                else:
+                    self.opened_at = time.monotonic()
+                return
+            if self.opened_at is not None:
+                return
+
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) < self.min_calls or failures / len(self.outcomes) < self.failure_ratio:
+                return
+            self.opened_at = time.monotonic()
+            self.generation += 1
+            self.trips += 1
+            calls = len(self.outcomes)
+        print(f"Disjoncteur IA ouvert ({failures}/{calls} erreurs): règles seules pendant {self.cooldown:g}s")
+
+class AsyncLLMClient:
+    """Classification concurrente par l'API chat completions, sans dépendance externe"""
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, model=AI_MODEL, max_in_flight=8,
+                 rate_per_second=5.0, deadline=10.0, breaker=None, batch_size=1):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.deadline = deadline
+        self.batch_size = max(1, batch_size)
+        self.bucket = TokenBucket(rate_per_second)
+        self.breaker = breaker or CircuitBreaker()
+        # Partagés par tous les threads qui appellent classify_many
+        self.in_flight = InFlightLimiter(max_in_flight)
+        self.stats = {'calls': 0, 'succeeded': 0, 'failed': 0, 'timeouts': 0, 'short_circuited': 0,
+                      'batches': 0, 'requeued': 0}
+        self.stats_lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        with self.stats_lock:
+            self.stats[name] += amount
+
+    async def post_json(self, path, payload):
+        """POST HTTP/1.1 minimal (une connexion par requête) et corps JSON de la réponse"""
+        url = urlsplit(self.base_url + path)
+        secure = url.scheme == 'https'
+        port = url.port or (443 if secure else 80)
+        reader, writer = await asyncio.open_connection(
+            url.hostname, port, ssl=ssl.create_default_context() if secure else None
+        )
+        try:
+            body = json.dumps(payload).encode('utf-8')
+            head = (
+                f"POST {url.path} HTTP/1.1\r\n"
+                f"Host: {url.hostname}\r\n"
+                f"Authorization: Bearer {self.api_key}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode('ascii') + body)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            parts = status_line.decode('latin-1').split(' ', 2)
+            if len(parts) < 2 or not parts[1].isdigit():
+                raise LLMError(f"réponse HTTP invalide: {status_line!r}")
+            status = int(parts[1])
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if headers.get('transfer-encoding', '').lower() == 'chunked':
+                chunks = []
+                while True:
+                    size = int((await reader.readline()).split(b';')[0], 16)
+                    if size == 0:
+                        break
+                    chunks.append(await reader.readexactly(size))
+                    await reader.readline()
+                data = b''.join(chunks)
+            elif 'content-length' in headers:
+                data = await reader.readexactly(int(headers['content-length']))
+            else:
+                data = await reader.read()
+        finally:
+            writer.close()
+
+        if status != 200:
+            raise LLMError(f"HTTP {status}: {data[:200]!r}")
+        return json.loads(data)
+
+    async def complete(self, prompt, max_tokens):
+        """Texte de la réponse du modèle à un prompt"""
+        response = await self.post_json('/chat/completions', {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'max_tokens': max_tokens
+        })
+        try:
+            return response['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(f"réponse sans contenu: {str(response)[:200]}")
+
+    async def request(self, subject, sender, body):
+        return parse_priority_answer(await self.complete(build_prompt(subject, sender, body), 10))
+
+    async def request_batch(self, emails):
+        content = await self.complete(build_batch_prompt(emails), 10 * len(emails))
+        return parse_batch_answer(content, len(emails))
+
+    async def classify(self, subject, sender, body):
+        """(priorité, libellé), ou None si l'IA est indisponible (disjoncteur, erreur, échéance)"""
+        return await self.call(lambda: self.request(subject, sender, body))
+
+    async def classify_group(self, emails):
+        """Un seul appel pour plusieurs emails; ceux sans réponse valable sont redemandés un par un"""
+        if len(emails) == 1:
+            return [await self.classify(*emails[0])]
+
+        self.count('batches')
+        answers = await self.call(lambda: self.request_batch(emails))
+        if answers is None:
+            # Serveur en erreur ou hors délai: redemander chaque email aggraverait la situation
+            return [None] * len(emails)
+
+        results = [answers.get(number) for number in range(1, len(emails) + 1)]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            self.count('requeued', len(missing))
+            retried = await asyncio.gather(*(self.classify(*emails[i]) for i in missing))
+            for i, result in zip(missing, retried):
+                results[i] = result
+        return results
+
+    async def call(self, make_request):
+        """Résultat de make_request(), ou None si l'IA est indisponible (disjoncteur, erreur, échéance)"""
+        async with self.in_flight:
+            await self.bucket.acquire()
+            # Vérifié au dernier moment: le disjoncteur a pu s'ouvrir pendant l'attente
+            ticket = self.breaker.allow()
+            if ticket is None:
+                self.count('short_circuited')
+                return None
+            self.count('calls')
+            try:
+                result = await asyncio.wait_for(make_request(), self.deadline)
+            except asyncio.TimeoutError:
+                self.count('timeouts')
+                self.breaker.record(ticket, False)
+                return None
+            except (OSError, ValueError, EOFError, LLMError) as e:
+                # EOFError: réponse tronquée (asyncio.IncompleteReadError)
+                self.count('failed')
+                self.breaker.record(ticket, False)
+                print(f"Erreur classification IA: {e}")
+                return None
+
+        self.count('succeeded')
+        self.breaker.record(ticket, True)
+        return result
+
+    async def classify_many_async(self, emails):
+        if self.batch_size == 1:
+            return await asyncio.gather(*(self.classify(subject, sender, body) for subject, sender, body in emails))
+        groups = await asyncio.gather(*(
+            self.classify_group(emails[start:start + self.batch_size])
+            for start in range(0, len(emails), self.batch_size)
+        ))
+        return [result for group in groups for result in group]
+
+    def classify_many(self, emails):
+        """Classer des (sujet, expéditeur, corps) en parallèle, par lots de batch_size; None pour chaque échec"""
+        if not emails:
+            return []
+        return asyncio.run(self.classify_many_async(emails))
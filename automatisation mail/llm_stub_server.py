@@ -0,0 +1,182 @@
+"""
+Serveur local imitant l'API chat completions d'OpenAI, pour les tests
+Latence, erreurs HTTP, réponses hors délai, tronquées et mal formées sont
+injectées selon des taux configurables; le serveur compte les requêtes et
+le nombre maximal de requêtes simultanées. Les prompts à plusieurs emails
+numérotés reçoivent une ligne par email; en mode lot, le taux de réponses
+mal formées s'applique à chaque ligne
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Réponse du faux modèle selon les mots présents dans le prompt
+ANSWER_RULES = [
+    (("panne", "fuite", "urgent", "réclamation"), "4,URGENT"),
+    (("réservation", "demande", "rendez-vous"), "3,HAUTE"),
+    (("newsletter", "promotion", "offre"), "1,BASSE"),
+]
+
+EMAIL_RE = re.compile(r"Sujet: (.*)\n\s*Contenu: (.*)")
+BATCH_ITEM_RE = re.compile(r"\[(\d+)\] Expéditeur: .*\n\s*Sujet: (.*)\n\s*Contenu: (.*)")
+
+def answer_for_text(text):
+    text = text.lower()
+    for words, answer in ANSWER_RULES:
+        if any(word in text for word in words):
+            return answer
+    return "2,MOYENNE"
+
+def answer_for(prompt):
+    """Réponse au format attendu, d'après le sujet et le contenu de l'email du prompt"""
+    match = EMAIL_RE.search(prompt)
+    return answer_for_text(" ".join(match.groups()) if match else "")
+
+def batch_items(prompt):
+    """[(numéro, sujet + contenu)] d'un prompt à plusieurs emails, vide sinon"""
+    return [(int(number), f"{subject} {body}") for number, subject, body in BATCH_ITEM_RE.findall(prompt)]
+
+class LLMStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, truncated=False):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        # Tronquée: connexion fermée avant la fin du corps annoncé
+        self.wfile.write(body[:len(body) // 2] if truncated else body)
+        if truncated:
+            self.close_connection = True
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        server.enter()
+        try:
+            rng = server.rng
+            with server.lock:
+                roll = rng.random()
+                latency = rng.uniform(*server.latency)
+            time.sleep(latency)
+
+            if roll < server.error_rate:
+                self.send_json(500, {"error": {"message": "erreur injectée"}})
+                return
+            roll -= server.error_rate
+            if roll < server.timeout_rate:
+                # Réponse bien trop tardive: le client doit abandonner à son échéance
+                time.sleep(server.hang_seconds)
+            roll -= server.timeout_rate
+            truncated = roll < server.truncate_rate
+            roll -= server.truncate_rate
+            content = request["messages"][0]["content"]
+            server.count_prompt(content)
+            items = batch_items(content)
+            if items:
+                answer = server.answer_batch(items)
+            else:
+                answer = "je ne sais pas" if roll < server.malformed_rate else server.answer(content)
+            self.send_json(200, {
+                "model": request.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": len(content.split()), "completion_tokens": len(answer.split())}
+            }, truncated)
+        finally:
+            server.leave()
+
+class LLMStubServer(ThreadingHTTPServer):
+    """Faux serveur OpenAI: start() puis base_url à passer au client"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=(0.01, 0.05), error_rate=0.0, timeout_rate=0.0,
+                 malformed_rate=0.0, truncate_rate=0.0, hang_seconds=30.0, seed=42):
+        super().__init__((host, port), LLMStubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.malformed_rate = malformed_rate
+        self.truncate_rate = truncate_rate
+        self.hang_seconds = hang_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompt_words = 0
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def answer(self, prompt):
+        return answer_for(prompt)
+
+    def answer_batch(self, items):
+        lines = []
+        for number, text in items:
+            with self.lock:
+                malformed = self.rng.random() < self.malformed_rate
+            lines.append(f"{number}: {'je ne sais pas' if malformed else answer_for_text(text)}")
+        return "\n".join(lines)
+
+    def count_prompt(self, prompt):
+        with self.lock:
+            self.prompt_words += len(prompt.split())
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.prompt_words = 0
+            self.max_in_flight = self.in_flight
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faux serveur OpenAI local (tests)")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, nargs=2, default=(0.2, 0.8), metavar=('MIN', 'MAX'))
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--truncate-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = LLMStubServer(port=args.port, latency=tuple(args.latency), error_rate=args.error_rate,
+                           timeout_rate=args.timeout_rate, malformed_rate=args.malformed_rate,
+                           truncate_rate=args.truncate_rate)
+    print(f"Faux serveur OpenAI: OPENAI_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
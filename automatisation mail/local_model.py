@@ -0,0 +1,199 @@
+"""
+Modèle local de priorité: naive Bayes multinomial sur des caractéristiques hachées
+Entraîné hors ligne sur les priorités et les corrections enregistrées dans
+emails_trie.db, sauvegardé en JSON et chargé en quelques millisecondes.
+Il remplace l'appel OpenAI quand aucun mot-clé ne correspond; l'IA n'est
+consultée que si la confiance du modèle est sous le seuil configuré
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import zlib
+from datetime import datetime
+
+from text_normalizer import tokenize
+
+MODEL_PRIORITIES = (4, 3, 2, 1)
+DEFAULT_MODEL_PATH = "priority_model.json"
+
+# Une correction de l'utilisateur compte plus qu'une classification automatique
+FEEDBACK_WEIGHT = 5
+
+def email_features(subject, sender, body, n_features):
+    """Indices des caractéristiques hachées: mots du sujet, mots du corps, domaine de l'expéditeur
+
+    crc32 plutôt que hash(): les indices doivent être identiques d'un processus à l'autre.
+    """
+    features = [f"s:{word}" for word in tokenize(subject)]
+    features.extend(f"b:{word}" for word in tokenize(body))
+    sender = (sender or "").lower()
+    if "@" in sender:
+        features.append(f"d:{sender.rsplit('@', 1)[1].strip('> ')}")
+    mask = n_features - 1
+    return [zlib.crc32(feature.encode('utf-8')) & mask for feature in features]
+
+class LocalPriorityModel:
+    """Naive Bayes multinomial: log-probabilités pré-calculées par caractéristique et par priorité"""
+
+    def __init__(self, n_features=2 ** 18, alpha=1.0):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.priors = [0.0] * len(MODEL_PRIORITIES)
+        # Log-probabilité d'une caractéristique jamais vue, par priorité
+        self.unseen = [0.0] * len(MODEL_PRIORITIES)
+        # Écart à `unseen` des caractéristiques vues à l'entraînement
+        self.weights = {}
+        self.examples = 0
+        self.trained_at = None
+
+    def train(self, examples):
+        """examples: (sujet, expéditeur, corps, priorité, poids)"""
+        index = {priority: i for i, priority in enumerate(MODEL_PRIORITIES)}
+        class_weight = [0.0] * len(MODEL_PRIORITIES)
+        totals = [0.0] * len(MODEL_PRIORITIES)
+        counts = {}
+        self.examples = 0
+
+        for subject, sender, body, priority, weight in examples:
+            if priority not in index:
+                continue
+            c = index[priority]
+            class_weight[c] += weight
+            for feature in email_features(subject, sender, body, self.n_features):
+                row = counts.setdefault(feature, [0.0] * len(MODEL_PRIORITIES))
+                row[c] += weight
+                totals[c] += weight
+            self.examples += 1
+
+        vocabulary = len(counts) + 1
+        total_weight = sum(class_weight)
+        n_classes = len(MODEL_PRIORITIES)
+        self.priors = [math.log((w + 1) / (total_weight + n_classes)) for w in class_weight]
+        denominators = [math.log(total + self.alpha * vocabulary) for total in totals]
+        self.unseen = [math.log(self.alpha) - d for d in denominators]
+        self.weights = {
+            feature: [math.log(count + self.alpha) - math.log(self.alpha) for count in row]
+            for feature, row in counts.items()
+        }
+        self.trained_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return self
+
+    def predict(self, subject, sender, body):
+        """(priorité, confiance): priorité la plus probable et sa probabilité a posteriori"""
+        features = email_features(subject, sender, body, self.n_features)
+        scores = [prior + len(features) * unseen for prior, unseen in zip(self.priors, self.unseen)]
+        weights = self.weights
+        for feature in features:
+            row = weights.get(feature)
+            if row is not None:
+                scores = [score + w for score, w in zip(scores, row)]
+
+        top = max(scores)
+        exp_scores = [math.exp(score - top) for score in scores]
+        best = scores.index(top)
+        return MODEL_PRIORITIES[best], exp_scores[best] / sum(exp_scores)
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        data = {
+            'n_features': self.n_features,
+            'alpha': self.alpha,
+            'priorities': MODEL_PRIORITIES,
+            'priors': self.priors,
+            'unseen': self.unseen,
+            'weights': {str(feature): [round(w, 5) for w in row] for feature, row in self.weights.items()},
+            'examples': self.examples,
+            'trained_at': self.trained_at
+        }
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        """Charger un modèle sauvegardé, ou None s'il n'existe pas (ou est illisible)"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Modèle local illisible ({path}): {e}")
+            return None
+
+        model = cls(data['n_features'], data['alpha'])
+        model.priors = data['priors']
+        model.unseen = data['unseen']
+        model.weights = {int(feature): row for feature, row in data['weights'].items()}
+        model.examples = data['examples']
+        model.trained_at = data['trained_at']
+        return model
+
+def load_training_examples(conn):
+    """Exemples d'entraînement de la base: emails classés, corrections de l'utilisateur en priorité
+
+    Les libellés ajustés (VIP-, HH-) ou bloqués ne décrivent pas le contenu de
+    l'email et sont écartés; une correction remplace la classification d'origine.
+    Les priorités déduites (MOYENNE par défaut, historique, corrections apprises,
+    modèle local lui-même) sont écartées aussi: le modèle apprendrait ses propres
+    réponses et ne laisserait plus rien à l'IA.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT e.subject, e.sender, e.content, f.correct_priority
+        FROM email_feedback f JOIN emails e ON e.id = f.email_id
+    ''')
+    examples = [(subject, sender, body, priority, FEEDBACK_WEIGHT)
+                for subject, sender, body, priority in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT subject, sender, content, priority FROM emails
+        WHERE priority_label IN ('URGENT', 'HAUTE', 'MOYENNE', 'BASSE')
+          AND priority_inferred IS NOT 1
+          AND id NOT IN (SELECT email_id FROM email_feedback)
+    ''')
+    examples.extend((subject, sender, body, priority, 1) for subject, sender, body, priority in cursor.fetchall())
+    return examples
+
+def evaluate(examples, n_features=2 ** 18, holdout=0.2, seed=42):
+    """Précision sur une part des exemples tenue à l'écart de l'entraînement"""
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    split = int(len(examples) * (1 - holdout))
+    model = LocalPriorityModel(n_features).train(examples[:split])
+    test = examples[split:]
+    if not test:
+        return None
+    correct = sum(model.predict(subject, sender, body)[0] == priority
+                  for subject, sender, body, priority, _ in test)
+    return correct / len(test)
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraîner le modèle local de priorité sur emails_trie.db")
+    parser.add_argument('--output', default=os.getenv('LOCAL_MODEL_PATH', DEFAULT_MODEL_PATH))
+    parser.add_argument('--features', type=int, default=2 ** 18, help="Nombre de caractéristiques (puissance de 2)")
+    args = parser.parse_args()
+
+    from email_classifier import EmailClassifier
+    classifier = EmailClassifier()
+    examples = load_training_examples(classifier.conn)
+    classifier.close()
+
+    if not examples:
+        print("Aucun email classé dans la base: rien à apprendre")
+        return
+
+    accuracy = evaluate(examples, args.features)
+    model = LocalPriorityModel(args.features).train(examples)
+    model.save(args.output)
+
+    print(f"Modèle entraîné sur {model.examples} emails ({len(model.weights)} caractéristiques)")
+    if accuracy is not None:
+        print(f"Précision sur 20% d'emails de validation: {accuracy:.1%}")
+    print(f"Sauvegardé: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Pipeline d'ingestion par étapes: récupération -> analyse -> classification -> sauvegarde
+Chaque étape a ses propres workers et communique avec la suivante par une
+file bornée; les attentes réseau, l'analyse MIME, la classification et les
+écritures SQLite se recouvrent au lieu de s'enchaîner
+"""
+
+import imaplib
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from email_classifier import EmailClassifier, compute_message_key
+from imap_utils import chunk_uids
+from reputation import InferredPriority
+
+STOP = object()
+
+class PipelineStage:
+    """Une étape: workers, file d'entrée bornée et mesures"""
+
+    def __init__(self, name, func, workers=1, queue_size=256, fan_out=False, on_error=None):
+        self.name = name
+        self.func = func
+        # Appelée avec (élément, exception) pour chaque élément abandonné sur erreur
+        self.on_error = on_error
+        self.workers = workers
+        self.fan_out = fan_out
+        self.input = queue.Queue(queue_size)
+        self.lock = threading.Lock()
+        self.running = workers
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+
+    def worker(self, next_stage):
+        while True:
+            item = self.input.get()
+            if item is STOP:
+                with self.lock:
+                    self.running -= 1
+                    last = self.running == 0
+                # Le dernier worker arrêté propage l'arrêt à l'étape suivante
+                if last and next_stage is not None:
+                    for _ in range(next_stage.workers):
+                        next_stage.input.put(STOP)
+                return
+
+            start = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                print(f"Erreur étape {self.name}: {e}")
+                if self.on_error is not None:
+                    self.on_error(item, e)
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.busy_seconds += elapsed
+
+            with self.lock:
+                self.processed += 1
+
+            if next_stage is None or result is None:
+                continue
+            for output in (result if self.fan_out else (result,)):
+                next_stage.put(output)
+
+    def put(self, item):
+        self.input.put(item)
+        depth = self.input.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def stats(self, elapsed):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'processed': self.processed,
+                'errors': self.errors,
+                'queue_depth': self.input.qsize(),
+                'max_queue_depth': self.max_depth,
+                'ms_per_item': round(self.busy_seconds * 1000 / self.processed, 3) if self.processed else 0,
+                # Part du temps où les workers de l'étape étaient occupés
+                'utilization': round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else 0
+            }
+
+class Pipeline:
+    """Enchaînement d'étapes reliées par des files bornées"""
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.threads = []
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for i, stage in enumerate(self.stages):
+            next_stage = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            for n in range(stage.workers):
+                thread = threading.Thread(target=stage.worker, args=(next_stage,), name=f"{stage.name}-{n}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def run(self, items):
+        """Injecter les éléments dans la première étape et attendre la fin"""
+        self.start()
+        first = self.stages[0]
+        for item in items:
+            first.put(item)
+        for _ in range(first.workers):
+            first.input.put(STOP)
+        for thread in self.threads:
+            thread.join()
+        self.finished_at = time.perf_counter()
+        return self.stats()
+
+    def stats(self):
+        """Mesures par étape; l'étape la plus utilisée est le goulot d'étranglement"""
+        elapsed = (self.finished_at or time.perf_counter()) - (self.started_at or time.perf_counter())
+        stages = {stage.name: stage.stats(elapsed) for stage in self.stages}
+        bottleneck = max(stages, key=lambda name: stages[name]['utilization']) if stages else None
+        return {'elapsed': round(elapsed, 3), 'stages': stages, 'bottleneck': bottleneck}
+
+    def report(self):
+        stats = self.stats()
+        print(f"Pipeline terminé en {stats['elapsed']}s (goulot: {stats['bottleneck']})")
+        for name, stage in stats['stages'].items():
+            print(f"  {name:<10} x{stage['workers']}: {stage['processed']} éléments, "
+                  f"{stage['ms_per_item']} ms/élément, utilisation {stage['utilization']:.0%}, "
+                  f"file max {stage['max_queue_depth']}, erreurs {stage['errors']}")
+
+process_classifier = None
+
+def init_classify_process(classifier_factory):
+    """Initialisation d'un processus de classification (un classificateur par processus)"""
+    global process_classifier
+    process_classifier = classifier_factory()
+
+def classify_in_process(subject, sender, body):
+    return process_classifier.classify_email_priority(subject, sender, body)
+
+class EmailPipeline:
+    """Pipelines prêts à l'emploi pour des messages bruts ou un dossier IMAP"""
+
+    def __init__(self, classifier=None, classifier_factory=EmailClassifier, parse_workers=2,
+                 classify_workers=2, classify_processes=0, queue_size=256):
+        self.classifier = classifier or classifier_factory()
+        self.classifier_factory = classifier_factory
+        self.parse_workers = parse_workers
+        self.classify_workers = classify_workers
+        self.queue_size = queue_size
+        # Un modèle local gourmand en CPU se parallélise mieux dans des processus (GIL)
+        self.process_pool = None
+        if classify_processes:
+            self.process_pool = ProcessPoolExecutor(
+                classify_processes, initializer=init_classify_process, initargs=(classifier_factory,)
+            )
+            self.classify_workers = max(classify_workers, classify_processes)
+
+    def classify(self, email_data):
+        args = (email_data['subject'] or "", email_data['sender'] or "", email_data['body'])
+        if self.process_pool is not None:
+            result = self.process_pool.submit(classify_in_process, *args).result()
+        else:
+            result = self.classifier.classify_email_priority(*args)
+        email_data['priority'], email_data['priority_label'] = result
+        email_data['priority_inferred'] = isinstance(result, InferredPriority)
+        return email_data
+
+    def persist(self, email_data):
+        message_key = None if email_data.get('message_id') else compute_message_key(email_data)
+        self.classifier.store.add_email(email_data, email_data['priority'], email_data['priority_label'], message_key)
+
+    def classify_and_persist_stages(self, on_error=None):
+        return [
+            PipelineStage('classify', self.classify, self.classify_workers, self.queue_size, on_error=on_error),
+            PipelineStage('persist', self.persist, 1, self.queue_size, on_error=on_error)
+        ]
+
+    def run_messages(self, raw_messages):
+        """Traiter des messages RFC822 bruts (archives, tests de charge)"""
+        pipeline = Pipeline([
+            PipelineStage('parse', self.classifier.parse_message, self.parse_workers, self.queue_size)
+        ] + self.classify_and_persist_stages())
+        pipeline.run(raw_messages)
+        self.classifier.store.flush()
+        return pipeline
+
+    def run_imap(self, pool, account, mailbox='inbox', fetch_workers=2, batch_size=50, count=None):
+        """Synchroniser un dossier IMAP: plusieurs connexions récupèrent des lots d'UID en parallèle
+
+        Comme get_new_emails, le premier passage (ou un UIDVALIDITY changé) se
+        limite aux `count` derniers messages (initial_count du compte, 50 par
+        défaut). Les UID qui n'ont pas été récupérés, classés ou mis en file
+        d'écriture sont notés dans imap_failed_uids et redemandés aux passages
+        suivants (MAX_UID_ATTEMPTS essais); le point de reprise avance au-delà,
+        si bien qu'un email en échec ne fait pas retélécharger tout ce qui suit.
+        Une connexion en erreur pendant une récupération est fermée, pas rendue au pool.
+        """
+        count = count or account.get('initial_count', 50)
+        mail = pool.acquire(account)
+        broken = False
+        try:
+            self.classifier.mail = mail
+            self.classifier.account = account['email']
+            uidvalidity = self.classifier.select_mailbox(mailbox)
+            state = self.classifier.load_sync_state(account['email'], mailbox)
+            if state and state[0] == uidvalidity:
+                last_uid = state[1]
+                status, data = mail.uid('SEARCH', None, f'UID {last_uid + 1}:*')
+                uids = [int(uid) for uid in data[0].split() if int(uid) > last_uid]
+            else:
+                last_uid = 0
+                status, data = mail.uid('SEARCH', None, 'ALL')
+                uids = [int(uid) for uid in data[0].split()][-count:]
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"Recherche refusée dans {mailbox}: {data!r}")
+        except (imaplib.IMAP4.error, OSError):
+            broken = True
+            raise
+        finally:
+            pool.release(account, mail, broken)
+
+        retried = set(self.classifier.load_failed_uids(account['email'], mailbox, uidvalidity))
+        new_uids = uids
+        uids = sorted(retried.union(new_uids))
+
+        local = threading.local()
+        connections = []
+        connections_lock = threading.Lock()
+        failed_uids = {}
+
+        def worker_connection():
+            # Chaque worker garde sa connexion (et son dossier sélectionné) pour tous ses lots
+            mail = getattr(local, 'mail', None)
+            if mail is None:
+                mail = pool.acquire(account)
+                try:
+                    mail.select(mailbox, readonly=True)
+                except (imaplib.IMAP4.error, OSError):
+                    pool.release(account, mail, broken=True)
+                    raise
+                with connections_lock:
+                    connections.append(mail)
+                local.mail = mail
+            return mail
+
+        def fetch(batch):
+            mail = worker_connection()
+            try:
+                return self.classifier.fetch_messages(batch, mailbox, uidvalidity, mail=mail)
+            except (imaplib.IMAP4.error, OSError):
+                # Socket peut-être morte: fermée, le lot suivant de ce worker en ouvre une autre
+                with connections_lock:
+                    connections.remove(mail)
+                local.mail = None
+                pool.release(account, mail, broken=True)
+                raise
+
+        def record_failure(item, error):
+            # Lot d'UID (récupération) ou email (classification, sauvegarde)
+            with connections_lock:
+                failed_uids.update((uid, error) for uid in (item if isinstance(item, list) else [item['uid']]))
+
+        pipeline = Pipeline([
+            PipelineStage('fetch', fetch, fetch_workers, self.queue_size, fan_out=True, on_error=record_failure)
+        ] + self.classify_and_persist_stages(record_failure))
+        pipeline.run(chunk_uids(uids, batch_size))
+
+        for connection in connections:
+            pool.release(account, connection)
+
+        store = self.classifier.store
+        for uid in uids:
+            if uid in failed_uids:
+                store.add_failed_uid(account['email'], mailbox, uidvalidity, uid, failed_uids[uid])
+            elif uid in retried:
+                store.clear_failed_uid(account['email'], mailbox, uid)
+        if failed_uids:
+            print(f"{len(failed_uids)} emails de {mailbox} en échec, redemandés au prochain passage")
+        checkpoint = max(new_uids, default=0)
+        if checkpoint > last_uid:
+            store.add_sync_state(account['email'], mailbox, uidvalidity, checkpoint)
+        store.flush()
+        return pipeline
+
+    def close(self):
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
@@ -0,0 +1,181 @@
+"""
+Reclassement incrémental des emails après un changement de règles
+Chaque email garde la version du plan de règles qui l'a classé, et chaque
+version garde sa configuration (table rule_plans). Le reclassement compare
+l'ancienne et la nouvelle configuration, retrouve les emails concernés par
+les mots-clés, sujets et expéditeurs modifiés grâce à l'index inversé
+email_terms, et ne recalcule que ceux-là, par transactions groupées.
+Les emails corrigés par l'utilisateur ne sont jamais reclassés
+"""
+
+import argparse
+import json
+from email.utils import parsedate_to_datetime
+
+from keyword_matcher import PRIORITY_LEVELS
+from reputation import InferredPriority, SenderMatcher
+from text_normalizer import tokenize
+
+def rule_entries(config):
+    """{(type, motif normalisé): priorité} des règles d'une configuration"""
+    entries = {}
+    priority_rules = config.get("priority_rules", {})
+    for priority_num, _, config_key in PRIORITY_LEVELS:
+        rules = priority_rules.get(config_key, {})
+        for kind in ("keywords", "subjects"):
+            for pattern in rules.get(kind, []):
+                key = (kind, ' '.join(tokenize(pattern)))
+                entries[key] = max(entries.get(key, 0), priority_num)
+        for pattern in rules.get("senders", []):
+            key = ("senders", pattern.lower())
+            entries[key] = max(entries.get(key, 0), priority_num)
+    special_rules = config.get("special_rules", {})
+    for kind, config_key in (("vip", "vip_clients"), ("blocked", "blocked_senders")):
+        for pattern in special_rules.get(config_key, []):
+            entries[(kind, pattern.strip().lower())] = 1
+    return entries
+
+def diff_plans(old_config, new_config):
+    """(règles ajoutées, retirées ou changées de priorité, tout reclasser?)
+
+    Un changement d'horaires touche tous les emails classés par défaut: tout est reclassé.
+    """
+    old, new = rule_entries(old_config), rule_entries(new_config)
+    changed = {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+    full = old_config.get("business_hours") != new_config.get("business_hours")
+    return changed, full
+
+def affected_email_ids(conn, changed):
+    """Emails contenant un mot-clé modifié ou envoyés par un expéditeur concerné (index email_terms)"""
+    ids = set()
+    sender_rules = []
+    for kind, pattern in changed:
+        if kind in ("keywords", "subjects"):
+            words = pattern.split()
+            if not words:
+                continue
+            # Une expression: emails contenant tous ses mots (sur-ensemble, le reclassement tranche)
+            query = " INTERSECT ".join(["SELECT email_id FROM email_terms WHERE term = ?"] * len(set(words)))
+            ids.update(row[0] for row in conn.execute(query, sorted(set(words))))
+        else:
+            sender_rules.append((kind, pattern))
+
+    if sender_rules:
+        substrings = [pattern for kind, pattern in sender_rules if kind == "senders"]
+        matcher = SenderMatcher((pattern, 1) for kind, pattern in sender_rules if kind != "senders")
+        # Un expéditeur par entrée "from:" de l'index, quel que soit son nombre d'emails
+        terms = [term for (term,) in conn.execute(
+            "SELECT DISTINCT term FROM email_terms WHERE term >= 'from:' AND term < 'from;'"
+        ) if any(pattern in term[5:] for pattern in substrings) or matcher.search(term[5:])]
+        for start in range(0, len(terms), 500):
+            chunk = terms[start:start + 500]
+            ids.update(row[0] for row in conn.execute(
+                f'SELECT email_id FROM email_terms WHERE term IN ({",".join("?" * len(chunk))})', chunk
+            ))
+    return ids
+
+def parse_received(value):
+    try:
+        return parsedate_to_datetime(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+CANDIDATES_SQL = '''
+    SELECT id, subject, sender, content, date_received, priority, priority_label FROM emails
+    WHERE rule_version IS ? AND id NOT IN (SELECT email_id FROM email_feedback) AND {}
+    ORDER BY id LIMIT ?
+'''
+
+def candidate_batches(conn, version, ids, batch_size):
+    """Lots de lignes à recalculer: les emails `ids` de cette version, ou tous si ids est None"""
+    if ids is None:
+        last_id = 0
+        while True:
+            rows = conn.execute(CANDIDATES_SQL.format('id > ?'), (version, last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+    else:
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            rows = conn.execute(CANDIDATES_SQL.format(f'id IN ({",".join("?" * len(chunk))})'),
+                                (version, *chunk, batch_size)).fetchall()
+            if rows:
+                yield rows
+
+def rescore(classifier, rows, version):
+    """Nouvelles (priorité, libellé, déduite, version, id) des lignes (id, sujet, expéditeur, corps, date)"""
+    updates = []
+    for row_id, subject, sender, content, date_received in rows:
+        result = classifier.classify_email_priority(
+            subject or "", sender or "", content or "", received=parse_received(date_received)
+        )
+        updates.append((*result, isinstance(result, InferredPriority), version, row_id))
+    return updates
+
+def reclassify(classifier, batch_size=500, include_unversioned=False):
+    """Reclasser les emails classés par d'autres règles que celles de `classifier`
+
+    Seuls les emails touchés par la différence entre leurs règles et les
+    règles courantes sont recalculés; les autres passent simplement à la
+    nouvelle version. Sans configuration conservée (ou include_unversioned
+    pour les emails antérieurs au suivi des versions), tout est recalculé.
+    """
+    conn = classifier.conn
+    new_version, new_config = classifier.rule_snapshot()
+    classifier.rule_version()
+    classifier.store.flush()
+    stats = {'versions': 0, 'rescored': 0, 'changed': 0}
+
+    versions = [version for (version,) in conn.execute(
+        'SELECT DISTINCT rule_version FROM emails WHERE rule_version IS NOT ?', (new_version,)
+    ) if version is not None or include_unversioned]
+
+    for old_version in versions:
+        stats['versions'] += 1
+        snapshot = conn.execute('SELECT config FROM rule_plans WHERE version = ?', (old_version,)).fetchone()
+        ids = None
+        if snapshot is not None:
+            changed, full = diff_plans(json.loads(snapshot[0]), new_config)
+            if not full:
+                ids = sorted(affected_email_ids(conn, changed))
+
+        for rows in candidate_batches(conn, old_version, ids, batch_size):
+            updates = rescore(classifier, [row[:5] for row in rows], new_version)
+            stats['rescored'] += len(updates)
+            stats['changed'] += sum(update[:2] != row[5:] for update, row in zip(updates, rows))
+            # Une transaction par lot: l'interface et le classificateur continuent d'écrire entre deux lots
+            with conn:
+                conn.executemany('''
+                    UPDATE emails SET priority = ?, priority_label = ?, priority_inferred = ?, rule_version = ?
+                    WHERE id = ?
+                ''', updates)
+
+        # Emails non concernés par la différence (et emails corrigés): rien à recalculer
+        with conn:
+            conn.execute('UPDATE emails SET rule_version = ? WHERE rule_version IS ?', (new_version, old_version))
+    return stats
+
+def reclassify_stored_emails(config_file="business_config.json", include_unversioned=False):
+    """Reclasser emails_trie.db avec les règles de config_file"""
+    from adaptive_classifier import AdaptiveEmailClassifier
+    classifier = AdaptiveEmailClassifier(config_file)
+    try:
+        return reclassify(classifier, include_unversioned=include_unversioned)
+    finally:
+        classifier.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Reclasser les emails touchés par un changement de règles")
+    parser.add_argument('--config', default="business_config.json")
+    parser.add_argument('--all', action='store_true',
+                        help="Inclure les emails classés avant le suivi des versions de règles")
+    args = parser.parse_args()
+
+    stats = reclassify_stored_emails(args.config, args.all)
+    print(f"{stats['versions']} ancienne(s) version(s) de règles, {stats['rescored']} emails recalculés, "
+          f"{stats['changed']} changés de priorité")
+
+if __name__ == "__main__":
+    main()
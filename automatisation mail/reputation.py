@@ -0,0 +1,276 @@
+"""
+Réputation des expéditeurs et listes VIP / bloqués indexées par domaine
+Les listes de la configuration sont rangées dans des arbres de labels de
+domaine (à l'envers pour "@client.fr", qui couvre aussi ses sous-domaines,
+à l'endroit pour "@syndic." quelle que soit l'extension): une recherche ne
+coûte que quelques accès dictionnaire, quelle que soit la longueur des listes.
+La table sender_reputation compte les priorités reçues par adresse et par
+domaine; elle est tenue à jour par des triggers SQLite à chaque insertion
+ou correction d'email. Un expéditeur à l'historique constant est classé
+sans mots-clés, modèle ni IA.
+Seules les priorités fixées par une règle, l'IA ou l'utilisateur sont
+comptées: une priorité déduite (défaut, historique, modèle local) ne doit pas
+nourrir l'historique qui l'a produite. Les domaines de messagerie grand
+public (gmail.com...) n'ont pas d'historique commun
+"""
+
+import threading
+
+from email_store import connect
+from keyword_matcher import KeywordMatcher, PRIORITY_LABELS
+
+def sender_address(sender):
+    """Adresse en minuscules de "Nom <adresse>" (identique à SENDER_ADDRESS_SQL)"""
+    sender = sender or ""
+    return sender[sender.find('<') + 1:].rstrip('> ').strip().lower()
+
+def sender_domain(address):
+    return address.rsplit('@', 1)[1] if '@' in address else ""
+
+# Domaines partagés par des expéditeurs sans rapport entre eux
+FREE_MAIL_DOMAINS = frozenset({
+    'gmail.com', 'googlemail.com', 'outlook.com', 'outlook.fr', 'hotmail.com', 'hotmail.fr', 'live.com',
+    'live.fr', 'msn.com', 'yahoo.com', 'yahoo.fr', 'icloud.com', 'me.com', 'aol.com', 'orange.fr',
+    'wanadoo.fr', 'free.fr', 'sfr.fr', 'neuf.fr', 'laposte.net', 'bbox.fr', 'gmx.fr', 'gmx.com',
+    'protonmail.com', 'proton.me',
+})
+
+class InferredPriority(tuple):
+    """(priorité, libellé) déduit faute de règle, de réponse de l'IA ou de correction
+
+    Priorité par défaut, historique de l'expéditeur, corrections d'emails
+    semblables, modèle local: l'email est enregistré avec cette priorité
+    (colonne priority_inferred), mais elle n'entre pas dans sender_reputation.
+    """
+    __slots__ = ()
+
+def inferred(priority_num, priority_label):
+    return InferredPriority((priority_num, priority_label))
+
+class SenderMatcher:
+    """Motifs d'expéditeurs: adresses exactes, domaines (suffixe ou préfixe de labels), mots-clés
+
+    - "jean@client.fr": cette adresse seulement
+    - "@client.fr" ou "client.fr": ce domaine et ses sous-domaines
+    - "@syndic.": tout domaine commençant par le label "syndic"
+    - autre ("private banking", "pompiers"): recherche dans l'adresse brute
+    """
+
+    def __init__(self, patterns):
+        """patterns: couples (motif, valeur); search() rend la valeur maximale reconnue"""
+        self.addresses = {}
+        self.suffixes = {}
+        self.prefixes = {}
+        # Motif tel qu'écrit, par adresse ou domaine rangé, pour explain()
+        self.names = {}
+        keywords = []
+        for pattern, value in patterns:
+            if not self.add(pattern.strip().lower(), value, pattern):
+                keywords.append((pattern, value))
+        self.keywords = KeywordMatcher(keywords) if keywords else None
+
+    def add(self, pattern, value, name=None):
+        """Ranger un motif d'adresse ou de domaine; False si c'est un simple mot-clé"""
+        local, at, domain = pattern.rpartition('@')
+        if not at:
+            domain = pattern
+        if not domain or ' ' in domain or '.' not in domain.strip('.'):
+            return False
+        if local:
+            if domain.endswith('.'):
+                return False
+            self.addresses[pattern] = max(self.addresses.get(pattern, 0), value)
+            key = pattern
+        elif domain.endswith('.'):
+            self.insert(self.prefixes, domain.strip('.').split('.'), value)
+            key = ('prefix', domain.strip('.'))
+        else:
+            self.insert(self.suffixes, reversed(domain.lstrip('.').split('.')), value)
+            key = ('suffix', domain.lstrip('.'))
+        self.names.setdefault(key, name or pattern)
+        return True
+
+    @staticmethod
+    def insert(trie, labels, value):
+        node = trie
+        for label in labels:
+            node = node.setdefault(label, {})
+        node[None] = max(node.get(None, 0), value)
+
+    @staticmethod
+    def walk(trie, labels):
+        """Valeur maximale des motifs rencontrés en descendant l'arbre label par label"""
+        best = 0
+        node = trie
+        for label in labels:
+            node = node.get(label)
+            if node is None:
+                break
+            best = max(best, node.get(None, 0))
+        return best
+
+    @staticmethod
+    def depth(trie, labels):
+        """Nombre de labels du motif le plus court rencontré en descendant l'arbre (0 si aucun)"""
+        node = trie
+        for depth, label in enumerate(labels, 1):
+            node = node.get(label)
+            if node is None:
+                break
+            if node.get(None):
+                return depth
+        return 0
+
+    def search(self, sender):
+        """Valeur la plus haute parmi les motifs qui reconnaissent l'expéditeur (0 si aucun)"""
+        address = sender_address(sender)
+        best = self.addresses.get(address, 0)
+        domain = sender_domain(address)
+        if domain:
+            labels = domain.split('.')
+            if self.suffixes:
+                best = max(best, self.walk(self.suffixes, reversed(labels)))
+            if self.prefixes:
+                best = max(best, self.walk(self.prefixes, labels))
+        if self.keywords is not None:
+            best = max(best, self.keywords.search(sender.lower()))
+        return best
+
+    def explain(self, sender):
+        """Motif (tel qu'écrit dans la configuration) qui reconnaît l'expéditeur, ou None
+
+        Premier motif trouvé, pour les listes à valeur unique (VIP, bloqués).
+        """
+        address = sender_address(sender)
+        if self.addresses.get(address):
+            return self.names[address]
+        domain = sender_domain(address)
+        if domain:
+            labels = domain.split('.')
+            depth = self.depth(self.suffixes, reversed(labels)) if self.suffixes else 0
+            if depth:
+                return self.names[('suffix', '.'.join(labels[-depth:]))]
+            depth = self.depth(self.prefixes, labels) if self.prefixes else 0
+            if depth:
+                return self.names[('prefix', '.'.join(labels[:depth]))]
+        if self.keywords is not None:
+            return self.keywords.explain(sender.lower())[1]
+        return None
+
+# Adresse de la colonne emails.sender en SQL, comme sender_address()
+SENDER_ADDRESS_SQL = "lower(trim(rtrim(substr({0}, instr({0}, '<') + 1), '> ')))"
+
+FREE_MAIL_DOMAINS_SQL = ", ".join(f"'{domain}'" for domain in sorted(FREE_MAIL_DOMAINS))
+
+def reputation_update_sql(row, sign):
+    """Instructions de trigger: compter (sign=1) ou décompter (sign=-1) la priorité de row (NEW/OLD)"""
+    address = SENDER_ADDRESS_SQL.format(f"{row}.sender")
+    domain = f"substr({address}, instr({address}, '@'))"
+    counted = f"{row}.priority_inferred IS NOT 1"
+    counts = ", ".join(f"{sign} * ({row}.priority = {p})" for p in (1, 2, 3, 4))
+    update = "p1 = p1 + excluded.p1, p2 = p2 + excluded.p2, p3 = p3 + excluded.p3, p4 = p4 + excluded.p4"
+    return f"""
+        INSERT INTO sender_reputation (sender, p1, p2, p3, p4) SELECT {address}, {counts}
+        WHERE {counted} AND {address} != '' ON CONFLICT(sender) DO UPDATE SET {update};
+        INSERT INTO sender_reputation (sender, p1, p2, p3, p4) SELECT {domain}, {counts}
+        WHERE {counted} AND instr({address}, '@') > 0 AND substr({domain}, 2) NOT IN ({FREE_MAIL_DOMAINS_SQL})
+        ON CONFLICT(sender) DO UPDATE SET {update};"""
+
+def setup_reputation(cursor):
+    """Table sender_reputation ("adresse" ou "@domaine" -> nombre d'emails par priorité) et ses triggers"""
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(emails)')}
+    if 'priority_inferred' not in columns:
+        # 1: priorité déduite (InferredPriority), non comptée
+        cursor.execute('ALTER TABLE emails ADD COLUMN priority_inferred INTEGER DEFAULT 0')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sender_reputation (
+            sender TEXT PRIMARY KEY,
+            p1 INTEGER DEFAULT 0,
+            p2 INTEGER DEFAULT 0,
+            p3 INTEGER DEFAULT 0,
+            p4 INTEGER DEFAULT 0
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS reputation_insert AFTER INSERT ON emails
+        BEGIN {reputation_update_sql("NEW", 1)}
+        END
+    ''')
+    # Correction de priorité ou reclassement: l'ancienne priorité est retirée
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS reputation_update AFTER UPDATE OF priority, priority_inferred ON emails
+        WHEN OLD.priority IS NOT NEW.priority OR OLD.priority_inferred IS NOT NEW.priority_inferred
+        BEGIN {reputation_update_sql("OLD", -1)}
+        {reputation_update_sql("NEW", 1)}
+        END
+    ''')
+
+def rebuild_reputation(cursor):
+    """Recompter la réputation à partir de tous les emails déjà en base"""
+    address = SENDER_ADDRESS_SQL.format("sender")
+    domain = f"substr({address}, instr({address}, '@'))"
+    counts = "SUM(priority = 1), SUM(priority = 2), SUM(priority = 3), SUM(priority = 4)"
+    cursor.execute('DELETE FROM sender_reputation')
+    cursor.execute(f'''
+        INSERT INTO sender_reputation (sender, p1, p2, p3, p4)
+        SELECT {address}, {counts} FROM emails WHERE priority_inferred IS NOT 1 AND {address} != '' GROUP BY 1
+    ''')
+    cursor.execute(f'''
+        INSERT INTO sender_reputation (sender, p1, p2, p3, p4)
+        SELECT {domain}, {counts} FROM emails
+        WHERE priority_inferred IS NOT 1 AND instr({address}, '@') > 0
+        AND substr({domain}, 2) NOT IN ({FREE_MAIL_DOMAINS_SQL}) GROUP BY 1
+    ''')
+
+class SenderReputation:
+    """Historique des priorités d'un expéditeur, puis de son domaine"""
+
+    def __init__(self, db_path='emails_trie.db', threshold=0.8):
+        # Partagée (sous verrou) par les workers de classification du pipeline
+        self.conn = connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        # Confiance à partir de laquelle l'historique suffit à classer l'email
+        self.threshold = threshold
+
+    def lookup(self, sender):
+        """(priorité, confiance) la plus fréquente pour l'adresse ou son domaine; None sans historique
+
+        Confiance = part de la priorité dominante, avec un email fictif en
+        désaccord: 4 emails sur 4 donnent 0.8, 19 sur 19 donnent 0.95. Le
+        plus sûr des deux historiques l'emporte: un domaine qui n'envoie que
+        des newsletters renseigne sur une adresse encore inconnue (sauf
+        messagerie grand public).
+        """
+        address = sender_address(sender)
+        if not address:
+            return None
+        keys = [address]
+        domain = sender_domain(address)
+        if domain and domain not in FREE_MAIL_DOMAINS:
+            keys.append(f"@{domain}")
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT p1, p2, p3, p4 FROM sender_reputation WHERE sender IN ({",".join("?" * len(keys))})', keys
+            ).fetchall()
+
+        best = None
+        for counts in rows:
+            total = sum(counts)
+            if total <= 0:
+                continue
+            dominant = max(counts)
+            confidence = dominant / (total + 1)
+            if best is None or confidence > best[1]:
+                best = (counts.index(dominant) + 1, confidence)
+        return best
+
+    def decide(self, sender):
+        """(priorité, libellé) déduit si l'historique de l'expéditeur suffit à classer l'email, sinon None"""
+        result = self.lookup(sender)
+        if result is None or result[1] < self.threshold:
+            return None
+        return inferred(result[0], PRIORITY_LABELS[result[0]])
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,135 @@
+"""
+Plan de règles compilé à partir de business_config.json
+Le plan est immuable: automates de recherche, listes VIP et bloquées, horaires
+déjà convertis en objets time. Le fichier est surveillé par sa date de
+modification et un nouveau plan remplace l'ancien d'un seul coup, sans
+redémarrer le classificateur. Chaque plan a une version (empreinte des
+règles) enregistrée avec les emails qu'il a classés
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time as clock
+from datetime import time
+from typing import NamedTuple, Optional
+
+from keyword_matcher import CompiledRules
+from reputation import SenderMatcher
+
+DEFAULT_BUSINESS_CONFIG = {
+    "company_info": {"industry": "generic"},
+    "priority_rules": {
+        "urgent": {"keywords": ["urgent", "emergency"], "senders": [], "subjects": []},
+        "high": {"keywords": ["important", "client"], "senders": [], "subjects": []},
+        "medium": {"keywords": ["information", "question"], "senders": [], "subjects": []},
+        "low": {"keywords": ["newsletter", "promo"], "senders": [], "subjects": []}
+    },
+    "business_hours": {"start": "09:00", "end": "18:00"},
+    "special_rules": {"vip_clients": [], "blocked_senders": []}
+}
+
+class RulePlan(NamedTuple):
+    """Règles prêtes à l'emploi: rien n'est relu ni remis en minuscules par email"""
+    config: dict
+    rules: CompiledRules
+    vip: SenderMatcher
+    blocked: SenderMatcher
+    business_start: Optional[time]
+    business_end: Optional[time]
+    weekend_priority: str
+    mtime: Optional[int]
+    version: str
+
+# Parties de la configuration qui influent sur la classification
+RULE_SECTIONS = ("priority_rules", "special_rules", "business_hours")
+
+def plan_version(config):
+    """Empreinte des règles: identique tant que seuls le nom, la date ou le volume changent"""
+    rules = {section: config.get(section) for section in RULE_SECTIONS}
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def parse_hour(value):
+    try:
+        return time.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def compile_plan(config, mtime=None):
+    """Compiler une configuration business en plan de règles"""
+    special_rules = config.get("special_rules", {})
+    business_hours = config.get("business_hours", {})
+    return RulePlan(
+        config=config,
+        rules=CompiledRules(config["priority_rules"]),
+        # Motifs d'expéditeur: domaine (arbre de labels), email complet ou mot-clé
+        vip=SenderMatcher((pattern, 1) for pattern in special_rules.get("vip_clients", [])),
+        blocked=SenderMatcher((pattern, 1) for pattern in special_rules.get("blocked_senders", [])),
+        business_start=parse_hour(business_hours.get("start")),
+        business_end=parse_hour(business_hours.get("end")),
+        weekend_priority=business_hours.get("weekend_priority", "normal"),
+        mtime=mtime,
+        version=plan_version(config)
+    )
+
+def save_business_config(config, config_file="business_config.json"):
+    """Écrire la configuration de façon atomique: un classificateur ne lit jamais un fichier à moitié écrit"""
+    temp_file = f"{config_file}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, config_file)
+
+class RulePlanWatcher:
+    """Plan courant d'un fichier de configuration, recompilé quand le fichier change"""
+
+    def __init__(self, config_file="business_config.json", check_interval=1.0):
+        self.config_file = config_file
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.next_check = clock.monotonic() + check_interval
+        self.plan = self.load()
+        self.seen_mtime = self.plan.mtime
+
+    def file_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        """Lire et compiler le fichier (configuration par défaut s'il n'existe pas)"""
+        mtime = self.file_mtime()
+        if mtime is None:
+            print(f"Configuration non trouvée: {self.config_file}")
+            print("Utilisation de la configuration par défaut")
+            return compile_plan(DEFAULT_BUSINESS_CONFIG)
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            return compile_plan(json.load(f), mtime)
+
+    def current(self):
+        """Plan à utiliser pour le prochain email
+
+        La date de modification n'est consultée qu'une fois par check_interval;
+        le plan est remplacé en une seule affectation, les emails en cours
+        gardent celui qu'ils ont déjà obtenu.
+        """
+        plan = self.plan
+        if clock.monotonic() < self.next_check:
+            return plan
+        with self.lock:
+            self.next_check = clock.monotonic() + self.check_interval
+            mtime = self.file_mtime()
+            if mtime != self.seen_mtime:
+                self.seen_mtime = mtime
+                self.reload()
+            return self.plan
+
+    def reload(self):
+        """Recompiler le fichier; une configuration invalide laisse l'ancien plan en place"""
+        try:
+            self.plan = self.load()
+            print(f"Configuration rechargée: {self.config_file}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Configuration invalide, règles précédentes conservées: {e}")
+        return self.plan
@@ -0,0 +1,39 @@
+"""
+Test de l'import hors ligne
+Une transaction d'écriture par lot de --batch-size messages, et messages
+illisibles signalés et comptés sans arrêter l'import
+"""
+
+from bulk_import import BulkImporter
+from email_classifier import EmailClassifier
+from imap_stub_server import generate_mailbox
+
+class FailingClassifier(EmailClassifier):
+    """Centième message illisible"""
+
+    parsed = 0
+
+    def parse_message(self, raw):
+        self.parsed += 1
+        if self.parsed == 100:
+            raise ValueError("message corrompu")
+        return super().parse_message(raw)
+
+def test_import_batches(temp_dir, capsys):
+    """2000 messages par lots de 1000: 3 transactions au plus, un message illisible compté"""
+    with open("archive.mbox", 'wb') as f:
+        for raw in generate_mailbox(2000, attachment_ratio=0):
+            f.write(b"From import@example.com Mon Oct  6 10:00:00 2025\n" + raw + b"\n")
+
+    classifier = FailingClassifier()
+    importer = BulkImporter(classifier, batch_size=1000)
+    imported, errors, _ = importer.import_source("archive.mbox")
+    stats = classifier.store.stats()
+    stored = classifier.conn.execute('SELECT COUNT(*) FROM emails').fetchone()[0]
+    classifier.close()
+    output = capsys.readouterr().out
+
+    print(f"  {imported} importés, {errors} erreurs, {stats['transactions']} transactions")
+    assert errors == 1 and imported == 1999 == stored, (imported, errors, stored)
+    assert "message corrompu" in output, output
+    assert stats['transactions'] <= 3, stats
@@ -0,0 +1,76 @@
+"""
+Test de classify_batch: pour chaque email, même résultat que classify_email_priority
+Corpus synthétique avec VIP, bloqués et historique des expéditeurs, chemin
+NumPy et chemin Python, priorités déduites comprises
+"""
+
+import os
+
+import pytest
+
+import adaptive_classifier
+from adaptive_classifier import AdaptiveEmailClassifier
+from corpus_generator import CorpusGenerator
+from email_classifier import EmailClassifier
+from reputation import InferredPriority
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_DIR, "business_config.json")
+
+SPECIAL_EMAILS = [
+    ("Réunion de copropriété", "gestion@syndic-principal.fr", "Ordre du jour joint"),
+    ("Fuite urgente", "president@syndic-principal.fr", "Dégât des eaux au 2e"),
+    ("Gagnez un iPhone", "offres@spam.com", "Cliquez ici, urgent"),
+    ("", "", ""),
+]
+
+def corpus():
+    records = CorpusGenerator("conciergerie", seed=7, senders=40).records(400)
+    emails = [{'subject': r['subject'], 'sender': r['sender'], 'body': r['body']} for r in records]
+    emails.extend({'subject': subject, 'sender': sender, 'body': body} for subject, sender, body in SPECIAL_EMAILS)
+    return emails
+
+def compare(classifier, emails):
+    """(résultats un par un, résultats du lot), avec le caractère déduit de chaque priorité"""
+    single = [classifier.classify_email_priority(e['subject'], e['sender'], e['body']) for e in emails]
+    batch = classifier.classify_batch(emails)
+    return ([(tuple(r), isinstance(r, InferredPriority)) for r in single],
+            [(tuple(r), isinstance(r, InferredPriority)) for r in batch])
+
+@pytest.mark.parametrize("numpy_path", [True, False])
+def test_adaptive_batch_matches_single(temp_dir, monkeypatch, numpy_path):
+    """AdaptiveEmailClassifier, avant et après constitution de l'historique des expéditeurs"""
+    if numpy_path and not adaptive_classifier.NUMPY_AVAILABLE:
+        pytest.skip("NumPy non installé")
+    monkeypatch.setattr(adaptive_classifier, "NUMPY_AVAILABLE", numpy_path)
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    emails = corpus()
+    classifier = AdaptiveEmailClassifier(CONFIG_FILE)
+    try:
+        before = compare(classifier, emails)
+        # Historique: les expéditeurs fréquents ont désormais une réputation
+        classifier.store_emails([dict(e, date=None, message_id=f"<lot{n}@test>") for n, e in enumerate(emails)])
+        classifier.store.flush()
+        after = compare(classifier, emails)
+    finally:
+        classifier.close()
+
+    mismatches = [(emails[i]['subject'], s, b) for state in (before, after)
+                  for i, (s, b) in enumerate(zip(*state)) if s != b]
+    labels = {label for (_, label), _ in after[1]}
+    print(f"  {len(emails)} emails, libellés {sorted(labels)}, {len(mismatches)} différences")
+    assert not mismatches, mismatches[:5]
+    assert {"BLOQUE", "VIP-URGENT"} <= labels, labels
+
+def test_base_batch_matches_single(temp_dir, monkeypatch):
+    """EmailClassifier sans IA: les emails ambigus restent MOYENNE déduite dans les deux chemins"""
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    emails = corpus()
+    classifier = EmailClassifier()
+    try:
+        single, batch = compare(classifier, emails)
+    finally:
+        classifier.close()
+
+    print(f"  {sum(inferred for _, inferred in batch)} priorités déduites sur {len(emails)}")
+    assert single == batch, [(s, b) for s, b in zip(single, batch) if s != b][:5]
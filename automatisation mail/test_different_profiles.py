@@ -30,8 +30,8 @@ def test_profile_classification(profile_name, test_emails):
     print(f"Mots-clés urgents: {len(config['priority_rules']['urgent']['keywords'])}")
 
     results = []
-    for sender, subject, body in test_emails:
-        priority_num, priority_label = classifier.classify_email_priority(subject, sender, body)
+    batch = [{'sender': sender, 'subject': subject, 'body': body} for sender, subject, body in test_emails]
+    for (sender, subject, body), (priority_num, priority_label) in zip(test_emails, classifier.classify_batch(batch)):
         results.append({
             'email': f"{subject} (de: {sender})",
             'priority': priority_label,
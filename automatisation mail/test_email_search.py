@@ -0,0 +1,102 @@
+"""
+Test de la recherche plein texte (FTS5) et de l'index email_terms
+Préfixes, accents, classement par pertinence, filtres de priorité et de
+date, index tenu à jour par triggers, repli LIKE sans FTS5
+"""
+
+import email_search
+from email_classifier import EmailClassifier
+from email_search import search_emails
+from text_normalizer import tokenize
+
+EMAILS = [
+    ("Fuites d'eau au 3e", "gardien@residence.fr", "Plusieurs fuites dans la cage d'escalier",
+     "Tue, 14 Oct 2025 09:00:00 +0200"),
+    ("Compte rendu", "syndic@residence.fr", "Point sur la fuite du parking, réparée hier",
+     "Tue, 14 Oct 2025 18:00:00 +0200"),
+    ("Coupure d'électricité", "edf@fournisseur.fr", "Intervention prévue jeudi",
+     "Wed, 15 Oct 2025 08:00:00 +0200"),
+    ("Newsletter d'octobre", "info@boutique.fr", "Nos offres du mois",
+     "Mon, 13 Oct 2025 10:00:00 +0200"),
+]
+
+def stored_classifier():
+    classifier = EmailClassifier()
+    classifier.store_emails([{'subject': subject, 'sender': sender, 'body': body, 'date': date,
+                              'message_id': f"<search{n}@residence.fr>"}
+                             for n, (subject, sender, body, date) in enumerate(EMAILS)])
+    classifier.store.flush()
+    return classifier
+
+def subjects(rows):
+    return [row[2] for row in rows]
+
+def test_search_ranking_and_filters(temp_dir):
+    """Préfixe et accents trouvés, sujet avant contenu, filtres de priorité et de journée"""
+    classifier = stored_classifier()
+    conn = classifier.conn
+    try:
+        fuite = subjects(search_emails(conn, "fuite"))
+        electricite = subjects(search_emails(conn, "electricite"))
+        both_words = subjects(search_emails(conn, "fuite parking"))
+        sender = subjects(search_emails(conn, "gardien"))
+        low = subjects(search_emails(conn, "", priority=1))
+        day = subjects(search_emails(conn, "fuite", since="2025-10-14", until="2025-10-14"))
+        later = subjects(search_emails(conn, "", since="2025-10-15"))
+        paged = subjects(search_emails(conn, "fuite", limit=1, offset=1))
+    finally:
+        classifier.close()
+
+    print(f"  fuite: {fuite}, electricite: {electricite}, priorité basse: {low}, à partir du 15: {later}")
+    assert fuite == ["Fuites d'eau au 3e", "Compte rendu"], fuite
+    assert electricite == ["Coupure d'électricité"], electricite
+    assert both_words == ["Compte rendu"], both_words
+    assert sender == ["Fuites d'eau au 3e"], sender
+    assert low == ["Newsletter d'octobre"], low
+    assert day == fuite, day
+    assert later == ["Coupure d'électricité"], later
+    assert paged == ["Compte rendu"], paged
+
+def test_index_follows_changes(temp_dir):
+    """Contenu modifié réindexé, email supprimé retiré; email_terms rempli à l'enregistrement"""
+    classifier = stored_classifier()
+    conn = classifier.conn
+    try:
+        email_id = conn.execute("SELECT id FROM emails WHERE subject = 'Compte rendu'").fetchone()[0]
+        terms = {term for term, in conn.execute('SELECT term FROM email_terms WHERE email_id = ?', (email_id,))}
+        # Même Message-ID: emplacement mis à jour, aucun terme en double
+        classifier.store_emails([{'subject': "Compte rendu", 'sender': "syndic@residence.fr",
+                                  'body': "Point sur la fuite du parking, réparée hier", 'date': EMAILS[1][3],
+                                  'message_id': "<search1@residence.fr>", 'mailbox': "archives", 'uid': 9}])
+        classifier.store.flush()
+        duplicates = conn.execute('''
+            SELECT COUNT(*) - COUNT(DISTINCT term) FROM email_terms WHERE email_id = ?
+        ''', (email_id,)).fetchone()[0]
+        conn.execute("UPDATE emails SET content = 'Ascenseur remis en service' WHERE id = ?", (email_id,))
+        updated = subjects(search_emails(conn, "ascenseur")), subjects(search_emails(conn, "parking"))
+        conn.execute("DELETE FROM emails WHERE subject LIKE 'Fuites%'")
+        deleted = subjects(search_emails(conn, "fuite"))
+        conn.commit()
+    finally:
+        classifier.close()
+
+    print(f"  termes: {sorted(terms)}, après modification: {updated}, après suppression: {deleted}")
+    # Termes normalisés comme dans reclassify.affected_email_ids
+    assert {"from:syndic@residence.fr", *tokenize("Compte rendu fuite parking réparée")} <= terms, terms
+    assert duplicates == 0, duplicates
+    assert updated == (["Compte rendu"], []), updated
+    assert deleted == [], deleted
+
+def test_like_fallback(temp_dir, monkeypatch):
+    """Sans FTS5: chaque mot doit apparaître, emails les plus récents d'abord"""
+    monkeypatch.setattr(email_search, "has_search_index", lambda conn: False)
+    classifier = stored_classifier()
+    try:
+        found = subjects(search_emails(classifier.conn, "fuite"))
+        both_words = subjects(search_emails(classifier.conn, "fuite parking"))
+    finally:
+        classifier.close()
+
+    print(f"  fuite: {found}, fuite parking: {both_words}")
+    assert found == ["Compte rendu", "Fuites d'eau au 3e"], found
+    assert both_words == ["Compte rendu"], both_words
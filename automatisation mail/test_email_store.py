@@ -0,0 +1,75 @@
+"""
+Test de l'écriture différée de EmailStore
+Les requêtes sont regroupées en transactions pleines; une requête refusée par
+la base est écartée et signalée par flush(), une base verrouillée est réessayée
+"""
+
+import time
+
+import pytest
+
+from email_store import EmailStore, EmailStoreError, connect
+
+INSERT_SQL = 'INSERT INTO items (id, name) VALUES (?, ?)'
+
+def create_table():
+    conn = connect('store.db')
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)')
+    conn.commit()
+    return conn
+
+def test_batches_filled(temp_dir):
+    """2000 requêtes ajoutées au fil de l'eau, lots de 1000: 2 transactions"""
+    conn = create_table()
+    store = EmailStore('store.db', batch_size=1000, flush_interval=0.5)
+    for n in range(2000):
+        store.add(INSERT_SQL, (n, f"item {n}"))
+        if n % 100 == 0:
+            # Producteur plus lent que le thread d'écriture
+            time.sleep(0.001)
+    store.flush()
+    stats = store.stats()
+    store.close()
+    rows = conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+    conn.close()
+
+    print(f"  {rows} lignes en {stats['transactions']} transactions")
+    assert rows == 2000, rows
+    assert stats['transactions'] == 2, stats
+
+def test_rejected_rows(temp_dir):
+    """Requête refusée (NOT NULL): écartée, le reste du lot et les lots suivants sont validés"""
+    conn = create_table()
+    store = EmailStore('store.db', batch_size=100)
+    for n in range(250):
+        store.add(INSERT_SQL, (n, None if n == 7 else f"item {n}"))
+    with pytest.raises(EmailStoreError, match="1 écritures rejetées"):
+        store.flush()
+    store.add(INSERT_SQL, (1000, "après le rejet"))
+    store.flush()
+    stats = store.stats()
+    store.close()
+    rows = conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+    conn.close()
+
+    print(f"  {rows} lignes validées, {stats['rejected']} rejetée, {stats['failed']} en attente")
+    assert rows == 250, rows
+    assert stats['rejected'] == 1 and stats['failed'] == 0, stats
+
+def test_locked_database_retried(temp_dir):
+    """Base verrouillée par un autre processus: le lot est gardé, puis validé au flush() suivant"""
+    conn = create_table()
+    store = EmailStore('store.db', batch_size=100, retries=2, timeout=0.1)
+    conn.execute('BEGIN IMMEDIATE')
+    for n in range(10):
+        store.add(INSERT_SQL, (n, f"item {n}"))
+    with pytest.raises(EmailStoreError, match="10 écritures non validées"):
+        store.flush()
+    conn.commit()
+    store.flush()
+    store.close()
+    rows = conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+    conn.close()
+
+    print(f"  {rows} lignes validées après le verrou")
+    assert rows == 10, rows
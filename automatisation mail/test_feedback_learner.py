@@ -0,0 +1,68 @@
+"""
+Test de l'apprentissage des corrections
+Une correction seule ne change rien, plusieurs corrections concordantes
+remplacent les règles, sauf une règle URGENT contredite par le seul expéditeur;
+les mots-clés proposés sont jugés sur les seuls emails corrigés
+"""
+
+import os
+
+from adaptive_classifier import AdaptiveEmailClassifier
+from email_classifier import DEFAULT_RULES_CONFIG, EmailClassifier
+from feedback_learner import propose_keyword_changes
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_DIR, "business_config.json")
+
+URGENT_EMAIL = ("URGENT serveur en panne", "boss@corp.fr", "incendie urgent")
+NEUTRAL_EMAIL = ("Point hebdo", "boss@corp.fr", "ordre du jour")
+CORRECTED_EMAILS = [("Lettre d'information", "Les nouvelles du mois"), ("Résumé de la semaine", "Rien de neuf")]
+
+def correct(classifier, n, subject, body, priority):
+    """Enregistrer un email de boss@corp.fr puis le corriger vers `priority`"""
+    message_id = f"<correction{n}@corp.fr>"
+    classifier.store_emails([{'sender': "boss@corp.fr", 'subject': subject, 'body': body, 'date': None,
+                              'message_id': message_id}])
+    classifier.store.flush()
+    email_id = classifier.conn.execute('SELECT id FROM emails WHERE message_id = ?', (message_id,)).fetchone()[0]
+    classifier.record_feedback(email_id, priority)
+
+def test_corrections_agreement(temp_dir):
+    """Une correction BASSE ne suffit pas; deux la généralisent à l'expéditeur, jamais contre URGENT"""
+    classifier = EmailClassifier()
+    correct(classifier, 1, *CORRECTED_EMAILS[0], 1)
+    after_one = [classifier.classify_email_priority(*URGENT_EMAIL),
+                 classifier.classify_email_priority(*NEUTRAL_EMAIL)]
+    correct(classifier, 2, *CORRECTED_EMAILS[1], 1)
+    after_two = [classifier.classify_email_priority(*URGENT_EMAIL),
+                 classifier.classify_email_priority(*NEUTRAL_EMAIL)]
+    classifier.close()
+
+    # Autre processus: poids relus depuis la base, mêmes décisions avec les règles de l'entreprise
+    adaptive = AdaptiveEmailClassifier(CONFIG_FILE)
+    emails = (URGENT_EMAIL, NEUTRAL_EMAIL)
+    single = [adaptive.classify_email_priority(*email)[0] for email in emails]
+    batch = [priority for priority, _ in adaptive.classify_batch([
+        {'subject': subject, 'sender': sender, 'body': body} for subject, sender, body in emails
+    ])]
+    adaptive.close()
+
+    print(f"  une correction: {after_one}, deux corrections: {after_two}, adaptatif: {single} / lot {batch}")
+    assert after_one == [(4, "URGENT"), (2, "MOYENNE")], after_one
+    assert after_two == [(4, "URGENT"), (1, "BASSE")], after_two
+    assert single == batch == [4, 1], (single, batch)
+
+def test_keyword_proposals_use_corrections(temp_dir):
+    """"panne" a classé 10 emails URGENT, l'utilisateur en corrige 4 en MOYENNE: retrait proposé"""
+    classifier = EmailClassifier()
+    classifier.store_emails([{'sender': f"locataire{n}@residence.fr", 'subject': f"Panne d'ascenseur {n}",
+                              'body': "Bloqué au troisième étage", 'date': None,
+                              'message_id': f"<ascenseur{n}@residence.fr>"} for n in range(10)])
+    for n in range(4):
+        correct(classifier, 10 + n, f"Panne d'ampoule {n}", "Ampoule grillée dans le couloir", 2)
+    additions, removals = propose_keyword_changes(classifier.conn, DEFAULT_RULES_CONFIG)
+    classifier.close()
+
+    print(f"  ajouts: {additions}, retraits: {removals}")
+    assert ("panne", 4, 0.0, 4) in removals, removals
+    assert ("ampoule", 2, 1.0, 4) in additions, additions
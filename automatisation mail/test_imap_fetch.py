@@ -0,0 +1,99 @@
+"""
+Test de la récupération partielle des messages IMAP
+Choix de la partie texte d'après BODYSTRUCTURE, décodage d'un début de
+partie tronqué, et téléchargement limité à l'en-tête et au début du texte
+contre le serveur IMAP local
+"""
+
+import base64
+import imaplib
+from email.message import EmailMessage
+from email.policy import SMTP
+
+from email_classifier import EmailClassifier
+from imap_stub_server import IMAPStubServer
+from imap_utils import decode_partial, parse_bodystructure, select_text_part
+
+def fetch_line(bodystructure):
+    return f'1 (UID 7 BODYSTRUCTURE {bodystructure})'.encode()
+
+MIXED = fetch_line(
+    '((("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "QUOTED-PRINTABLE" 120 4 NIL NIL NIL)'
+    '("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "BASE64" 900 12 NIL NIL NIL) "ALTERNATIVE" ("BOUNDARY" "b2") NIL NIL)'
+    '("APPLICATION" "PDF" ("NAME" "devis.pdf") NIL NIL "BASE64" 524288 NIL ("attachment" ("FILENAME" "devis.pdf")) NIL)'
+    ' "MIXED" ("BOUNDARY" "b1") NIL NIL)'
+)
+HTML_ONLY = fetch_line('("TEXT" "HTML" ("CHARSET" "iso-8859-1") NIL NIL "8BIT" 2048 40 NIL NIL NIL)')
+TEXT_ATTACHMENT = fetch_line(
+    '(("TEXT" "HTML" NIL NIL NIL "7BIT" 300 8 NIL NIL NIL)'
+    '("TEXT" "PLAIN" ("NAME" "notes.txt") NIL NIL "7BIT" 5000 100 NIL ("attachment" ("FILENAME" "notes.txt")) NIL)'
+    ' "MIXED" ("BOUNDARY" "b3") NIL NIL)'
+)
+
+def test_select_text_part():
+    """text/plain d'un multipart/alternative, HTML seul, pièce jointe texte ignorée"""
+    mixed = select_text_part(parse_bodystructure(MIXED))
+    html_only = select_text_part(parse_bodystructure(HTML_ONLY))
+    attachment = select_text_part(parse_bodystructure(TEXT_ATTACHMENT))
+    print(f"  {mixed}\n  {html_only}\n  {attachment}")
+    assert mixed == {'section': '1.1', 'subtype': 'plain', 'encoding': 'quoted-printable', 'charset': 'utf-8',
+                     'size': 120}, mixed
+    assert html_only['section'] == '1' and html_only['charset'] == 'iso-8859-1', html_only
+    assert attachment['section'] == '1' and attachment['subtype'] == 'html', attachment
+    assert select_text_part(parse_bodystructure(b'1 (UID 7)')) is None
+
+def test_decode_truncated_part():
+    """Début de partie coupé au milieu d'un bloc base64 ou d'un caractère: texte lisible"""
+    encoded = "Réservation confirmée pour le 12 mars".encode('utf-8')
+    truncated = base64.encodebytes(encoded)[:30]
+    text = decode_partial(truncated, "base64", "utf-8")
+    qp = decode_partial(b"Chambre r=C3=A9serv=C3=A9e =\r\npour deux", "quoted-printable", "utf-8")
+    latin = decode_partial("Fenêtre cassée".encode('latin-1'), "8bit", "iso-8859-1", max_chars=7)
+    print(f"  {text!r} / {qp!r} / {latin!r}")
+    assert text.startswith("Réservation confirm"), text
+    assert qp == "Chambre réservée pour deux", qp
+    assert latin == "Fenêtre", latin
+
+def make_message(n, html_only=False, attachment_kb=0):
+    msg = EmailMessage()
+    msg['From'] = f"client{n}@hotel.fr"
+    msg['Subject'] = f"Réservation {n}"
+    msg['Message-ID'] = f"<fetch{n}@hotel.fr>"
+    text = f"Bonjour, je souhaite réserver la chambre {n}. " * 200
+    if html_only:
+        msg.set_content(f"<html><head><style>p {{}}</style></head><body><p>{text}</p></body></html>",
+                        subtype='html')
+    else:
+        msg.set_content(text)
+        msg.add_alternative(f"<p>{text}</p>", subtype='html')
+    if attachment_kb:
+        msg.add_attachment(b"x" * attachment_kb * 1024, maintype='application', subtype='pdf',
+                           filename=f"devis{n}.pdf")
+    # Fins de ligne CRLF, comme sur le réseau
+    return msg.as_bytes(policy=SMTP)
+
+def test_partial_fetch(temp_dir):
+    """Pièces jointes de 256 Ko jamais téléchargées, texte tronqué, HTML converti en texte"""
+    raw_messages = [make_message(n, html_only=n % 3 == 0, attachment_kb=256 if n % 2 else 0) for n in range(1, 13)]
+    server = IMAPStubServer(raw_messages)
+    server.start()
+    classifier = EmailClassifier()
+    try:
+        classifier.mail = imaplib.IMAP4("127.0.0.1", server.port)
+        classifier.mail.login("test@example.com", "x")
+        classifier.mail.select('inbox', readonly=True)
+        server.reset_counters()
+        emails = classifier.fetch_messages(list(range(1, 13)), body_bytes=1024, batch_size=5)
+        transferred = server.bytes_sent
+        classifier.mail.logout()
+    finally:
+        classifier.close()
+        server.stop()
+
+    total = sum(len(raw) for raw in raw_messages)
+    print(f"  {len(emails)} emails, {transferred} octets transférés pour {total} octets de messages")
+    assert [email_data['uid'] for email_data in emails] == list(range(1, 13))
+    assert all(email_data['subject'] == f"Réservation {n}" for n, email_data in enumerate(emails, 1))
+    assert all(email_data['body'].startswith("Bonjour, je souhaite réserver la chambre") for email_data in emails)
+    assert all("<" not in email_data['body'] and "p {}" not in email_data['body'] for email_data in emails)
+    assert transferred < total / 20, (transferred, total)
@@ -0,0 +1,48 @@
+"""
+Test du moteur d'ingestion multi-dossiers contre le serveur IMAP local
+Un classificateur qui ne se construit pas ne retient aucune connexion du
+pool, et tous les dossiers partagent le même client IA
+"""
+
+import threading
+
+from email_classifier import EmailClassifier
+from imap_stub_server import IMAPStubServer, generate_mailbox
+from ingestion_engine import IngestionEngine
+
+def test_factory_failure_releases_slots(temp_dir, monkeypatch):
+    """Deux constructions en échec: aucune place perdue, puis deux dossiers avec un seul client IA"""
+    monkeypatch.setenv('OPENAI_API_KEY', "test")
+    monkeypatch.setenv('OPENAI_BASE_URL', "http://127.0.0.1:9/v1")
+    server = IMAPStubServer(generate_mailbox(20, attachment_ratio=0))
+    server.start()
+    created = []
+
+    def factory():
+        if len(created) < 2:
+            created.append(None)
+            raise RuntimeError("configuration illisible")
+        classifier = EmailClassifier()
+        created.append(classifier)
+        return classifier
+
+    account = {"email": "test@example.com", "password": "x", "imap_server": "127.0.0.1", "port": server.port,
+               "ssl": False, "mailboxes": ["inbox", "archives"], "initial_count": 20}
+    engine = IngestionEngine([account], classifier_factory=factory, max_workers=2, max_per_account=2)
+    results = []
+    try:
+        for _ in range(2):
+            # Une place perdue par échec bloquerait la passe suivante: passe exécutée sous délai
+            thread = threading.Thread(target=lambda: results.append(engine.run_once()), daemon=True)
+            thread.start()
+            thread.join(10)
+            assert not thread.is_alive(), "synchronisation bloquée: places du pool perdues"
+    finally:
+        engine.close()
+        server.stop()
+
+    clients = {id(classifier.llm_client) for classifier in created if classifier is not None}
+    print(f"  passes: {results}, clients IA: {len(clients)}")
+    assert all('error' in result for result in results[0].values()), results
+    assert [result.get('count') for result in results[1].values()] == [20, 20], results
+    assert len(created) == 4 and len(clients) == 1 and engine.llm_client is not None, (created, clients)
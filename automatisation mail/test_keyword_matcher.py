@@ -0,0 +1,59 @@
+"""
+Test des règles par mots-clés sur mots normalisés
+Mots entiers seulement ("pub" ne correspond pas à "public"), accents, casse,
+pluriel et féminin simples ignorés, expressions de plusieurs mots
+"""
+
+from keyword_matcher import CompiledRules
+from text_normalizer import normalize, tokenize
+
+RULES = CompiledRules({
+    "urgent": {"keywords": ["urgent", "électricité", "dégât des eaux"]},
+    "high": {"keywords": ["réservation", "nouveau client"], "subjects": ["devis"]},
+    "low": {"keywords": ["pub", "newsletter"], "senders": ["@promo."]},
+})
+
+def test_whole_words_only():
+    """Le mot-clé "pub" ne se déclenche que sur le mot entier: "public" et "republication" ne comptent pas"""
+    matches = [RULES.match(subject, "client@exemple.fr", body) for subject, body in [
+        ("Rapport public", "Document en republication"),
+        ("Nouvelle pub", "Découvrez notre offre"),
+        ("Pub!", ""),
+    ]]
+    print(f"  {matches}")
+    assert matches == [None, (1, "BASSE"), (1, "BASSE")], matches
+
+def test_accents_and_case_folded():
+    """Accents, majuscules, pluriels et féminins: même mot que la règle"""
+    matches = [RULES.match(subject, "client@exemple.fr", body) for subject, body in [
+        ("COUPURE D'ELECTRICITE", ""),
+        ("Intervention urgente", ""),
+        ("Réservations de mars", ""),
+        ("Dégâts des eaux au 3e", ""),
+        ("Deux nouveaux clients", ""),
+    ]]
+    print(f"  {matches}")
+    assert normalize("Électricité Œuvre") == "electricite oeuvre"
+    assert tokenize("L'Électricité") == tokenize("l electricite") == ["l", "electricit"]
+    assert matches == [(4, "URGENT"), (4, "URGENT"), (3, "HAUTE"), (4, "URGENT"), (3, "HAUTE")], matches
+
+def test_phrases_in_order():
+    """Une expression doit apparaître mot pour mot, dans l'ordre"""
+    matches = [RULES.match("Info", "client@exemple.fr", body) for body in [
+        "Client nouveau sur le secteur",
+        "Un nouveau, client fidèle",
+    ]]
+    print(f"  {matches}")
+    assert matches == [None, (3, "HAUTE")], matches
+
+def test_sender_and_subject_rules():
+    """Règle d'expéditeur sur l'adresse, règle de sujet sur le seul sujet"""
+    matches = [
+        RULES.match("Bonjour", "offres@promo.example.com", "Rien"),
+        RULES.match("Demande de devis", "client@exemple.fr", ""),
+        RULES.match("Bonjour", "client@exemple.fr", "Merci pour le devis"),
+    ]
+    explained = RULES.explain("Nouvelle pub urgente", "client@exemple.fr", "")
+    print(f"  {matches}, règle décisive: {explained}")
+    assert matches == [(1, "BASSE"), (3, "HAUTE"), None], matches
+    assert explained == (4, "keywords", "urgent"), explained
@@ -0,0 +1,240 @@
+"""
+Test du client LLM asynchrone contre le faux serveur OpenAI local
+Concurrence bornée (y compris entre threads), limiteur de débit, échéance par appel, disjoncteur
+prompts à plusieurs emails et classification par lots d'EmailClassifier
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from llm_client import AsyncLLMClient, CircuitBreaker
+from llm_stub_server import LLMStubServer
+
+AMBIGUOUS_EMAILS = [
+    ("Panne de chauffage", "resident{n}@syndic.fr", "Le radiateur ne chauffe plus"),
+    ("Demande de devis {n}", "contact{n}@societe.fr", "Pouvez-vous nous envoyer un devis ?"),
+    ("Offre du mois", "info@boutique.fr", "Notre offre spéciale {n} vous attend"),
+    ("Compte rendu {n}", "equipe@cabinet.fr", "Voici le compte rendu de la réunion"),
+]
+EXPECTED = [(4, "URGENT"), (3, "HAUTE"), (1, "BASSE"), (2, "MOYENNE")]
+
+def make_emails(count):
+    return [tuple(field.format(n=n) for field in AMBIGUOUS_EMAILS[n % 4]) for n in range(count)]
+
+def run_client(server, emails, **options):
+    client = AsyncLLMClient("test", base_url=server.base_url, **options)
+    server.reset_counters()
+    start = time.perf_counter()
+    results = client.classify_many(emails)
+    return client, results, time.perf_counter() - start
+
+def test_concurrency():
+    """40 emails, 5 requêtes en vol au plus: résultats corrects et bien plus rapides qu'en série"""
+    server = LLMStubServer(latency=(0.05, 0.1))
+    server.start()
+    emails = make_emails(40)
+    client, results, elapsed = run_client(server, emails, max_in_flight=5, rate_per_second=1000)
+    server.stop()
+
+    correct = results == [EXPECTED[n % 4] for n in range(40)]
+    print(f"  {len(emails)} emails en {elapsed:.2f}s, max en vol côté serveur: {server.max_in_flight}")
+    assert correct, results
+    assert server.max_in_flight <= 5, server.max_in_flight
+    assert elapsed < 40 * 0.05, elapsed
+
+def test_threads_share_limit():
+    """6 threads appellent classify_many en même temps: 5 requêtes en vol au plus pour tout le client"""
+    server = LLMStubServer(latency=(0.05, 0.1))
+    server.start()
+    client = AsyncLLMClient("test", base_url=server.base_url, max_in_flight=5, rate_per_second=1000)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.classify_many(make_emails(20))))
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    server.stop()
+
+    print(f"  {client.stats['calls']} appels depuis 6 threads, max en vol côté serveur: {server.max_in_flight}")
+    assert len(results) == 6 and all(result == [EXPECTED[n % 4] for n in range(20)] for result in results)
+    assert server.max_in_flight <= 5, server.max_in_flight
+    assert client.stats['calls'] == 120, client.stats
+
+def test_rate_limit():
+    """10 requêtes/s: 30 emails prennent au moins 2 secondes (10 en rafale, puis 20 au débit)"""
+    server = LLMStubServer(latency=(0.0, 0.01))
+    server.start()
+    client, results, elapsed = run_client(server, make_emails(30), max_in_flight=30, rate_per_second=10)
+    server.stop()
+
+    print(f"  30 emails en {elapsed:.2f}s à 10 requêtes/s")
+    assert all(results), results
+    assert elapsed >= 1.9, elapsed
+
+def test_deadline():
+    """Serveur qui ne répond pas: chaque appel abandonne à son échéance"""
+    server = LLMStubServer(latency=(0.0, 0.0), timeout_rate=1.0, hang_seconds=5)
+    server.start()
+    client, results, elapsed = run_client(server, make_emails(8), max_in_flight=8, rate_per_second=1000,
+                                          deadline=0.3, breaker=CircuitBreaker(min_calls=100))
+    server.stop()
+
+    print(f"  8 appels abandonnés en {elapsed:.2f}s ({client.stats['timeouts']} échéances dépassées)")
+    assert results == [None] * 8, results
+    assert client.stats['timeouts'] == 8, client.stats
+    assert elapsed < 1.5, elapsed
+
+def test_circuit_breaker():
+    """Erreurs en rafale: le disjoncteur s'ouvre et les emails suivants ne sont plus envoyés"""
+    server = LLMStubServer(latency=(0.0, 0.01), error_rate=1.0)
+    server.start()
+    breaker = CircuitBreaker(window=10, min_calls=5, failure_ratio=0.5, cooldown=60)
+    client, results, elapsed = run_client(server, make_emails(30), max_in_flight=1, rate_per_second=1000,
+                                          breaker=breaker)
+    server.stop()
+
+    print(f"  {server.requests} requêtes envoyées sur 30, {client.stats['short_circuited']} court-circuitées, "
+          f"disjoncteur {breaker.state}")
+    assert results == [None] * 30, results
+    assert server.requests == 5, server.requests
+    assert breaker.state == "ouvert", breaker.state
+
+def test_truncated_responses():
+    """Corps de réponse tronqué: l'email n'est pas classé et l'erreur compte pour le disjoncteur"""
+    server = LLMStubServer(latency=(0.0, 0.01), truncate_rate=1.0)
+    server.start()
+    breaker = CircuitBreaker(window=10, min_calls=5, failure_ratio=0.5, cooldown=60)
+    client, results, _ = run_client(server, make_emails(8), max_in_flight=1, rate_per_second=1000,
+                                    breaker=breaker)
+    server.stop()
+
+    print(f"  {client.stats['failed']} réponses tronquées, disjoncteur {breaker.state}")
+    assert results == [None] * 8, results
+    assert client.stats['failed'] == 5, client.stats
+    assert breaker.state == "ouvert", breaker.state
+
+def test_breaker_recovery():
+    """Après le délai, un appel d'essai réussi referme le disjoncteur"""
+    breaker = CircuitBreaker(window=10, min_calls=2, failure_ratio=0.5, cooldown=0.2)
+    for ticket in [breaker.allow(), breaker.allow()]:
+        breaker.record(ticket, False)
+    opened = breaker.state == "ouvert" and breaker.allow() is None
+    time.sleep(0.25)
+    ticket = breaker.allow()
+    trial = ticket is not None and breaker.allow() is None
+    breaker.record(ticket, True)
+    print(f"  ouvert: {opened}, un seul appel d'essai: {trial}, état final: {breaker.state}")
+    assert opened and trial
+    assert breaker.state == "fermé", breaker.state
+
+def test_breaker_late_results():
+    """Réponses tardives d'appels admis avant l'ouverture: ignorées, seul l'appel d'essai tranche"""
+    breaker = CircuitBreaker(window=10, min_calls=5, failure_ratio=0.5, cooldown=0.2)
+    tickets = [breaker.allow() for _ in range(7)]
+    for ticket in tickets[:5]:
+        breaker.record(ticket, False)
+    # Deux appels encore en vol lors de l'ouverture réussissent ensuite
+    breaker.record(tickets[5], True)
+    still_open = breaker.state == "ouvert" and breaker.allow() is None
+    time.sleep(0.25)
+    trial = breaker.allow()
+    breaker.record(tickets[6], True)
+    trial_pending = breaker.state == "semi-ouvert" and breaker.allow() is None
+    breaker.record(trial, False)
+    reopened = breaker.state
+    print(f"  ouvert malgré un succès tardif: {still_open}, essai toujours attendu: {trial_pending}, "
+          f"après l'échec de l'essai: {reopened}")
+    assert still_open and trial_pending
+    assert reopened == "ouvert", reopened
+    assert breaker.trips == 1, breaker.trips
+
+def test_batch_prompts():
+    """Lots de 10 emails par prompt: 4 requêtes pour 40 emails et bien moins de texte envoyé"""
+    server = LLMStubServer(latency=(0.05, 0.1))
+    server.start()
+    emails = make_emails(40)
+    _, single, _ = run_client(server, emails, max_in_flight=5, rate_per_second=1000)
+    single_words = server.prompt_words
+    client, results, elapsed = run_client(server, emails, max_in_flight=5, rate_per_second=1000, batch_size=10)
+    server.stop()
+
+    print(f"  {server.requests} requêtes en {elapsed:.2f}s, {server.prompt_words} mots envoyés "
+          f"contre {single_words} un par un")
+    assert results == single == [EXPECTED[n % 4] for n in range(40)], results
+    assert server.requests == 4, server.requests
+    assert server.prompt_words < single_words / 2, (server.prompt_words, single_words)
+
+def test_batch_requeue():
+    """Lignes mal formées dans la réponse d'un lot: seuls ces emails sont redemandés un par un"""
+    server = LLMStubServer(latency=(0.0, 0.01), malformed_rate=0.2, seed=7)
+    server.start()
+    client, results, _ = run_client(server, make_emails(40), max_in_flight=5, rate_per_second=1000,
+                                    batch_size=10)
+    server.stop()
+
+    requeued = client.stats['requeued']
+    answered = sum(result is not None for result in results)
+    print(f"  {requeued} emails redemandés, {server.requests} requêtes, {answered}/40 classés")
+    correct = all(result in (None, EXPECTED[n % 4]) for n, result in enumerate(results))
+    assert correct, results
+    assert requeued > 0
+    assert server.requests == 4 + requeued, (server.requests, requeued)
+    assert answered > 35, answered
+
+def test_classify_batch():
+    """EmailClassifier: emails ambigus classés en parallèle puis servis par le cache"""
+    server = LLMStubServer(latency=(0.05, 0.1))
+    server.start()
+    previous_dir = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="test_llm_"))
+    os.environ['OPENAI_API_KEY'] = "test"
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ['AI_RATE_PER_SECOND'] = "100"
+    try:
+        from email_classifier import EmailClassifier
+        classifier = EmailClassifier()
+        emails = [{'subject': subject, 'sender': sender, 'body': body} for subject, sender, body in make_emails(20)]
+        # Mots-clés absents des règles par défaut: tout passe par l'IA
+        for email_data in emails:
+            email_data['subject'] = email_data['subject'].replace("Demande", "Requête")
+
+        start = time.perf_counter()
+        first = classifier.classify_batch(emails)
+        elapsed = time.perf_counter() - start
+        requests = server.requests
+        second = classifier.classify_batch(emails)
+        stats = classifier.ai_cache.stats()
+        classifier.close()
+    finally:
+        os.chdir(previous_dir)
+        for name in ('OPENAI_API_KEY', 'OPENAI_BASE_URL', 'AI_RATE_PER_SECOND'):
+            del os.environ[name]
+        server.stop()
+
+    # Les contenus répétés du lot ne sont demandés qu'une fois
+    print(f"  20 emails en {elapsed:.2f}s, {requests} requêtes pour {stats['misses']} contenus distincts, "
+          f"second passage: {stats['hits']} réponses du cache")
+    assert first == second, (first, second)
+    assert server.requests == requests, (server.requests, requests)
+    assert stats['hits'] == stats['misses'], stats
+
+if __name__ == "__main__":
+    print("TESTS DU CLIENT LLM ASYNCHRONE")
+    tests = [test_concurrency, test_threads_share_limit, test_rate_limit, test_deadline, test_circuit_breaker,
+             test_truncated_responses, test_breaker_recovery, test_breaker_late_results, test_batch_prompts,
+             test_batch_requeue, test_classify_batch]
+    passed = 0
+    for test in tests:
+        print(f"\n{test.__doc__}")
+        try:
+            test()
+        except AssertionError as e:
+            print(f"  ECHEC {e}")
+        else:
+            passed += 1
+            print("  OK")
+
+    print(f"\n{passed}/{len(tests)} tests réussis")
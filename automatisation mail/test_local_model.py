@@ -0,0 +1,33 @@
+"""
+Test des exemples d'entraînement du modèle local
+Seules les priorités décidées par les règles ou l'IA et les corrections de
+l'utilisateur servent d'exemples, jamais les priorités déduites
+"""
+
+from email_classifier import EmailClassifier
+from local_model import FEEDBACK_WEIGHT, load_training_examples
+
+EMAILS = [
+    ("URGENT fuite d'eau", "Fuite dans la salle de bain, urgent"),
+    ("Newsletter de septembre", "Promotion du mois"),
+    ("Point hebdo", "Ordre du jour de la réunion"),
+    ("Bonjour", "Merci pour votre accueil"),
+]
+
+def test_inferred_priorities_excluded(temp_dir):
+    """MOYENNE par défaut écartée, sauf si l'utilisateur l'a confirmée par une correction"""
+    classifier = EmailClassifier()
+    classifier.store_emails([{'sender': f"client{n}@societe.fr", 'subject': subject, 'body': body, 'date': None,
+                              'message_id': f"<modele{n}@societe.fr>"} for n, (subject, body) in enumerate(EMAILS)])
+    classifier.store.flush()
+    conn = classifier.conn
+    stored = {subject: (email_id, inferred) for email_id, subject, inferred
+              in conn.execute('SELECT id, subject, priority_inferred FROM emails')}
+    classifier.record_feedback(stored["Bonjour"][0], 1)
+    examples = {subject: (priority, weight) for subject, _, _, priority, weight in load_training_examples(conn)}
+    classifier.close()
+
+    print(f"  en base: {stored}, exemples: {examples}")
+    assert stored["Point hebdo"][1] == 1 and stored["Bonjour"][1] == 1, stored
+    assert set(examples) == {"URGENT fuite d'eau", "Newsletter de septembre", "Bonjour"}, examples
+    assert examples["Bonjour"] == (1, FEEDBACK_WEIGHT), examples
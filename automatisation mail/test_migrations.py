@@ -0,0 +1,123 @@
+"""
+Test des migrations de schéma, de l'index email_terms et du reclassement
+Une base à l'ancien schéma (sans Message-ID ni version) est migrée par lots
+jusqu'à la dernière version; après un changement de règles, seuls les
+emails concernés sont recalculés
+"""
+
+import json
+import os
+import sqlite3
+
+from adaptive_classifier import AdaptiveEmailClassifier
+from email_classifier import MIGRATION_BATCH_SIZE, EmailClassifier
+from reclassify import affected_email_ids, reclassify
+from rule_plan import save_business_config
+from text_normalizer import tokenize
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Plus d'emails qu'un lot de migration: plusieurs lots sont nécessaires
+OLD_EMAILS = MIGRATION_BATCH_SIZE * 2 + 500
+
+def create_old_database(count):
+    """emails_trie.db au schéma d'origine (user_version 0), avec 10 doublons exacts"""
+    conn = sqlite3.connect('emails_trie.db')
+    conn.execute('''
+        CREATE TABLE emails (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender TEXT,
+            subject TEXT,
+            content TEXT,
+            priority INTEGER,
+            priority_label TEXT,
+            date_received TEXT,
+            processed_date TEXT
+        )
+    ''')
+    rows = [(f"client{n % 50}@hotel{n % 3}.fr", f"Réservation chambre {n}", f"Arrivée prévue, dossier {n}",
+             3, "HAUTE", f"Mon, 06 Oct 2025 {8 + n % 10:02d}:00:00 +0200", "2025-10-06 12:00:00")
+            for n in range(count)]
+    conn.executemany('''
+        INSERT INTO emails (sender, subject, content, priority, priority_label, date_received, processed_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows + rows[:10])
+    conn.commit()
+    conn.close()
+
+def test_migrate_old_schema(temp_dir):
+    """Base d'origine de plus de deux lots: doublons retirés, index, dates et réputation complets"""
+    create_old_database(OLD_EMAILS)
+    classifier = EmailClassifier()
+    conn = classifier.conn
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        emails, missing_keys, missing_dates = conn.execute('''
+            SELECT COUNT(*), SUM(message_id IS NULL), SUM(received_at IS NULL) FROM emails
+        ''').fetchone()
+        indexed = conn.execute('SELECT COUNT(DISTINCT email_id) FROM email_terms').fetchone()[0]
+        last_email = conn.execute('''
+            SELECT term FROM email_terms WHERE email_id = (SELECT MAX(id) FROM emails) ORDER BY term
+        ''').fetchall()
+        reputation = conn.execute("SELECT p3 FROM sender_reputation WHERE sender = '@hotel0.fr'").fetchone()
+    finally:
+        classifier.close()
+
+    print(f"  version {version}, {emails} emails, {indexed} indexés, réputation @hotel0.fr: {reputation}")
+    assert version == 5, version
+    assert emails == OLD_EMAILS, emails
+    assert missing_keys == 0 and missing_dates == 0, (missing_keys, missing_dates)
+    assert indexed == OLD_EMAILS, indexed
+    n = OLD_EMAILS - 1
+    assert (f"from:client{n % 50}@hotel{n % 3}.fr",) in last_email, last_email
+    assert ("reservation",) in last_email and (str(n),) in last_email, last_email
+    assert reputation == (len(range(0, OLD_EMAILS, 3)),), reputation
+
+def test_reclassify_changed_keyword(temp_dir):
+    """Mot-clé "piscine" ajouté en URGENT: seuls les emails qui le contiennent sont recalculés"""
+    config_file = os.path.abspath("business_config.json")
+    with open(os.path.join(BASE_DIR, "business_config.json"), encoding='utf-8') as f:
+        config = json.load(f)
+    save_business_config(config, config_file)
+
+    classifier = AdaptiveEmailClassifier(config_file)
+    emails = [{'sender': f"resident{n}@residence.fr", 'subject': subject, 'body': body,
+               'date': "Mon, 06 Oct 2025 10:00:00 +0200", 'message_id': f"<email{n}@residence.fr>"}
+              for n, (subject, body) in enumerate([
+                  ("Piscine fermée", "La piscine est fermée depuis ce matin"),
+                  ("Accès piscine", "Le badge de la piscine ne marche plus"),
+                  ("Question piscine", "Quels sont les horaires de la piscine ?"),
+                  ("Bonjour", "Merci pour votre accueil"),
+                  ("Réservation", "Je souhaite réserver une chambre"),
+              ])]
+    classifier.store_emails(emails)
+    classifier.store.flush()
+    conn = classifier.conn
+    ids = {subject: email_id for email_id, subject in conn.execute('SELECT id, subject FROM emails')}
+    # Correction de l'utilisateur: jamais reclassée
+    classifier.record_feedback(ids["Question piscine"], 2)
+    before = dict(conn.execute('SELECT id, priority FROM emails'))
+    # Motifs normalisés, comme dans reclassify.rule_entries
+    indexed = affected_email_ids(conn, {("keywords", ' '.join(tokenize("piscine")))})
+    expression = affected_email_ids(conn, {("keywords", ' '.join(tokenize("badge piscine")))})
+    classifier.close()
+
+    config["priority_rules"]["urgent"]["keywords"].append("piscine")
+    save_business_config(config, config_file)
+    classifier = AdaptiveEmailClassifier(config_file)
+    try:
+        stats = reclassify(classifier, batch_size=2)
+        conn = classifier.conn
+        after = dict(conn.execute('SELECT id, priority FROM emails'))
+        versions = conn.execute('SELECT COUNT(DISTINCT rule_version) FROM emails').fetchone()[0]
+    finally:
+        classifier.close()
+
+    print(f"  {stats['rescored']} emails recalculés, {stats['changed']} changés, priorités {before} -> {after}")
+    assert indexed == {ids["Piscine fermée"], ids["Accès piscine"], ids["Question piscine"]}, indexed
+    assert expression == {ids["Accès piscine"]}, expression
+    assert stats['rescored'] == 2 and stats['changed'] == 2, stats
+    assert after[ids["Piscine fermée"]] == after[ids["Accès piscine"]] == 4, after
+    assert after[ids["Question piscine"]] == 2, after
+    assert all(after[ids[subject]] == before[ids[subject]] for subject in ("Bonjour", "Réservation")), after
+    assert versions == 1, versions
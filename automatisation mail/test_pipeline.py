@@ -0,0 +1,145 @@
+"""
+Test du pipeline d'ingestion contre le serveur IMAP local
+Aucune erreur d'étape avec plusieurs workers de classification, pour les deux
+classificateurs; emails en échec notés à part et repris, connexion en erreur fermée
+"""
+
+import os
+
+from adaptive_classifier import AdaptiveEmailClassifier
+from email_classifier import EmailClassifier
+from imap_stub_server import IMAPStubServer, generate_mailbox
+from ingestion_engine import IMAPConnectionPool
+from pipeline import EmailPipeline
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_DIR, "business_config.json")
+
+CLASSIFIERS = {
+    'EmailClassifier': EmailClassifier,
+    'AdaptiveEmailClassifier': lambda: AdaptiveEmailClassifier(CONFIG_FILE),
+}
+
+def stage_errors(pipeline):
+    return {name: stage['errors'] for name, stage in pipeline.stats()['stages'].items() if stage['errors']}
+
+def stub_account(server, name):
+    return {"email": f"test-{name}@example.com", "password": "x", "imap_server": "127.0.0.1",
+            "port": server.port, "ssl": False}
+
+def test_imap_pipeline(temp_dir):
+    """200 emails IMAP, 4 connexions et 2 workers de classification: aucune erreur d'étape"""
+    server = IMAPStubServer(generate_mailbox(200, attachment_ratio=0.05, attachment_kb=16))
+    server.start()
+    try:
+        for name, factory in CLASSIFIERS.items():
+            pool = IMAPConnectionPool(5, 5)
+            email_pipeline = EmailPipeline(classifier_factory=factory)
+            try:
+                pipeline = email_pipeline.run_imap(pool, stub_account(server, name), 'inbox', 4, 25, 200)
+                stored = email_pipeline.classifier.conn.execute('SELECT COUNT(*) FROM emails').fetchone()[0]
+                state = email_pipeline.classifier.load_sync_state(f"test-{name}@example.com", 'inbox')
+            finally:
+                pool.close_all()
+                email_pipeline.classifier.close()
+                email_pipeline.close()
+
+            print(f"  {name}: {stored} emails enregistrés, point de reprise {state[1]}")
+            assert stage_errors(pipeline) == {}, (name, stage_errors(pipeline))
+            assert stored == 200, (name, stored)
+            assert state[1] == 200, (name, state)
+    finally:
+        server.stop()
+
+def test_messages_pipeline(temp_dir):
+    """Messages bruts analysés et classés en parallèle: aucune erreur d'étape"""
+    raw_messages = generate_mailbox(100, attachment_ratio=0)
+    for name, factory in CLASSIFIERS.items():
+        email_pipeline = EmailPipeline(classifier_factory=factory, classify_workers=4)
+        try:
+            pipeline = email_pipeline.run_messages(raw_messages)
+            persisted = pipeline.stats()['stages']['persist']['processed']
+        finally:
+            email_pipeline.classifier.close()
+            email_pipeline.close()
+
+        print(f"  {name}: {persisted} emails classés")
+        assert stage_errors(pipeline) == {}, (name, stage_errors(pipeline))
+        assert persisted == 100, (name, persisted)
+
+def test_failed_uid_retried(temp_dir):
+    """Classification en échec pour l'UID 30: point de reprise à 60, seul l'UID 30 est repris ensuite"""
+    class FlakyPipeline(EmailPipeline):
+        failing = {30}
+
+        def classify(self, email_data):
+            if email_data['uid'] in self.failing:
+                raise ValueError(f"échec simulé pour l'UID {email_data['uid']}")
+            return super().classify(email_data)
+
+    server = IMAPStubServer(generate_mailbox(60, attachment_ratio=0))
+    server.start()
+    account = stub_account(server, "reprise")
+    pool = IMAPConnectionPool(3, 3)
+    email_pipeline = FlakyPipeline()
+    classifier = email_pipeline.classifier
+    try:
+        email_pipeline.run_imap(pool, account, 'inbox', 2, 10, 60)
+        first = classifier.load_sync_state(account['email'], 'inbox')[1]
+        pending = classifier.load_failed_uids(account['email'], 'inbox', server.uidvalidity)
+        email_pipeline.failing = set()
+        pipeline = email_pipeline.run_imap(pool, account, 'inbox', 2, 10)
+        second = classifier.load_sync_state(account['email'], 'inbox')[1]
+        refetched = pipeline.stats()['stages']['persist']['processed']
+        remaining = classifier.conn.execute('SELECT COUNT(*) FROM imap_failed_uids').fetchone()[0]
+        stored = classifier.conn.execute('SELECT COUNT(*) FROM emails').fetchone()[0]
+    finally:
+        pool.close_all()
+        classifier.close()
+        email_pipeline.close()
+        server.stop()
+
+    print(f"  point de reprise {first} puis {second}, UID en échec {pending}, {refetched} email repris, "
+          f"{stored} en base")
+    assert first == second == 60, (first, second)
+    assert pending == [30], pending
+    assert refetched == 1 and remaining == 0, (refetched, remaining)
+    assert stored == 60, stored
+
+def test_broken_fetch_connection(temp_dir):
+    """Récupération d'un lot en erreur réseau: connexion fermée, lot noté en échec, les autres passent"""
+    released = []
+
+    class TrackingPool(IMAPConnectionPool):
+        def release(self, account, mail, broken=False):
+            released.append(broken)
+            super().release(account, mail, broken)
+
+    server = IMAPStubServer(generate_mailbox(40, attachment_ratio=0))
+    server.start()
+    account = stub_account(server, "connexion")
+    pool = TrackingPool(3, 3)
+    email_pipeline = EmailPipeline()
+    classifier = email_pipeline.classifier
+    fetch_messages = classifier.fetch_messages
+
+    def flaky_fetch(uids, *args, **kwargs):
+        if 15 in uids:
+            raise OSError("connexion réinitialisée")
+        return fetch_messages(uids, *args, **kwargs)
+
+    classifier.fetch_messages = flaky_fetch
+    try:
+        pipeline = email_pipeline.run_imap(pool, account, 'inbox', 2, 10, 40)
+        pending = classifier.load_failed_uids(account['email'], 'inbox', server.uidvalidity)
+        persisted = pipeline.stats()['stages']['persist']['processed']
+    finally:
+        pool.close_all()
+        classifier.close()
+        email_pipeline.close()
+        server.stop()
+
+    print(f"  connexions rendues (fermées: True): {released}, {persisted} emails, UID en échec {pending}")
+    assert released.count(True) == 1, released
+    assert pending == list(range(11, 21)), pending
+    assert persisted == 30, persisted
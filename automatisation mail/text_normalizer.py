@@ -0,0 +1,63 @@
+"""
+Normalisation du texte des emails pour les règles par mots-clés
+Minuscules, suppression des accents et découpage en mots en un seul passage:
+"Électricité" et "electricite" donnent le même mot, "pub" ne correspond plus à "public"
+"""
+
+import re
+import unicodedata
+from itertools import chain
+
+def build_fold_table():
+    """Table de translate: lettres accentuées latines -> lettres sans accent"""
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+        if base and base != char:
+            table[code] = base
+    table.update({ord('œ'): 'oe', ord('æ'): 'ae', ord('ß'): 'ss'})
+    return table
+
+FOLD_TABLE = build_fold_table()
+WORD_RE = re.compile(r'\w+')
+
+def normalize(text):
+    """Minuscules et accents supprimés"""
+    return text.lower().translate(FOLD_TABLE)
+
+def fold_word(word):
+    """Forme normalisée d'un mot en minuscules: sans accents, pluriel et féminin simples retirés
+
+    "réservations" rejoint "réservation", "urgente" rejoint "urgent"; la racine
+    garde au moins trois lettres.
+    """
+    word = word.translate(FOLD_TABLE)
+    if len(word) > 3 and word[-1] in 'sx':
+        word = word[:-1]
+    if len(word) > 3 and word[-1] == 'e':
+        word = word[:-1]
+    return word
+
+class FoldedChunks(dict):
+    """Cache morceau entre deux espaces -> mots normalisés ("d'eau," -> ("d", "eau"))
+
+    Le vocabulaire d'une boîte mail se répète beaucoup: la plupart des morceaux
+    sont déjà en cache et le découpage se réduit à str.split et des lectures de dict.
+    """
+
+    max_size = 50000
+
+    def __missing__(self, chunk):
+        if len(self) >= self.max_size:
+            self.clear()
+        words = self[chunk] = tuple(fold_word(word) for word in WORD_RE.findall(chunk))
+        return words
+
+FOLDED_CHUNKS = FoldedChunks()
+
+def tokenize(text):
+    """Liste des mots normalisés d'un texte (apostrophes et tirets séparent les mots)"""
+    if not text:
+        return []
+    return list(chain.from_iterable(map(FOLDED_CHUNKS.__getitem__, text.lower().split())))